@@ -13,6 +13,7 @@ SOLUTIONS_PATH = os.path.join(DATA_PATH, 'solutions')
 NPY_PATH = os.path.join(DATA_PATH, 'npy')
 MODELS_PATH = os.path.join(DATA_PATH, 'models')
 LOGS_PATH = os.path.join(DATA_PATH, 'logs')
+CUT_POOL_PATH = os.path.join(DATA_PATH, 'cuts')
 
 MATILDA_HARD_CLASSES = ['CLKhard', 'LKCChard']
 MATILDA_NON_HARD_CLASSES = ['CLKeasy', 'easyCLK-hardLKCC', 'hardCLK-easyLKCC', 'LKCCeasy', 'random']
@@ -49,7 +50,7 @@ def build_directory(path):
     print('Created directory:', path)
 
 def build_level_1_directories():
-    for path in (DATA_PATH, PROBLEMS_PATH, SOLUTIONS_PATH, NPY_PATH, MODELS_PATH, LOGS_PATH):
+    for path in (DATA_PATH, PROBLEMS_PATH, SOLUTIONS_PATH, NPY_PATH, MODELS_PATH, LOGS_PATH, CUT_POOL_PATH):
         build_directory(path)
 
 # Will exit the program if the directories are nonempty
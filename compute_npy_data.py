@@ -4,8 +4,14 @@ build_level_1_directories()
 # Uses fg weights of 1/iteration (1-indexed) instead of iteration/k
 USE_PAPER_FG = True
 
-from optlearn.data.data_utils import DataLoader
-loader = DataLoader([])
+# Starts the cutting relaxation features from the subtours already in the cut pool.
+# Their values then depend on what was solved before, so this is off by default.
+# Labels always use the pool, optimal solutions do not depend on it.
+USE_CUT_POOL_FOR_FEATURES = False
+
+# Solver of the cutting relaxation features, "highs" for the pure LP backend.
+# The LP optima and their reduced costs may differ from those found by SCIP.
+LP_SOLVER = "scip"
 
 import optlearn.mst.mst_model
 optlearn.mst.mst_model.use_paper_fg = USE_PAPER_FG
@@ -15,12 +21,173 @@ np.set_printoptions(linewidth=np.inf)
 
 from optlearn import io_utils
 from optlearn import graph_utils
+from optlearn import edge_index
 
 from optlearn.feature import features
+from optlearn.feature import matrix_features
+from optlearn.feature import feature_context
 from optlearn.data import compute_solutions
+from optlearn.data import feature_store
+from optlearn.mip import cut_pool
+
+import time
+import traceback
 
 from multiprocessing import Process
 
+# Number of tasks run at once, and seconds before a task is killed (None waits forever)
+NUM_WORKERS = os.cpu_count()
+TASK_TIMEOUT = None
+
+# Features that solve an LP, these are scheduled before everything else
+LP_FEATURES = ["f8", "fh", "fi", "fj", "fk"]
+LP_COST_FACTOR = 100
+
+# Keyword arguments of the features computed by the scheduler. It already keeps
+# NUM_WORKERS tasks busy, so fj runs its relaxations inside its own task process.
+TASK_FEATURE_KWARGS = {"fj": {"workers": 1}}
+
+# Features sharing an expensive context intermediate, the missing ones of a group are
+# computed in one task so the relaxations and MST rounds are only solved once
+CONTEXT_GROUPS = [
+    ["f8", "fh", "fi"],
+    ["f7", "f9", "fg"],
+]
+
+
+def save_npy(path, data):
+    """ Write the array to a temporary file first, so a killed task never leaves a partial output """
+
+    part_path = path + '.part'
+    with open(part_path, 'wb') as file:
+        np.save(file, data)
+    os.replace(part_path, path)
+
+
+def load_problem(problems_dir, namestem):
+    object = io_utils.optObject()
+    object.read_problem_from_file(os.path.join(problems_dir, namestem + '.tsp'))
+    return object
+
+
+def read_dimension(problem_path):
+    """ Read the DIMENSION entry of a TSPLIB file without parsing the rest of it """
+
+    with open(problem_path) as file:
+        for line in file:
+            key, _, value = line.partition(':')
+            if key.strip().upper() == 'DIMENSION':
+                return int(value.strip())
+            if key.strip().upper().endswith('SECTION'):
+                break
+    return 0
+
+
+def build_context(graph):
+    """ Build the feature context of a graph, using the cut pool if asked to """
+
+    pool = cut_pool.cutPool(CUT_POOL_PATH) if USE_CUT_POOL_FOR_FEATURES else None
+    return feature_context.FeatureContext(graph, cut_pool=pool, lp_solver=LP_SOLVER)
+
+
+def get_feature_path(training_dir, feature_name, namestem):
+    return os.path.join(training_dir, feature_name, namestem + '.npy')
+
+
+def get_labels_path(training_dir, namestem):
+    return os.path.join(training_dir, 'solutions', namestem + '.npy')
+
+
+def get_sample_weights_path(training_dir, namestem):
+    return os.path.join(training_dir, 'sample_weights', namestem + '.npy')
+
+
+def get_missing_ratio_names(training_dir, feature_names, namestem):
+    return [
+        feature_name for feature_name in feature_names
+        if feature_name in matrix_features._ratio_edge_features and not os.path.exists(
+            get_feature_path(training_dir, feature_name, namestem))
+    ]
+
+
+def compute_ratio_features(namestem, problems_dir, training_dir, ratio_names, logger,
+                           graph=None, context=None):
+    """ Features fa-ff all come from one pass over the weights """
+
+    if graph is None:
+        graph = load_problem(problems_dir, namestem).get_dense_graph()
+    logger.info(f'\t\t {namestem} features {", ".join(ratio_names)}: computing together')
+    data = matrix_features.compute_ratio_edges(graph, context=context)
+    for feature_name in ratio_names:
+        column = matrix_features._ratio_edge_features.index(feature_name)
+        save_npy(get_feature_path(training_dir, feature_name, namestem), data[:, column])
+
+
+def compute_feature(namestem, problems_dir, training_dir, feature_name, logger,
+                    graph=None, context=None, feature_kwargs=None):
+    if graph is None:
+        graph = load_problem(problems_dir, namestem).get_dense_graph()
+    context = context or build_context(graph)
+    logger.info(f'\t\t {namestem} feature {feature_name}: computing')
+    data = features.functions[f'compute_{feature_name}_edges'](graph, context=context,
+                                                              **(feature_kwargs or {}))
+    save_npy(get_feature_path(training_dir, feature_name, namestem), data)
+
+
+def compute_features(namestem, problems_dir, training_dir, feature_names, logger,
+                     feature_kwargs=None):
+    """ Compute the features in this process, sharing one context between them """
+
+    graph = load_problem(problems_dir, namestem).get_dense_graph()
+    context = build_context(graph)
+    feature_kwargs = feature_kwargs or {}
+    for feature_name in feature_names:
+        compute_feature(namestem, problems_dir, training_dir, feature_name, logger,
+                        graph=graph, context=context,
+                        feature_kwargs=feature_kwargs.get(feature_name))
+
+
+def get_feature_groups(feature_names):
+    """ Split the features into the groups of CONTEXT_GROUPS and singletons, in order """
+
+    groups = {}
+    for feature_name in feature_names:
+        key = next((tuple(group) for group in CONTEXT_GROUPS if feature_name in group),
+                   (feature_name,))
+        groups.setdefault(key, []).append(feature_name)
+    return list(groups.values())
+
+
+def compute_labels(namestem, problems_dir, training_dir, solutions_dir, logger,
+                   object=None):
+    object = object or load_problem(problems_dir, namestem)
+    graph = object.get_dense_graph()
+    logger.info(f'\t\t {namestem} solution: computing')
+    solution_path = os.path.join(solutions_dir, namestem + '.opt.tour')
+    if os.path.exists(solution_path):
+        tour = object.read_solution_from_file(solution_path)
+        edges = graph_utils.get_tour_edges(tour)
+        min_vertex = graph_utils.get_min_vertex(graph)
+        order = graph_utils.get_order(graph)
+        indices = edge_index.compute_edge_indices(edges, order, min_vertex)
+        data = np.zeros(graph_utils.get_size(graph))
+        data[indices] = 1
+    else:
+        pool = cut_pool.cutPool(CUT_POOL_PATH)
+        data, count = compute_solutions.enumerate_optimal_tsp_solutions(graph, cut_pool=pool)
+        logger.info(f'\t\t {namestem} solution: {count} optimal tours')
+    save_npy(get_labels_path(training_dir, namestem), data)
+
+
+def compute_sample_weights(namestem, problems_dir, training_dir, logger, graph=None):
+    if graph is None:
+        graph = load_problem(problems_dir, namestem).get_dense_graph()
+    logger.info(f'\t\t {namestem} sample weights: computing')
+    weights = np.array(graph_utils.get_weights(graph))
+    global_max = weights.max()
+    save_npy(get_sample_weights_path(training_dir, namestem), weights / global_max)
+
+
 def build_npy_data_for_problem(
     namestem,
     problems_dir,
@@ -29,55 +196,158 @@ def build_npy_data_for_problem(
     feature_names,
     logger,
 ):
+    """ Compute all the missing outputs for one problem in this process, sharing one context """
+
     logging.getLogger().setLevel(logging.INFO)
 
-    problem_path = os.path.join(problems_dir, namestem + '.tsp')
+    object = load_problem(problems_dir, namestem)
+    graph = object.get_dense_graph()
+    context = build_context(graph)
 
-    object = io_utils.optObject()
-    object.read_problem_from_file(problem_path)
-    graph = object.get_graph()
+    ratio_names = get_missing_ratio_names(training_dir, feature_names, namestem)
+    if ratio_names:
+        compute_ratio_features(namestem, problems_dir, training_dir, ratio_names, logger,
+                               graph=graph, context=context)
 
-    # Features
     for feature_name in feature_names:
-        feature_path = os.path.join(training_dir, feature_name, namestem + '.npy')
-        if os.path.exists(feature_path):
-            logger.info(f'\t\t Feature {feature_name}: skipping')
+        if os.path.exists(get_feature_path(training_dir, feature_name, namestem)):
+            logger.info(f'\t\t {namestem} feature {feature_name}: skipping')
         else:
-            logger.info(f'\t\t Feature {feature_name}: computing')
-            data = features.functions[f'compute_{feature_name}_edges'](graph)
-            np.save(feature_path, data)
-    
-    # Solution (npy)
-    solution_path = os.path.join(solutions_dir, namestem + '.opt.tour')
-    labels_path = os.path.join(training_dir, 'solutions', namestem + '.npy')
-    if os.path.exists(labels_path):
-        logger.info(f'\t\t Solution: skipping')
+            compute_feature(namestem, problems_dir, training_dir, feature_name, logger,
+                            graph=graph, context=context)
+
+    if os.path.exists(get_labels_path(training_dir, namestem)):
+        logger.info(f'\t\t {namestem} solution: skipping')
     else:
-        logger.info(f'\t\t Solution: computing')
-        if os.path.exists(solution_path):
-            tour = object.read_solution_from_file(solution_path)
-            edges = graph_utils.get_tour_edges(tour)
-            min_vertex = np.min(graph.nodes)
-            order = len(graph.nodes)
-            indices = [
-                graph_utils.compute_vector_index_symmetric(edge, order, min_vertex)
-                for edge in edges
-            ]
-            data = np.zeros(len(graph.edges))
-            data[indices] = 1
-        else:
-            data = compute_solutions.get_all_optimal_tsp_solutions(graph)
-        np.save(labels_path, data)
-    
-    # Sample weights
-    sample_weights_path = os.path.join(training_dir, 'sample_weights', namestem + '.npy')
-    if os.path.exists(sample_weights_path):
-        logger.info(f'\t\t Sample weights: skipping')
+        compute_labels(namestem, problems_dir, training_dir, solutions_dir, logger, object=object)
+
+    if os.path.exists(get_sample_weights_path(training_dir, namestem)):
+        logger.info(f'\t\t {namestem} sample weights: skipping')
     else:
-        logger.info(f'\t\t Sample weights: computing')
-        weights = np.array(graph_utils.get_weights(graph))
-        global_max = weights.max()
-        np.save(sample_weights_path, weights / global_max)
+        compute_sample_weights(namestem, problems_dir, training_dir, logger, graph=graph)
+
+
+def build_task(name, func, args, dimension, factor=1, kwargs=None):
+    """ A unit of work for the scheduler, cost estimated from the instance size """
+
+    return {
+        'name': name,
+        'func': func,
+        'args': args,
+        'kwargs': kwargs or {},
+        'cost': factor * dimension ** 2,
+    }
+
+
+def build_tasks_for_problem(namestem, problems_dir, training_dir, solutions_dir,
+                            feature_names, logger):
+    """ Build a task for every missing output of one problem """
+    """ Features sharing a context intermediate go in one task, costed as their sum """
+
+    dimension = read_dimension(os.path.join(problems_dir, namestem + '.tsp'))
+    prefix = f'{os.path.basename(problems_dir)}/{namestem}'
+    tasks = []
+
+    ratio_names = get_missing_ratio_names(training_dir, feature_names, namestem)
+    if ratio_names:
+        tasks.append(build_task(
+            f'{prefix} {"-".join(ratio_names)}',
+            compute_ratio_features,
+            (namestem, problems_dir, training_dir, ratio_names, logger),
+            dimension,
+        ))
+
+    missing_names = [
+        feature_name for feature_name in feature_names
+        if feature_name not in matrix_features._ratio_edge_features and not os.path.exists(
+            get_feature_path(training_dir, feature_name, namestem))
+    ]
+    for group in get_feature_groups(missing_names):
+        factor = sum(LP_COST_FACTOR if feature_name in LP_FEATURES else 1
+                     for feature_name in group)
+        tasks.append(build_task(
+            f'{prefix} {"-".join(group)}',
+            compute_features,
+            (namestem, problems_dir, training_dir, group, logger),
+            dimension,
+            factor,
+            {'feature_kwargs': TASK_FEATURE_KWARGS},
+        ))
+
+    if not os.path.exists(get_labels_path(training_dir, namestem)):
+        has_tour = os.path.exists(os.path.join(solutions_dir, namestem + '.opt.tour'))
+        tasks.append(build_task(
+            f'{prefix} solution',
+            compute_labels,
+            (namestem, problems_dir, training_dir, solutions_dir, logger),
+            dimension,
+            1 if has_tour else LP_COST_FACTOR,
+        ))
+
+    if not os.path.exists(get_sample_weights_path(training_dir, namestem)):
+        tasks.append(build_task(
+            f'{prefix} sample weights',
+            compute_sample_weights,
+            (namestem, problems_dir, training_dir, logger),
+            dimension,
+        ))
+
+    return tasks
+
+
+def run_task(task, logger):
+    """ Run a task in a worker process, exiting nonzero if it fails """
+
+    logging.getLogger().setLevel(logging.INFO)
+    start = time.time()
+    try:
+        task['func'](*task['args'], **task['kwargs'])
+    except Exception:
+        logger.error(f'Task {task["name"]} failed after {time.time() - start:.2f}s\n'
+                     + traceback.format_exc())
+        sys.exit(1)
+    logger.info(f'Task {task["name"]} finished in {time.time() - start:.2f}s')
+
+
+def run_tasks(tasks, logger, num_workers=NUM_WORKERS, timeout=TASK_TIMEOUT):
+    """ Run the tasks in separate processes, most expensive first """
+    """ A task that crashes or times out is logged and skipped, the rest carry on """
+
+    pending = sorted(tasks, key=lambda task: task['cost'])
+    running, failed = {}, []
+    completed = 0
+
+    while pending or running:
+        while pending and len(running) < num_workers:
+            task = pending.pop()
+            process = Process(target=run_task, args=(task, logger))
+            process.start()
+            running[process] = (task, time.time())
+
+        time.sleep(0.05)
+
+        for process, (task, start) in list(running.items()):
+            elapsed = time.time() - start
+            if not process.is_alive():
+                process.join()
+                if process.exitcode != 0:
+                    logger.error(f'Task {task["name"]} exited with code {process.exitcode}')
+                    failed.append(task['name'])
+                else:
+                    completed += 1
+                del running[process]
+            elif timeout is not None and elapsed > timeout:
+                process.terminate()
+                process.join()
+                logger.error(f'Task {task["name"]} timed out after {elapsed:.2f}s')
+                failed.append(task['name'])
+                del running[process]
+
+    logger.info(f'{completed} tasks finished, {len(failed)} failed')
+    for name in failed:
+        logger.info(f'\t Failed: {name}')
+    return failed
+
 
 if __name__ == '__main__':
     ask_to_clear_directories([SOLUTIONS_PATH, NPY_PATH])
@@ -85,8 +355,9 @@ if __name__ == '__main__':
     logger = setup_custom_logger(log_path, 'logger')
     logger.info('Started npy data computation')
     problem_classes = os.listdir(PROBLEMS_PATH)
+    tasks = []
     for i, problem_class in enumerate(problem_classes):
-        logger.info(f'({i + 1}/{len(problem_classes)}) Starting problem class {problem_class}')
+        logger.info(f'({i + 1}/{len(problem_classes)}) Scheduling problem class {problem_class}')
         problems_class_path = os.path.join(PROBLEMS_PATH, problem_class)
         training_class_path = os.path.join(NPY_PATH, problem_class)
         solutions_class_path = os.path.join(SOLUTIONS_PATH, problem_class)
@@ -99,21 +370,23 @@ if __name__ == '__main__':
         build_directory(os.path.join(training_class_path, 'solutions'))
         build_directory(os.path.join(training_class_path, 'sample_weights'))
 
-        # Process individual problems
+        # Only the outputs that are missing become tasks, so reruns resume
         problem_filenames = sorted(os.listdir(problems_class_path))
-        for i, problem_filename in enumerate(problem_filenames):
-            logger.info(f'\t({i + 1}/{len(problem_filenames)}) Starting {problem_filename}')
-            p = Process(
-                target=build_npy_data_for_problem,
-                args=(
-                    problem_filename.split('.')[0],
-                    problems_class_path,
-                    training_class_path,
-                    solutions_class_path,
-                    FEATURE_DIRS,
-                    logger,
-                )
+        for problem_filename in problem_filenames:
+            tasks += build_tasks_for_problem(
+                problem_filename.split('.')[0],
+                problems_class_path,
+                training_class_path,
+                solutions_class_path,
+                FEATURE_DIRS,
+                logger,
             )
-            p.start()
-            p.join()
+    logger.info(f'Running {len(tasks)} tasks on {NUM_WORKERS} workers')
+    run_tasks(tasks, logger)
+
+    # Consolidate the finished instances into each class store
+    for problem_class in problem_classes:
+        store, appended = feature_store.update_store(
+            os.path.join(NPY_PATH, problem_class), FEATURE_DIRS, LABEL_DIR, WEIGHT_DIR)
+        logger.info(f'Store {problem_class}: appended {len(appended)}, holds {len(store.name_stems)}')
     logger.info('Done')
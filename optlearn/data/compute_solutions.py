@@ -5,6 +5,8 @@ from optlearn import io_utils
 from optlearn import plotting
 
 from optlearn.mip import mip_model
+from optlearn.mip import cut_pool as cut_pools
+from optlearn.mip import warm_start as warm_starts
 
 
 def solve_problem(problem: mip_model.tspProblem):
@@ -39,22 +41,51 @@ def solve_problem_without_previous_solutions(problem, solutions):
     return solve_problem(problem)
 
 
-def get_all_optimal_tsp_solutions(graph, solver="scip"):
-    """ Get all optimal solutions for the given problem """
-    
-    problem = mip_model.tspProblem(graph, solver=solver, var_type="binary")
-    solutions = [solve_problem(problem=problem)]
-    optimal_value, global_optimum = (problem.get_objective_value(), ) * 2 
-    
-    while optimal_value == global_optimum:
-        problem = mip_model.tspProblem(graph, solver=solver, var_type="binary")
-        # problem._funcs["add_solution"](problem.problem, solutions[0])
-        # problem = add_bound(problem, global_optimum)
-        solution = solve_problem_without_previous_solutions(problem=problem,
-                                                            solutions=solutions)
-        optimal_value = problem.get_objective_value()
-        
-        if optimal_value == global_optimum:
+def get_new_optimal_solutions(problem, optimal_value, known):
+    """ Get the stored solutions with the optimal value that are not yet known """
+
+    values, objectives = problem.get_solution_pool()
+    solutions = []
+    for (solution, objective) in zip(values, objectives):
+        solution = np.rint(solution).astype(int)
+        key = tuple(np.flatnonzero(solution).tolist())
+        if np.isclose(objective, optimal_value) and key not in known:
+            known.add(key)
             solutions.append(solution)
+    return solutions
+
+
+def enumerate_optimal_tsp_solutions(graph, solver="scip", cut_pool=None, warm_start="christofides"):
+    """ Get the union of all optimal solutions and the number of optimal solutions """
+    """ One model is kept, after each solve the optimal solutions in the solution store """
+    """ are excluded by no-good cuts and the objective is constrained to the optimal value """
+
+    cut_pool = cut_pool or cut_pools.cutPool()
+    problem = mip_model.tspProblem(graph, solver=solver, var_type="binary", cut_pool=cut_pool,
+                                   warm_start=warm_start)
+    problem.optimise()
+    optimal_value, known = problem.get_objective_value(), set()
+    new_solutions = get_new_optimal_solutions(problem, optimal_value, known)
+    solutions = list(new_solutions)
+    problem.free_transform()
+    problem.set_cutoff(np.inf)
+    problem.set_objective_bound(warm_starts.get_cutoff(optimal_value))
+
+    while len(new_solutions) > 0:
+        problem = add_solutions_as_constraints(problem, new_solutions)
+        problem.optimise()
+        if not problem.check_solution():
+            break
+        new_solutions = get_new_optimal_solutions(problem, optimal_value, known)
+        solutions += new_solutions
+        problem.free_transform()
+
+    return (np.sum(solutions, axis=0) > 0.1).astype(int), len(solutions)
+
+
+def get_all_optimal_tsp_solutions(graph, solver="scip", cut_pool=None, warm_start="christofides"):
+    """ Get all optimal solutions for the given problem """
 
-    return (np.sum(solutions, axis=0) > 0.1).astype(int)
+    labels, _ = enumerate_optimal_tsp_solutions(graph, solver=solver, cut_pool=cut_pool,
+                                                warm_start=warm_start)
+    return labels
@@ -10,6 +10,7 @@ from optlearn import graph_utils
 from optlearn.feature import features
 from optlearn.feature import feature_utils
 from optlearn.data import compute_solutions
+from optlearn.data import feature_store
 
 from sklearn.model_selection import train_test_split
 
@@ -25,28 +26,60 @@ class DataLoader():
         self.feature_path_tuples = []
         self.label_paths = []
         self.sample_weight_paths = []
+        self.instances = []
+        self.stores = {}
         num_total_files = 0
         print('Input files per class:')
         for class_name, name_stems in name_stems_per_class.items():
             class_path = os.path.join(NPY_PATH, class_name)
+            store = feature_store.get_store(class_path, FEATURE_DIRS)
+            self.stores[class_name] = store
             num_class_files = 0
             # For empty name_stems lists, default to loading all name stems in the <class>/solutions directory
             if name_stems == []:
-                name_stems = sorted([fname[:-4] for fname in os.listdir(os.path.join(class_path, LABEL_DIR))])
+                name_stems = self.get_class_name_stems(class_path, store)
             for name_stem in name_stems:
-                file_name = name_stem + '.npy'
-                self.feature_path_tuples.append(tuple(
-                    os.path.join(class_path, feature_dir, file_name)
-                    for feature_dir in FEATURE_DIRS
-                ))
-                self.label_paths.append(os.path.join(class_path, LABEL_DIR, file_name))
-                self.sample_weight_paths.append(os.path.join(class_path, WEIGHT_DIR, file_name))
+                feature_paths, label_path, weight_path = feature_store.get_instance_paths(
+                    class_path, name_stem, FEATURE_DIRS, LABEL_DIR, WEIGHT_DIR)
+                self.feature_path_tuples.append(tuple(feature_paths))
+                self.label_paths.append(label_path)
+                self.sample_weight_paths.append(weight_path)
+                self.instances.append((class_name, name_stem))
                 num_class_files += 1
             print(f'{class_name}: {num_class_files}')
             num_total_files += num_class_files
         print('-')
         print(f'TOTAL: {num_total_files}')
 
+    def get_class_name_stems(self, class_path, store):
+        """ Get every name stem of the class, from the store and the loose .npy files """
+
+        name_stems = set() if store is None else set(store.name_stems)
+        label_path = os.path.join(class_path, LABEL_DIR)
+        if os.path.exists(label_path):
+            name_stems.update(fname[:-4] for fname in os.listdir(label_path) if fname.endswith('.npy'))
+        return sorted(name_stems)
+
+    def get_store(self, i):
+        """ Get the store holding the i-th instance, or None if it is only in .npy files """
+
+        class_name, name_stem = self.instances[i]
+        store = self.stores[class_name]
+        if store is not None and store.has_instance(name_stem):
+            return store
+        return None
+
+    def subset(self, indices):
+        """ Get a loader over the given instances only, nothing is read until asked for """
+
+        loader = DataLoader.__new__(DataLoader)
+        loader.stores = self.stores
+        loader.instances = [self.instances[i] for i in indices]
+        loader.feature_path_tuples = [self.feature_path_tuples[i] for i in indices]
+        loader.label_paths = [self.label_paths[i] for i in indices]
+        loader.sample_weight_paths = [self.sample_weight_paths[i] for i in indices]
+        return loader
+
     # def train_test_val_split(self, train=0.7, test=0.15, val=0.15):
     #     """ Generate the train, test and validation sets """
 
@@ -77,18 +110,39 @@ class DataLoader():
         labels = self.load_labels(pair[1])
         return features, labels
         
+    def load_feature_columns(self):
+        """ Load each instance as a list of feature columns, store columns are memory-mapped views """
+
+        columns = []
+        for i, feature_path_tuple in enumerate(self.feature_path_tuples):
+            store = self.get_store(i)
+            if store is None:
+                columns.append([np.load(feature_path) for feature_path in feature_path_tuple])
+            else:
+                columns.append([store.get_instance_column(feature_name, self.instances[i][1])
+                                for feature_name in store.feature_names])
+        return columns
+
     def load_features(self):
+        """ Load each instance as an (E, F) array, store instances are memory-mapped views """
+
         return [
             np.stack([np.load(feature_path) for feature_path in feature_path_tuple], axis=1)
-            for feature_path_tuple in self.feature_path_tuples
+            if self.get_store(i) is None
+            else self.get_store(i).get_instance_features(self.instances[i][1])
+            for i, feature_path_tuple in enumerate(self.feature_path_tuples)
         ]
 
     def load_labels(self):
         return [
-            np.load(label_path) for label_path in self.label_paths
+            np.load(label_path) if self.get_store(i) is None
+            else self.get_store(i).get_instance_labels(self.instances[i][1])
+            for i, label_path in enumerate(self.label_paths)
         ]
     
     def load_weights(self):
         return [
-            np.load(sample_weight_path) for sample_weight_path in self.sample_weight_paths
+            np.load(sample_weight_path) if self.get_store(i) is None
+            else self.get_store(i).get_instance_weights(self.instances[i][1])
+            for i, sample_weight_path in enumerate(self.sample_weight_paths)
         ]
@@ -0,0 +1,189 @@
+import os
+import json
+
+import numpy as np
+
+
+STORE_DIR = 'store'
+INDEX_NAME = 'index.json'
+DTYPE = np.float64
+FEATURES_NAME = 'features'
+LAYOUT = 'rows'
+
+
+class featureStore():
+    """ A memory-mapped store of the training data of one problem class """
+    """ The features live in one row-major (rows, features) raw file, the labels and
+        sample weights in one raw file each, with the rows of every instance found
+        through the offset index, so an instance is a view of contiguous rows """
+
+    def __init__(self, path, feature_names):
+        """ Setup the store, reading the index if there is one """
+
+        self.path = path
+        self.feature_names = list(feature_names)
+        self.column_names = [FEATURES_NAME, 'labels', 'sample_weights']
+        self._maps = {}
+        self.read_index()
+
+    def get_index_path(self):
+        return os.path.join(self.path, INDEX_NAME)
+
+    def get_column_path(self, column_name):
+        return os.path.join(self.path, column_name + '.dat')
+
+    def read_index(self):
+        """ Read the instance offsets, the index is the only record of what is stored """
+
+        self.name_stems, self.offsets, self.lengths = [], [], []
+        if os.path.exists(self.get_index_path()):
+            with open(self.get_index_path()) as file:
+                index = json.load(file)
+            self.check_feature_names(index['feature_names'])
+            self.check_layout(index.get('layout'))
+            self.name_stems = index['name_stems']
+            self.offsets = index['offsets']
+            self.lengths = index['lengths']
+        self.positions = {name_stem: i for i, name_stem in enumerate(self.name_stems)}
+        self._maps = {}
+
+    def write_index(self):
+        """ Replace the index in one step, so a crash mid-append keeps the old one """
+
+        index = {
+            'feature_names': self.feature_names,
+            'layout': LAYOUT,
+            'name_stems': self.name_stems,
+            'offsets': self.offsets,
+            'lengths': self.lengths,
+        }
+        part_path = self.get_index_path() + '.part'
+        with open(part_path, 'w') as file:
+            json.dump(index, file)
+        os.replace(part_path, self.get_index_path())
+
+    def check_feature_names(self, feature_names):
+        if list(feature_names) != self.feature_names:
+            raise ValueError("Store at {} holds features {}, not {}!".format(
+                self.path, feature_names, self.feature_names))
+
+    def check_layout(self, layout):
+        if layout != LAYOUT:
+            raise ValueError("Store at {} has an old layout, rebuild it!".format(self.path))
+
+    def get_total_rows(self):
+        if len(self.name_stems) == 0:
+            return 0
+        return self.offsets[-1] + self.lengths[-1]
+
+    def has_instance(self, name_stem):
+        return name_stem in self.positions
+
+    def append_instance(self, name_stem, features, labels, sample_weights):
+        """ Append the (E, F) features, labels and sample weights of one instance """
+
+        if self.has_instance(name_stem):
+            raise ValueError("Instance {} is already in the store!".format(name_stem))
+        features = np.asarray(features, dtype=DTYPE).reshape(len(labels), -1)
+        if features.shape[1] != len(self.feature_names):
+            raise ValueError("Expected {} feature columns, got {}!".format(
+                len(self.feature_names), features.shape[1]))
+        columns = [features, labels, sample_weights]
+        widths = [len(self.feature_names), 1, 1]
+        total = self.get_total_rows()
+        if not os.path.exists(self.path):
+            os.mkdir(self.path)
+        for column_name, column, width in zip(self.column_names, columns, widths):
+            with open(self.get_column_path(column_name), 'ab') as file:
+                file.truncate(total * width * np.dtype(DTYPE).itemsize)
+                file.write(np.ascontiguousarray(column, dtype=DTYPE).tobytes())
+        self.name_stems.append(name_stem)
+        self.offsets.append(total)
+        self.lengths.append(len(labels))
+        self.positions[name_stem] = len(self.name_stems) - 1
+        self.write_index()
+        self._maps = {}
+
+    def get_column(self, column_name):
+        """ Memory-map a whole column, only the pages that are read get loaded """
+        """ The features column is the (rows, features) matrix """
+
+        if column_name not in self._maps:
+            shape = (self.get_total_rows(),)
+            if column_name == FEATURES_NAME:
+                shape = shape + (len(self.feature_names),)
+            self._maps[column_name] = np.memmap(self.get_column_path(column_name),
+                                                dtype=DTYPE,
+                                                mode='r',
+                                                shape=shape)
+        return self._maps[column_name]
+
+    def get_instance_slice(self, name_stem):
+        """ Get the rows of the given instance """
+
+        position = self.positions[name_stem]
+        start = self.offsets[position]
+        return slice(start, start + self.lengths[position])
+
+    def get_instance_column(self, column_name, name_stem):
+        """ Get a view of one column of one instance, without copying """
+        """ A feature column is a strided view of the features matrix """
+
+        if column_name in self.feature_names:
+            return self.get_instance_features(name_stem)[:, self.feature_names.index(column_name)]
+        return self.get_column(column_name)[self.get_instance_slice(name_stem)]
+
+    def get_instance_features(self, name_stem):
+        """ Get a view of the (E, F) feature rows of one instance, without copying """
+
+        return self.get_column(FEATURES_NAME)[self.get_instance_slice(name_stem)]
+
+    def get_instance_labels(self, name_stem):
+        return self.get_instance_column('labels', name_stem)
+
+    def get_instance_weights(self, name_stem):
+        return self.get_instance_column('sample_weights', name_stem)
+
+
+def get_store_path(class_path):
+    return os.path.join(class_path, STORE_DIR)
+
+
+def get_store(class_path, feature_names):
+    """ Get the store of a class directory, or None if there is none yet """
+
+    path = get_store_path(class_path)
+    if not os.path.exists(os.path.join(path, INDEX_NAME)):
+        return None
+    return featureStore(path, feature_names)
+
+
+def get_instance_paths(class_path, name_stem, feature_names, label_dir, weight_dir):
+    """ Get the per-instance .npy paths of the features, labels and sample weights """
+
+    file_name = name_stem + '.npy'
+    feature_paths = [os.path.join(class_path, feature_name, file_name)
+                     for feature_name in feature_names]
+    label_path = os.path.join(class_path, label_dir, file_name)
+    weight_path = os.path.join(class_path, weight_dir, file_name)
+    return feature_paths, label_path, weight_path
+
+
+def update_store(class_path, feature_names, label_dir, weight_dir):
+    """ Append every instance with complete .npy outputs that is not yet in the store """
+
+    store = featureStore(get_store_path(class_path), feature_names)
+    label_path = os.path.join(class_path, label_dir)
+    name_stems = sorted([fname[:-4] for fname in os.listdir(label_path) if fname.endswith('.npy')])
+    appended = []
+    for name_stem in name_stems:
+        if store.has_instance(name_stem):
+            continue
+        feature_paths, label_path, weight_path = get_instance_paths(
+            class_path, name_stem, feature_names, label_dir, weight_dir)
+        if not all(os.path.exists(path) for path in feature_paths + [weight_path]):
+            continue
+        features = np.stack([np.load(path) for path in feature_paths], axis=1)
+        store.append_instance(name_stem, features, np.load(label_path), np.load(weight_path))
+        appended.append(name_stem)
+    return store, appended
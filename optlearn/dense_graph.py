@@ -0,0 +1,308 @@
+import math
+
+import numpy as np
+
+from optlearn import edge_index
+
+
+_vectorised_distances = {
+    "EUC_2D": "euclidean",
+    "EUC_3D": "euclidean",
+    "CEIL_2D": "ceil_euclidean",
+}
+
+
+def nint(array):
+    """ Round an array of distances to the nearest integer, as TSPLIB does """
+
+    return np.floor(array + 0.5)
+
+
+def coords_to_array(coord_dict, nodes):
+    """ Stack the coordinates of the given nodes into an (n, d) array """
+
+    return np.array([coord_dict[node] for node in nodes], dtype=np.float64)
+
+
+def compute_euclidean_matrix(coords, rounder=nint):
+    """ Compute the rounded euclidean distance matrix for the given coordinates """
+
+    deltas = coords[:, None, :] - coords[None, :, :]
+    return rounder(np.sqrt(np.sum(deltas * deltas, axis=-1)))
+
+
+def compute_weight_matrix_slow(problem, nodes, symmetric=True):
+    """ Compute the weight matrix by querying the problem one pair at a time """
+
+    order = len(nodes)
+    matrix = np.zeros((order, order))
+    for i in range(order):
+        start = i + 1 if symmetric else 0
+        for j in range(start, order):
+            matrix[i, j] = problem.get_weight(nodes[i], nodes[j])
+            if symmetric:
+                matrix[j, i] = matrix[i, j]
+    return matrix
+
+
+def compute_problem_matrix(problem, nodes, symmetric=True):
+    """ Compute the weight matrix for a tsplib95 problem """
+
+    distance = _vectorised_distances.get(problem.edge_weight_type)
+    if distance is None or not problem.node_coords:
+        return compute_weight_matrix_slow(problem, nodes, symmetric)
+
+    coords = coords_to_array(problem.node_coords, nodes)
+    if distance == "ceil_euclidean":
+        return compute_euclidean_matrix(coords, rounder=np.ceil)
+    return compute_euclidean_matrix(coords)
+
+
+def from_tsplib_problem(problem, dtype=np.float64):
+    """ Build a dense graph directly from a tsplib95 problem, without networkx """
+
+    nodes = sorted(problem.get_nodes())
+    symmetric = problem.is_symmetric()
+    matrix = compute_problem_matrix(problem, nodes, symmetric)
+    graph = DenseTSPGraph(matrix, min_vertex=nodes[0], symmetric=symmetric, dtype=dtype)
+    if problem.node_coords:
+        graph.graph["coord_dict"] = problem.node_coords
+    return graph
+
+
+def from_networkx(graph, weight="weight", dtype=np.float64):
+    """ Build a dense graph from a networkx graph with contiguous integer vertices """
+
+    import networkx as nx
+
+    nodes = sorted(graph.nodes)
+    matrix = nx.to_numpy_array(graph, nodelist=nodes, weight=weight, nonedge=np.inf)
+    dense_graph = DenseTSPGraph(matrix,
+                                min_vertex=nodes[0],
+                                symmetric=not graph.is_directed(),
+                                dtype=dtype
+    )
+    dense_graph.graph.update(graph.graph)
+    return dense_graph
+
+
+class DenseTSPGraph():
+    """ A complete TSP graph stored as a distance matrix, with absent edges at infinity """
+
+    def __init__(self, matrix, min_vertex=1, symmetric=True, dtype=np.float64):
+        """ Setup the graph, the diagonal is never treated as an edge """
+
+        self.matrix = np.array(matrix, dtype=dtype)
+        np.fill_diagonal(self.matrix, np.inf)
+        self.min_vertex = int(min_vertex)
+        self.symmetric = symmetric
+        self.graph = {}
+        self._cache = {}
+
+    def __len__(self):
+        return self.order
+
+    def _clear_cache(self):
+        """ Drop everything derived from the matrix """
+
+        self._cache = {}
+
+    def _cached(self, key, func):
+        """ Compute and remember the given derived quantity """
+
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    @property
+    def order(self):
+        """ The number of vertices """
+
+        return self.matrix.shape[0]
+
+    @property
+    def size(self):
+        """ The number of (present) edges """
+
+        return len(self.edge_index[0])
+
+    @property
+    def nodes(self):
+        """ The vertex labels, in ascending order """
+
+        return np.arange(self.min_vertex, self.min_vertex + self.order)
+
+    def is_directed(self):
+        """ Check if the graph is directed """
+
+        return not self.symmetric
+
+    def _compute_canonical_index(self):
+        """ Compute the row and column indices of every vertex pair in the edge order """
+
+        return edge_index.get_canonical_pairs(self.order, self.symmetric)
+
+    @property
+    def canonical_index(self):
+        """ Zero-based (rows, cols) of every possible edge in the canonical order """
+
+        return self._cached("canonical_index", self._compute_canonical_index)
+
+    def _compute_edge_index(self):
+        """ Compute the row and column indices of the present edges """
+
+        rows, cols = self.canonical_index
+        present = np.isfinite(self.matrix[rows, cols])
+        if np.all(present):
+            return rows, cols
+        return rows[present], cols[present]
+
+    @property
+    def edge_index(self):
+        """ Zero-based (rows, cols) of the present edges in the canonical order """
+
+        return self._cached("edge_index", self._compute_edge_index)
+
+    @property
+    def edges(self):
+        """ The present edges as an (E, 2) array of vertex labels """
+
+        rows, cols = self.edge_index
+        return np.stack([rows, cols], axis=1) + self.min_vertex
+
+    @property
+    def weights(self):
+        """ The weights of the present edges, in the canonical order """
+
+        return self.matrix[self.edge_index]
+
+    def canonical_positions(self, rows, cols):
+        """ Compute the positions of zero-based vertex pairs in the canonical order """
+
+        return edge_index.compute_positions(rows, cols, self.order, self.symmetric)
+
+    def edge_positions(self, edges):
+        """ Compute the positions of the given edges in the present edge order """
+
+        edges = edge_index.as_edge_array(edges) - self.min_vertex
+        positions = self.canonical_positions(edges[:, 0], edges[:, 1])
+        if self.size == len(self.canonical_index[0]):
+            return positions
+        present = self.canonical_positions(*self.edge_index)
+        return np.searchsorted(present, positions)
+
+    def vertex_to_index(self, vertex):
+        """ Convert a vertex label to its row in the matrix """
+
+        return int(vertex) - self.min_vertex
+
+    def get_edge_weight(self, vertex_a, vertex_b):
+        """ Get the weight between two vertices, np.inf if there is no edge """
+
+        return self.matrix[self.vertex_to_index(vertex_a), self.vertex_to_index(vertex_b)]
+
+    def get_edges_weights(self, edges):
+        """ Get the weights of an array of edges """
+
+        edges = edge_index.as_edge_array(edges) - self.min_vertex
+        return self.matrix[edges[:, 0], edges[:, 1]]
+
+    def get_neighbours(self, vertex):
+        """ Get the vertices joined to the given vertex """
+
+        row = self.matrix[self.vertex_to_index(vertex)]
+        return np.flatnonzero(np.isfinite(row)) + self.min_vertex
+
+    def get_incident_weights(self, vertex, out=True):
+        """ Get the weights of the edges leaving (or entering) the given vertex """
+
+        index = self.vertex_to_index(vertex)
+        row = self.matrix[index] if out else self.matrix[:, index]
+        return row[np.isfinite(row)]
+
+    def get_degrees(self):
+        """ Get the degree of every vertex """
+
+        return np.isfinite(self.matrix).sum(axis=1)
+
+    def copy(self):
+        """ Copy the graph, including its metadata """
+
+        new_graph = DenseTSPGraph(self.matrix,
+                                  min_vertex=self.min_vertex,
+                                  symmetric=self.symmetric,
+                                  dtype=self.matrix.dtype
+        )
+        new_graph.graph = dict(self.graph)
+        return new_graph
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def remove_edges_from(self, edges):
+        """ Remove the given edges by setting their weights to infinity """
+
+        edges = edge_index.as_edge_array(edges) - self.min_vertex
+        self.matrix[edges[:, 0], edges[:, 1]] = np.inf
+        if self.symmetric:
+            self.matrix[edges[:, 1], edges[:, 0]] = np.inf
+        self._clear_cache()
+
+    def minimum_spanning_tree_edges(self):
+        """ Compute the minimum spanning forest edges with an O(n^2) Prim """
+
+        return minimum_spanning_tree_edges(self.matrix) + self.min_vertex
+
+    def to_networkx(self):
+        """ Build the equivalent networkx graph, avoid this for large graphs """
+
+        import networkx as nx
+
+        graph = nx.Graph() if self.symmetric else nx.DiGraph()
+        graph.graph.update(self.graph)
+        graph.add_nodes_from(self.nodes.tolist())
+        edges = self.edges.tolist()
+        weights = self.weights.tolist()
+        graph.add_weighted_edges_from([(a, b, w) for ((a, b), w) in zip(edges, weights)])
+        return graph
+
+
+def minimum_spanning_tree_edges(matrix, removed=None):
+    """ Compute the zero-based minimum spanning forest edges of a symmetric matrix """
+    """ Entries marked in the boolean removed mask are treated as absent """
+
+    order = matrix.shape[0]
+    in_tree = np.zeros(order, dtype=bool)
+    best_weights = np.full(order, np.inf)
+    best_parents = np.full(order, -1)
+    edges = []
+
+    vertex = 0
+    for step in range(order):
+        in_tree[vertex] = True
+        if best_parents[vertex] >= 0:
+            edges.append(order_pair(best_parents[vertex], vertex))
+        row = matrix[vertex]
+        if removed is not None:
+            row = np.where(removed[vertex], np.inf, row)
+        improved = (~in_tree) & (row < best_weights)
+        best_weights[improved] = row[improved]
+        best_parents[improved] = vertex
+        candidates = np.where(in_tree, np.inf, best_weights)
+        vertex = int(np.argmin(candidates))
+        if math.isinf(candidates[vertex]):
+            remaining = np.flatnonzero(~in_tree)
+            if len(remaining) == 0:
+                break
+            vertex = int(remaining[0])
+            best_parents[vertex] = -1
+
+    return np.array(edges, dtype=int).reshape(-1, 2)
+
+
+def order_pair(i, j):
+    """ Return (i, j) if i < j, otherwise (j, i) """
+
+    if i < j:
+        return (int(i), int(j))
+    return (int(j), int(i))
@@ -0,0 +1,93 @@
+import numpy as np
+
+
+def get_canonical_size(order, symmetric=True):
+    """ Get the number of possible edges in the canonical edge order """
+
+    if symmetric:
+        return order * (order - 1) // 2
+    return order * (order - 1)
+
+
+def compute_positions(rows, cols, order, symmetric=True):
+    """ Compute the positions of zero-based vertex pairs in the canonical edge order """
+    """ The order is row-major over the upper triangle if symmetric, otherwise over
+        every off-diagonal pair, as in complete tsplib graphs """
+
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    if symmetric:
+        rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+        return rows * (2 * order - rows - 1) // 2 + (cols - rows - 1)
+    return rows * (order - 1) + cols - (cols > rows)
+
+
+def compute_pairs(positions, order, symmetric=True):
+    """ Compute the zero-based (rows, cols) at the given canonical positions """
+
+    positions = np.asarray(positions)
+    if symmetric:
+        rows = np.arange(order)
+        offsets = rows * (2 * order - rows - 1) // 2
+        rows = np.searchsorted(offsets, positions, side="right") - 1
+        return rows, positions - offsets[rows] + rows + 1
+    rows, remainders = np.divmod(positions, order - 1)
+    return rows, remainders + (remainders >= rows)
+
+
+def as_edge_array(edges):
+    """ Convert any collection of edge pairs to an (E, 2) integer array """
+
+    if not isinstance(edges, np.ndarray):
+        edges = list(edges)
+    return np.asarray(edges, dtype=int).reshape(-1, 2)
+
+
+def check_edges(edges, order, min_vertex=1):
+    """ Check that the given edges fit the edge vector layout """
+
+    if np.any(edges < min_vertex) or np.any(edges >= order + min_vertex):
+        raise ValueError("Edge vertices outside of {} to {}!".format(
+            min_vertex, order + min_vertex - 1))
+    if np.any(edges[:, 0] == edges[:, 1]):
+        raise ValueError("Self-loops have no index in the edge vector!")
+
+
+def compute_edge_indices(edges, order, min_vertex=1, symmetric=True):
+    """ Compute the edge vector index of every edge in an (E, 2) array of vertices """
+    """ Symmetric edges may be given either way around """
+
+    edges = as_edge_array(edges)
+    check_edges(edges, order, min_vertex)
+    edges = edges - min_vertex
+    return compute_positions(edges[:, 0], edges[:, 1], order, symmetric)
+
+
+def compute_edge_index(edge, order, min_vertex=1, symmetric=True):
+    """ Compute the edge vector index of a single edge """
+
+    return int(compute_edge_indices([edge], order, min_vertex, symmetric)[0])
+
+
+def compute_index_edges(indices, order, min_vertex=1, symmetric=True):
+    """ Compute the (E, 2) array of vertices at the given edge vector indices """
+
+    indices = np.asarray(indices, dtype=int).reshape(-1)
+    size = get_canonical_size(order, symmetric)
+    if np.any(indices < 0) or np.any(indices >= size):
+        raise ValueError("Edge indices outside of 0 to {}!".format(size - 1))
+    rows, cols = compute_pairs(indices, order, symmetric)
+    return np.stack([rows, cols], axis=1) + min_vertex
+
+
+def compute_index_edge(index, order, min_vertex=1, symmetric=True):
+    """ Compute the edge at a single edge vector index """
+
+    return tuple(compute_index_edges([index], order, min_vertex, symmetric)[0].tolist())
+
+
+def get_canonical_pairs(order, symmetric=True):
+    """ Get the zero-based (rows, cols) of every edge in the canonical order """
+
+    if symmetric:
+        return np.triu_indices(order, 1)
+    return np.nonzero(~np.eye(order, dtype=bool))
@@ -31,8 +31,9 @@ def load_solution(solution_path):
     return io_utils.read_solution_from_file(solution_path)
 
 
-def solve_problem_custom(graph, params=None):
+def solve_problem_custom(graph, params=None, warm_start=None):
     """ Solve the given problem using the specified params, if there are any """
+    """ A warm start, if given, names the tour constructor for the first incumbent """
 
     if params is None:
         params = {
@@ -40,6 +41,8 @@ def solve_problem_custom(graph, params=None):
             "var_type": "binary",
             "verbose": False,
             }
+    if warm_start is not None:
+        params = dict(params, warm_start=warm_start)
 
     problem = mip_model.tspProblem(graph=graph, **params)
     problem.optimise()
@@ -7,38 +7,102 @@ import numpy as np
 
 from pathlib import Path
 
+from optlearn.mip import pricing
+from optlearn.mip import warm_start as warm_starts
+from optlearn.fix import cost_fixing
 from optlearn.experiments import experiment_utils
 
 
-def evaluate_solve_vanilla(original_graph, solver_params=None):
+def get_warm_start_info(problem):
+    """ Get the warm start summary of a solved problem, if it had one """
+
+    info = problem.warm_start_info or {}
+    return {"warm_start_time": info.get("time", 0),
+            "warm_start_accepted": info.get("accepted", False)}
+
+
+def get_fixing_info(wrapper):
+    """ Get the fixing summary of the last pruning, if the wrapper has a fixer """
+
+    info = wrapper.fixing_info or {}
+    return {"fixed_edges": info.get("fixed_edges", 0),
+            "fixing_time": info.get("time", 0)}
+
+
+def evaluate_solve_vanilla(original_graph, solver_params=None, warm_start=None):
     """ Evaluate a vanilla custom solve of a TSP problem """
 
     start = time.time()
-    problem = experiment_utils.solve_problem_custom(original_graph, solver_params)
+    problem = experiment_utils.solve_problem_custom(original_graph, solver_params, warm_start)
     finish = time.time()
 
-    return {"optimal_value": problem.get_objective_value(), "timing": finish - start}
+    return {"optimal_value": problem.get_objective_value(), "timing": finish - start,
+            **get_warm_start_info(problem)}
 
 
-def evaluate_solve_pruned(wrapper, original_graph, solver_params=None):
+def evaluate_solve_pruned(wrapper, original_graph, solver_params=None, warm_start=None):
     """ Evaluate a pruned custom solve of a TSP problem """
 
     start = time.time()
     pruned_graph = wrapper.prune_graph_with_logic(original_graph)
-    problem = experiment_utils.solve_problem_custom(pruned_graph, solver_params)
+    problem = experiment_utils.solve_problem_custom(pruned_graph, solver_params, warm_start)
     finish = time.time()
 
     return {"optimal_value": problem.get_objective_value(),
             "pruning_rate": 1 - len(pruned_graph.edges) / len(original_graph.edges),
-            "timing": finish - start
+            "timing": finish - start,
+            **get_warm_start_info(problem),
+            **get_fixing_info(wrapper),
+    }
+
+
+def evaluate_solve_priced(wrapper, original_graph, solver_params=None, warm_start=None):
+    """ Evaluate a pruned custom solve of a TSP problem, with pruned edges priced back in """
+
+    solver = (solver_params or {}).get("solver", "scip")
+    start = time.time()
+    pruned_graph = wrapper.prune_graph_with_logic(original_graph)
+    loop = pricing.pricingLoop(original_graph, solver=solver, warm_start=warm_start)
+    problem = loop.solve(pruned_graph)
+    finish = time.time()
+
+    return {"optimal_value": problem.get_objective_value(),
+            "added_edges": loop.added_edges,
+            "iterations": loop.iterations,
+            "timing": finish - start,
     }
 
 
-def evaluate_tsp_problem(wrapper, problem_path, solver_params=None):
+def evaluate_heuristic_tour(original_graph, constructor="christofides"):
+    """ Evaluate the upper bound of a heuristic tour improved with local search """
+
+    start = time.time()
+    tour, length = warm_starts.build_tour(original_graph, constructor=constructor)
+    finish = time.time()
+
+    return {"length": length, "timing": finish - start}
+
+
+def compute_warm_start_share(vanilla_time, vanilla_warm_time, pruned_warm_time):
+    """ Get the share of the time saved by the warm pruned solve over the cold vanilla """
+    """ solve that the warm start alone saves on the vanilla solve """
+
+    saving = vanilla_time - pruned_warm_time
+    if saving <= 0:
+        return None
+    return (vanilla_time - vanilla_warm_time) / saving
+
+
+def evaluate_tsp_problem(wrapper, problem_path, solver_params=None, warm_start=None,
+                         price_edges=False):
     """ 
     Given the tsp problem and solution path, evalate the optimality ratio
     using the sparsification classifier stored in the wrapper. Return the 
-    optmality ratio and problem order
+    optmality ratio and problem order. With a warm start, both solves are
+    repeated from a heuristic tour to separate its saving from the pruning.
+    With pricing, the pruned solve is also repeated with pruned edges priced
+    back in, which is optimal for the original problem. The upper bound of a
+    locally improved heuristic tour is reported against the optimum too
     """
 
     original_graph = experiment_utils.load_problem(problem_path)
@@ -46,19 +110,54 @@ def evaluate_tsp_problem(wrapper, problem_path, solver_params=None):
     vanilla_dict = evaluate_solve_vanilla(original_graph, solver_params)
     pruned_dict = evaluate_solve_pruned(wrapper, original_graph, solver_params)
     
-    return {"vanilla_time": vanilla_dict["timing"],
-            "pruned_time": pruned_dict["timing"],
-            "pruning_rate": pruned_dict["pruning_rate"],
-            "optimality_ratio": pruned_dict["optimal_value"] / vanilla_dict["optimal_value"], 
-            "problem_order": len(original_graph.nodes)
+    results = {"vanilla_time": vanilla_dict["timing"],
+               "pruned_time": pruned_dict["timing"],
+               "pruning_rate": pruned_dict["pruning_rate"],
+               "optimality_ratio": pruned_dict["optimal_value"] / vanilla_dict["optimal_value"], 
+               "problem_order": len(original_graph.nodes),
+               "fixed_edges": pruned_dict["fixed_edges"],
+               "fixing_time": pruned_dict["fixing_time"],
     }
-
-
-def evaluate_tsp_problems(model_path, problem_dir, results_path, solver_params_path=None):
+    heuristic_dict = evaluate_heuristic_tour(original_graph, warm_start or "christofides")
+    results.update({
+        "heuristic_time": heuristic_dict["timing"],
+        "heuristic_ratio": heuristic_dict["length"] / vanilla_dict["optimal_value"],
+    })
+    if price_edges:
+        priced_dict = evaluate_solve_priced(wrapper, original_graph, solver_params, warm_start)
+        results.update({
+            "priced_time": priced_dict["timing"],
+            "priced_added_edges": priced_dict["added_edges"],
+            "priced_iterations": priced_dict["iterations"],
+            "priced_optimality_ratio": priced_dict["optimal_value"] / vanilla_dict["optimal_value"],
+        })
+    if warm_start is None:
+        return results
+
+    vanilla_warm_dict = evaluate_solve_vanilla(original_graph, solver_params, warm_start)
+    pruned_warm_dict = evaluate_solve_pruned(wrapper, original_graph, solver_params, warm_start)
+
+    results.update({
+        "vanilla_warm_time": vanilla_warm_dict["timing"],
+        "pruned_warm_time": pruned_warm_dict["timing"],
+        "vanilla_warm_start_accepted": vanilla_warm_dict["warm_start_accepted"],
+        "pruned_warm_start_accepted": pruned_warm_dict["warm_start_accepted"],
+        "warm_start_time": vanilla_warm_dict["warm_start_time"],
+        "warm_optimality_ratio": pruned_warm_dict["optimal_value"] / vanilla_warm_dict["optimal_value"],
+        "warm_start_share": compute_warm_start_share(vanilla_dict["timing"],
+                                                     vanilla_warm_dict["timing"],
+                                                     pruned_warm_dict["timing"]),
+    })
+    return results
+
+
+def evaluate_tsp_problems(model_path, problem_dir, results_path, solver_params_path=None,
+                          warm_start=None, price_edges=False, fix_edges=False):
     """ 
     Given the tsp problem and solution path, evalate the optimality ratio
     using the sparsification classifier stored in the wrapper. Return the 
-    optmality ratio and problem order
+    optmality ratio and problem order. With fixing, the edges that reduced
+    costs prove useless are removed before the classifier runs
     """
 
     if solver_params_path is not None:
@@ -82,6 +181,8 @@ def evaluate_tsp_problems(model_path, problem_dir, results_path, solver_params_p
     try:
         print("Loading and wrapping trained model at {}!".format(model_path))
         wrapper = experiment_utils.load_and_wrap_model(model_path)
+        if fix_edges:
+            wrapper.fixer = cost_fixing.reducedCostFixer(constructor=warm_start or "christofides")
     except Exception as exception:
         print("Could not load the model and wrap it!")
         raise exception
@@ -91,7 +192,7 @@ def evaluate_tsp_problems(model_path, problem_dir, results_path, solver_params_p
     for num, filename in enumerate(filenames):
         print("Loading problem {} of {}".format(num+1, len(filenames)))
         try:
-            res = evaluate_tsp_problem(wrapper, filename, solver_params)
+            res = evaluate_tsp_problem(wrapper, filename, solver_params, warm_start, price_edges)
             results_dict[os.path.basename(filename)] = res
         except Exception as exception:
             print("Could not evaluate problem {}!".format(os.path.basename(filename)))
@@ -113,5 +214,9 @@ if __name__ is not "__main__":
     parser.add_argument("-t", "--solver_params_path", nargs="?", required=False)
     parser.add_argument("-m", "--model_path", nargs="?", required=True)
     parser.add_argument("-r", "--results_path", nargs="?", default=None)
+    parser.add_argument("-w", "--warm_start", nargs="?", default="christofides",
+                        choices=["doubletree", "christofides"])
+    parser.add_argument("-c", "--price_edges", action="store_true")
+    parser.add_argument("-f", "--fix_edges", action="store_true")
 
     evaluate_tsp_problems(**vars(parser.parse_args()))
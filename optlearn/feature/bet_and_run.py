@@ -0,0 +1,157 @@
+import os
+import random
+
+import numpy as np
+
+from concurrent import futures
+from multiprocessing import shared_memory
+
+from optlearn import graph_utils
+from optlearn import edge_index
+from optlearn import dense_graph
+
+from optlearn.mip import cut_pool as cut_pools
+from optlearn.mip import mip_model
+
+
+def share_graph(graph):
+    """ Copy the weight matrix of the graph into shared memory """
+    """ Returns the shared block and the spec the workers rebuild the graph from """
+
+    matrix = np.asarray(graph_utils.get_weight_matrix(graph), dtype=np.float64)
+    block = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    np.ndarray(matrix.shape, dtype=np.float64, buffer=block.buf)[:] = matrix
+    spec = {
+        "name": block.name,
+        "shape": matrix.shape,
+        "min_vertex": int(graph_utils.get_min_vertex(graph)),
+        "symmetric": bool(graph_utils.check_graph(graph)),
+    }
+    return block, spec
+
+
+def attach_graph(spec):
+    """ Rebuild the graph shared by share_graph as a dense graph """
+
+    block = shared_memory.SharedMemory(name=spec["name"])
+    try:
+        matrix = np.ndarray(spec["shape"], dtype=np.float64, buffer=block.buf)
+        return dense_graph.DenseTSPGraph(matrix, min_vertex=spec["min_vertex"],
+                                         symmetric=spec["symmetric"])
+    finally:
+        block.close()
+
+
+def compute_normalised_redcosts(graph, seed, rounds=1, perturb=True, cut_pool=None):
+    """ Compute the normalised reduced costs of one perturbed cutting relaxation """
+
+    random.seed(seed)
+    np.random.seed(seed)
+    problem = mip_model.tspProblem(
+        solver="scip",
+        var_type="continuous",
+        graph=graph,
+        verbose=False,
+        shuffle_columns=False,
+        perturb=perturb,
+        get_quick=False,
+        cut_pool=cut_pool,
+    )
+    problem.optimise(max_rounds=rounds)
+    costs = np.array(problem.get_redcosts())
+    return costs / costs.max()
+
+
+def run_shared_relaxation(spec, seed, rounds=1, perturb=True, pool_path=None):
+    """ Worker entry point, the relaxation of the graph in shared memory """
+
+    graph = attach_graph(spec)
+    cut_pool = None if pool_path is None else cut_pools.cutPool(pool_path)
+    return compute_normalised_redcosts(graph, seed, rounds, perturb, cut_pool)
+
+
+def get_graph_order_indices(graph):
+    """ Get the position of each graph edge among the edges of the shared graph """
+    """ The shared graph keeps the present edges in the canonical edge order """
+
+    positions = edge_index.compute_edge_indices(graph_utils.get_edge_array(graph),
+                                                graph_utils.get_order(graph),
+                                                graph_utils.get_min_vertex(graph),
+                                                graph_utils.check_graph(graph))
+    return np.searchsorted(np.sort(positions), positions)
+
+
+class betAndRun():
+    """ Average the normalised reduced costs of perturbed relaxations run in parallel """
+
+    def __init__(self, runs=8, workers=None, rounds=1, perturb=True, seed=0,
+                 tolerance=1e-3, patience=2, min_runs=2):
+        """ Setup the engine, the runs stop early once the running mean has changed """
+        """ by less than the tolerance for the given number of consecutive runs """
+
+        self.runs = runs
+        self.workers = workers or min(runs, os.cpu_count())
+        self.rounds = rounds
+        self.perturb = perturb
+        self.seed = seed
+        self.tolerance = tolerance
+        self.patience = patience
+        self.min_runs = min_runs
+
+    def get_seeds(self):
+        return [self.seed + run for run in range(self.runs)]
+
+    def initialise_mean(self):
+        self.mean, self.count, self.calm = None, 0, 0
+
+    def update_mean(self, costs):
+        """ Add the costs of a run to the running mean, returning True once it is stable """
+
+        self.count += 1
+        if self.mean is None:
+            self.mean = np.array(costs, dtype=np.float64)
+            return False
+        previous = self.mean
+        self.mean = previous + (costs - previous) / self.count
+        stable = np.max(np.abs(self.mean - previous)) < self.tolerance
+        self.calm = self.calm + 1 if stable else 0
+        return self.count >= self.min_runs and self.calm >= self.patience
+
+    def run_serial(self, graph, cut_pool=None):
+        """ Run the relaxations one after the other in this process """
+
+        for seed in self.get_seeds():
+            costs = compute_normalised_redcosts(graph, seed, self.rounds, self.perturb, cut_pool)
+            if self.update_mean(costs):
+                break
+
+    def run_parallel(self, graph, cut_pool=None):
+        """ Run the relaxations in a process pool, the graph is shared, not pickled """
+        """ Cuts are only shared through the pool if it is kept on disk """
+        """ The workers give the costs in the shared graph order, not the graph order """
+        """ Results are averaged in seed order, so an early stop matches run_serial """
+
+        block, spec = share_graph(graph)
+        pool_path = None if cut_pool is None else cut_pool.path
+        executor = futures.ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            jobs = [executor.submit(run_shared_relaxation, spec, seed, self.rounds,
+                                    self.perturb, pool_path) for seed in self.get_seeds()]
+            for job in jobs:
+                if self.update_mean(job.result()):
+                    break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            block.close()
+            block.unlink()
+        self.mean = self.mean[get_graph_order_indices(graph)]
+
+    def compute(self, graph, cut_pool=None):
+        """ Compute the mean normalised reduced costs, in the graph edge order """
+
+        self.initialise_mean()
+        if self.workers > 1 and self.runs > 1:
+            self.run_parallel(graph, cut_pool)
+        else:
+            self.run_serial(graph, cut_pool)
+        return self.mean
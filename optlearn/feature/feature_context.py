@@ -0,0 +1,176 @@
+import numpy as np
+import networkx as nx
+
+from optlearn import graph_utils
+from optlearn import edge_index
+
+from optlearn.feature import matrix_features
+from optlearn.mst import mst_model
+from optlearn.mst import held_karp
+from optlearn.mip import mip_model
+
+
+class FeatureContext():
+    """ Lazily computed intermediates shared by the features of a single graph """
+
+    def __init__(self, graph, cut_pool=None, lp_solver="scip"):
+        """ Setup the context, nothing is computed until it is first asked for """
+        """ Cutting relaxations start from the subtours in the cut pool, if one is given """
+        """ and are solved with the given solver, "highs" for the pure LP backend """
+
+        self.graph = graph
+        self.cut_pool = cut_pool
+        self.lp_solver = lp_solver
+        self._cache = {}
+
+    def _cached(self, key, func):
+        """ Compute and remember the given intermediate """
+
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def clear(self):
+        """ Forget everything computed so far """
+
+        self._cache = {}
+
+    def get_order(self):
+        """ Get the number of vertices """
+
+        return self._cached("order", lambda: graph_utils.get_order(self.graph))
+
+    def get_size(self):
+        """ Get the number of edges """
+
+        return self._cached("size", lambda: graph_utils.get_size(self.graph))
+
+    def get_weight_matrix(self):
+        """ Get the weight matrix, with np.inf where there is no edge """
+
+        return self._cached("weight_matrix", lambda: graph_utils.get_weight_matrix(self.graph))
+
+    def get_presence_mask(self):
+        """ Get the mask of the weight matrix entries that are edges """
+
+        return self._cached("presence_mask",
+                            lambda: matrix_features.get_presence_mask(self.get_weight_matrix()))
+
+    def get_edge_array(self):
+        """ Get the zero-based (E, 2) array of edges, in the graph edge order """
+
+        min_vertex = graph_utils.get_min_vertex(self.graph)
+        return self._cached("edge_array",
+                            lambda: graph_utils.get_edge_array(self.graph) - min_vertex)
+
+    def get_weights(self):
+        """ Get the edge weights, in the graph edge order """
+
+        return self._cached("weights",
+                            lambda: np.asarray(graph_utils.get_weights(self.graph), dtype=np.float64))
+
+    def get_row_statistics(self):
+        """ Get the outward and inward row statistics of every vertex """
+
+        return self._cached("row_statistics", lambda: matrix_features.compute_out_in_statistics(
+            self.graph, self.get_weight_matrix(), self.get_presence_mask()))
+
+    def get_sun_edges(self, self_max=False):
+        """ Get the features f1-f4 of Sun et al. for every edge as an (E, 4) array """
+
+        return self._cached(("sun_edges", self_max), lambda: matrix_features.compute_sun_edges(
+            self.graph, self_max=self_max, context=self))
+
+    def get_ratio_columns(self):
+        """ Get the features fa-ff for every edge as a dictionary of columns """
+
+        return self._cached("ratio_columns",
+                            lambda: matrix_features.compute_ratio_columns(self.graph, context=self))
+
+    def get_mst_iterations(self):
+        """ Get the default number of MST sparsification rounds """
+
+        return int(np.ceil(np.log2(self.get_order())))
+
+    def get_mst_rounds(self, iterations=None):
+        """ Get the edge vector indices of the MST edges removed in each round """
+
+        iterations = iterations or self.get_mst_iterations()
+        model = mst_model.mstSparsifier()
+        return self._cached(("mst_rounds", iterations),
+                            lambda: model.run_sparsify_indices(self.graph, iterations))
+
+    def get_tree_indices(self):
+        """ Get the edge vector indices of the minimum spanning tree """
+
+        for key, rounds in self._cache.items():
+            if type(key) is tuple and key[0] == "mst_rounds" and len(rounds) > 0:
+                return rounds[0]
+        return self.get_mst_rounds(1)[0]
+
+    def get_edges_at(self, indices):
+        """ Get the edges at the given edge vector indices as an (E, 2) array of vertices """
+
+        return edge_index.compute_index_edges(indices,
+                                              self.get_order(),
+                                              graph_utils.get_min_vertex(self.graph),
+                                              graph_utils.check_graph(self.graph)
+        )
+
+    def get_minimum_spanning_tree(self):
+        """ Get the minimum spanning tree as a networkx graph """
+
+        def build_tree():
+            tree = nx.Graph()
+            tree.add_nodes_from(sorted(graph_utils.get_vertices(self.graph).tolist()))
+            tree.add_edges_from(self.get_edges_at(self.get_tree_indices()).tolist())
+            return tree
+
+        return self._cached("minimum_spanning_tree", build_tree)
+
+    def get_held_karp(self):
+        """ Get the Held-Karp engine after its subgradient ascent on the graph """
+
+        def ascend():
+            engine = held_karp.heldKarpBound()
+            engine.compute(self.graph)
+            return engine
+
+        return self._cached("held_karp", ascend)
+
+    def get_root_relaxation(self):
+        """ Get the variable values of the LP relaxation of the degree constrained problem """
+
+        def solve():
+            problem = mip_model.tspProblem(var_type="binary", graph=self.graph, verbose=False)
+            problem.perform_relaxation()
+            return problem.get_varvals()
+
+        return self._cached("root_relaxation", solve)
+
+    def get_cutting_relaxation(self, rounds=None):
+        """ Get the variable values and reduced costs of the LP after subtour cutting rounds """
+
+        rounds = rounds or int(np.ceil(np.log2(self.get_size())))
+
+        def solve():
+            problem = mip_model.tspProblem(
+                solver=self.lp_solver,
+                var_type="continuous",
+                graph=self.graph,
+                verbose=False,
+                get_quick=True,
+                cut_pool=self.cut_pool,
+            )
+            problem.optimise(max_rounds=rounds)
+            return {"varvals": problem.get_varvals(), "redcosts": problem.get_redcosts()}
+
+        return self._cached(("cutting_relaxation", rounds), solve)
+
+
+def get_context(graph, context=None):
+    """ Use the given context, or make a fresh one for the graph """
+
+    if context is None:
+        return FeatureContext(graph)
+    return context
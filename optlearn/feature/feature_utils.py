@@ -1,6 +1,7 @@
 import numpy as np
 
 from optlearn.feature import features
+from optlearn.feature import feature_context
 
 
 class buildFeatures():
@@ -19,16 +20,17 @@ class buildFeatures():
         
         self._funcs = [features.functions[item] for item in self.function_names]
         
-    def compute_feature(self, graph, func):
+    def compute_feature(self, graph, func, context=None):
         """ Compute a specific feature for the graph """
 
         print(func)
-        return func(graph)
+        return func(graph, context=context)
 
-    def compute_features(self, graph):
-        """ Compute the feature vector for the graph """
+    def compute_features(self, graph, context=None):
+        """ Compute the feature vector for the graph, sharing one context between features """
         
-        data = [self.compute_feature(graph, func) for func in self._funcs]
+        context = feature_context.get_context(graph, context)
+        data = [self.compute_feature(graph, func, context) for func in self._funcs]
         return np.stack(data, axis=1)
 
 
@@ -1,10 +1,12 @@
-import random
-
 import numpy as np
 import networkx as nx
 
 from optlearn import graph_utils
 
+from optlearn.feature import matrix_features
+from optlearn.feature import feature_context
+from optlearn.feature import bet_and_run
+from optlearn.feature import tour_features
 from optlearn.quad import quad_features
 from optlearn.mst import mst_features
 from optlearn.mst import mst_model
@@ -126,239 +128,190 @@ def compute_f4_vertex(graph, vertex, self_max=False):
     return numerator / denominator
 
 
-def compute_f1_edges(graph, self_max=False):
+def compute_f1_edges(graph, self_max=False, context=None):
     """ Compute feature f1 of Sun et al. """
 
-    edges = graph_utils.get_edges(graph)
-    return np.array([compute_f1_edge(graph, *edge, self_max=self_max) for edge in edges])
+    return matrix_features.compute_sun_edge_feature(graph, "f1", self_max, context)
 
 
-def compute_f1_vertices(graph, self_max=False):
+def compute_f1_vertices(graph, self_max=False, context=None):
     """ Compute feature f1 of Sun et al. """
 
-    vertices = graph_utils.get_vertices(graph)
-    return np.array([compute_f1_vertex(graph, vertex, self_max=self_max)
-                     for vertex in vertices]).flatten()
+    return matrix_features.compute_sun_vertices(graph, "f1", self_max, context)
 
 
-def compute_f2_edges(graph, self_max=False):
+def compute_f2_edges(graph, self_max=False, context=None):
     """ Compute feature f2 of Sun et al. """
 
-    edges = graph_utils.get_edges(graph)
-    return np.array([compute_f2_edge(graph, *edge, self_max=self_max) for edge in edges])
+    return matrix_features.compute_sun_edge_feature(graph, "f2", self_max, context)
 
 
-def compute_f2_vertices(graph, self_max=False):
+def compute_f2_vertices(graph, self_max=False, context=None):
     """ Compute feature f2 of Sun et al. """
 
-    vertices = graph_utils.get_vertices(graph)
-    return np.array([compute_f2_vertex(graph, vertex, self_max=self_max)
-                     for vertex in vertices]).T.flatten()
+    return matrix_features.compute_sun_vertices(graph, "f2", self_max, context)
 
 
-def compute_f3_edges(graph, self_max=False):
+def compute_f3_edges(graph, self_max=False, context=None):
     """ Compute feature f3 of Sun et al. """
 
-    edges = graph_utils.get_edges(graph)
-    return np.array([compute_f3_edge(graph, *edge, self_max=self_max) for edge in edges])
+    return matrix_features.compute_sun_edge_feature(graph, "f3", self_max, context)
 
 
-def compute_f3_vertices(graph, self_max=False):
+def compute_f3_vertices(graph, self_max=False, context=None):
     """ Compute feature f3 of Sun et al. """
 
-    vertices = graph_utils.get_vertices(graph)
-    return np.array([compute_f3_vertex(graph, vertex, self_max=self_max)
-                     for vertex in vertices]).flatten()
+    return matrix_features.compute_sun_vertices(graph, "f3", self_max, context)
 
 
-def compute_f4_edges(graph, self_max=False):
+def compute_f4_edges(graph, self_max=False, context=None):
     """ Compute feature f4 of Sun et al. """
 
-    edges = graph_utils.get_edges(graph)
-    return np.array([compute_f4_edge(graph, *edge, self_max=self_max) for edge in edges])
+    return matrix_features.compute_sun_edge_feature(graph, "f4", self_max, context)
 
 
-def compute_f4_vertices(graph, self_max=False):
+def compute_f4_vertices(graph, self_max=False, context=None):
     """ Compute feature f4 of Sun et al. """
 
-    vertices = graph_utils.get_vertices(graph)
-    return np.array([compute_f4_vertex(graph, vertex, self_max=self_max)
-                     for vertex in vertices]).T.flatten()
+    return matrix_features.compute_sun_vertices(graph, "f4", self_max, context)
 
 
-def compute_f5_edges(graph, sort=False):
+def compute_f5_edges(graph, tours=10000, seed=None, chunk_size=None, context=None):
     """ Compute feature f5 of Sun et al. """
-    """ Expects a set of tours and an array indicating if each edge 
-        is in each tour """
-
-    tours = np.array([random.sample(graph.nodes, len(graph.nodes)) for i in range(10000)])
-    edges_in = graph_utils.hash_edges_in_tours(graph.edges, tours)
-    tours = graph_utils.sort_tours_by_length(graph, tours)
-    tour_ranks = np.expand_dims(np.arange(len(tours)) + 1, 1)
-    scores = np.sum(edges_in / tour_ranks, axis=0)
+    """ Scores each edge by the reciprocal length ranks of the random tours
+        that contain it, the tours are streamed in chunks of chunk_size """
+
+    context = feature_context.get_context(graph, context)
+    matrix = context.get_weight_matrix()
+    scores = tour_features.compute_rank_scores(graph, tours, seed, chunk_size, matrix)
     return scores / np.max(scores)
     
 
-def compute_f6_edges(graph):
+def compute_f6_edges(graph, tours=10000, seed=None, chunk_size=None, context=None):
     """ Compute feature f6 of Sun et al. """
-    """ Expects a set of tours and an array indicating if each edge 
-        is in each tour """
-
-    tours = np.array([random.sample(graph.nodes, len(graph.nodes)) for i in range(10000)])
-    edges_in = graph_utils.hash_edges_in_tours(graph.edges, tours)
-    tours = graph_utils.sort_tours_by_length(graph, tours)
-    tour_lengths = graph_utils.compute_tour_lengths(graph, tours)
-    numerator_a = (edges_in - edges_in.mean(axis=0))
-    numerator_b = np.expand_dims(tour_lengths - tour_lengths.mean(), 1)
-    numerator = np.sum(numerator_a * numerator_b, axis=0)
-    denominator_a = np.power(np.sum(np.power(numerator_a, 2), axis=0), 0.5)
-    denominator_b = np.power(np.sum(np.power(numerator_b,2)), 0.5)
-    denominator = denominator_a * denominator_b
-    scores =  np.nan_to_num(numerator / denominator, 0)
+    """ Correlates each edge being in a random tour with the tour length,
+        the tours are streamed in chunks of chunk_size """
+
+    context = feature_context.get_context(graph, context)
+    matrix = context.get_weight_matrix()
+    scores = tour_features.compute_length_correlations(graph, tours, seed, chunk_size, matrix)
+    scores = np.nan_to_num(scores, 0)
     return scores / np.min(scores)
 
 
-def compute_f7_edges(graph, iterations="auto"):
+def compute_f7_edges(graph, iterations="auto", seed=None, context=None):
     """ Compute quadilateral frequencies for each edge """
 
+    context = feature_context.get_context(graph, context)
     if iterations == "auto":
-        iterations = graph_utils.get_order(graph)
-    model = mst_model.mstSparsifier()
-    edges = mst_features.extract_edges(model, graph)
-    return quad_features.fast_quadrilateral_frequencies(graph, edges, iterations)
+        iterations = context.get_order()
+    edges = context.get_edges_at(np.concatenate(context.get_mst_rounds()))
+    return quad_features.fast_quadrilateral_frequencies(graph,
+                                                        edges,
+                                                        iterations,
+                                                        seed=seed,
+                                                        matrix=context.get_weight_matrix()
+    )
 
 
-def compute_f8_edges(graph):
+def compute_f8_edges(graph, context=None):
     """ Compute the root relxation features for each edge """
 
-    problem = mip_model.tspProblem(
-        var_type="binary",
-        graph=graph,
-        verbose=False
-    )
-
-    problem.perform_relaxation()
-    return problem.get_varvals()
+    return feature_context.get_context(graph, context).get_root_relaxation()
 
 
-def compute_f9_edges(graph):
+def compute_f9_edges(graph, context=None):
     """ Indicator features from the MWST extraction method  """
 
+    context = feature_context.get_context(graph, context)
     model = mst_model.mstSparsifier()
-    return mst_features.build_prune_indicators(model, graph)
+    return mst_features.build_prune_indicators(model, graph, rounds=context.get_mst_rounds())
 
     
-def compute_f10_edges(graph):
+def compute_f10_edges(graph, context=None):
     """ Compare the edges to the max edge value """
 
-    weights = np.array(graph_utils.get_weights(graph))
+    weights = feature_context.get_context(graph, context).get_weights()
     return weights.flatten() / np.max(weights)
 
 
-def compute_f11_edges(graph):
+def compute_f11_edges(graph, context=None):
     """ Compare the edges to the min edge value """
 
-    weights = np.array(graph_utils.get_weights(graph))
+    weights = feature_context.get_context(graph, context).get_weights()
     return (weights.flatten() - np.min(weights)) / (np.max(weights) - np.min(weights))
 
 
-def compute_f12_edges(graph):
+def compute_f12_edges(graph, context=None):
     """ Compare the edges to the mean edge value """
 
-    weights = np.array(graph_utils.get_weights(graph))
+    weights = feature_context.get_context(graph, context).get_weights()
     return weights.flatten() / (np.max(weights) - np.min(weights))
 
 
-def compute_f13_edges(graph):
+def compute_f13_edges(graph, context=None):
     """ Include a feature that informs the order of the graph """
 
-    order = graph_utils.get_order(graph)
+    order = feature_context.get_context(graph, context).get_order()
     return np.log(10) / np.log(order)
 
 
-def compute_fa_edges(graph):
+def compute_fa_edges(graph, context=None):
     """ Compute the weight divided by the global max """
 
-    weights = np.array(graph_utils.get_weights(graph))
+    weights = feature_context.get_context(graph, context).get_weights()
     global_max = weights.max()
     return  (1 + weights) / (1 + global_max)
 
 
-def compute_fb_edges(graph):
+def compute_fb_edges(graph, context=None):
     """ Compute the weight divided by the max left neighbour weight """
 
-    min_vertex = np.min(graph.nodes)
-    weights = 1 + np.array(graph_utils.get_weights(graph)) 
-    maxes = [1 + np.max(graph_utils.get_edge_weights(graph, node)) for node in graph.nodes]
-    return np.array([weight / maxes[edge[0] - min_vertex]
-                     for weight, edge in zip(weights, graph.edges)])
+    return matrix_features.compute_ratio_edge_feature(graph, "fb", context)
 
 
-def compute_fc_edges(graph):
+def compute_fc_edges(graph, context=None):
     """ Compute the weight divided by the max right neighbour weight """
 
-    min_vertex = np.min(graph.nodes)
-    weights = 1 + np.array(graph_utils.get_weights(graph)) 
-    maxes = [1 + np.max(graph_utils.get_edge_weights(graph, node, out=False)) for
-             node in graph.nodes]
-    return np.array([weight / maxes[edge[1] - min_vertex] for
-                     weight, edge in zip(weights, list(graph.edges))])
+    return matrix_features.compute_ratio_edge_feature(graph, "fc", context)
 
 
-def compute_fd_edges(graph):
+def compute_fd_edges(graph, context=None):
     """ Compute the weight divided by the global max """
 
-    weights = np.array(graph_utils.get_weights(graph))
+    weights = feature_context.get_context(graph, context).get_weights()
     global_min = weights.min()
     return  (1 + global_min) / (1 + weights) 
 
 
-def compute_fe_edges(graph):
+def compute_fe_edges(graph, context=None):
     """ Compute the weight divided by the min left neighbour weight """
 
-    min_vertex = np.min(graph.nodes)
-    weights = 1 + np.array(graph_utils.get_weights(graph)) 
-    mins = [1 + np.min(graph_utils.get_edge_weights(graph, node)) for
-            node in graph.nodes]
-    return np.array([mins[edge[0] - min_vertex] / weight for
-                     weight, edge in zip(weights, graph.edges)])
+    return matrix_features.compute_ratio_edge_feature(graph, "fe", context)
 
 
-def compute_ff_edges(graph):
+def compute_ff_edges(graph, context=None):
     """ Compute the weight divided by the min right neighbour weight """
 
-    min_vertex = np.min(graph.nodes)
-    weights = 1 + np.array(graph_utils.get_weights(graph)) 
-    mins = [1 + np.min(graph_utils.get_edge_weights(graph, node, out=False)) for
-            node in graph.nodes]
-    return np.array([mins[edge[1]-min_vertex] / weight for
-                     weight, edge in zip(weights, graph.edges)])
+    return matrix_features.compute_ratio_edge_feature(graph, "ff", context)
 
 
-def compute_fg_edges(graph):
+def compute_fg_edges(graph, context=None):
     """ Continuous features from the MWST extraction method  """
 
+    context = feature_context.get_context(graph, context)
     model = mst_model.mstSparsifier()
-    return mst_features.build_prune_features(model, graph)
+    return mst_features.build_prune_features(model, graph, rounds=context.get_mst_rounds())
 
 
-def compute_fh_edges(graph):
+def compute_fh_edges(graph, context=None):
     """ Compute the cutting solution features for each edge """
 
-    problem = mip_model.tspProblem(
-        solver="scip",
-        var_type="continuous",
-        graph=graph,
-        verbose=False,
-        get_quick=True,
-    )
-
-    rounds = int(np.ceil(np.log2(len(graph.edges))))
-    problem.optimise(max_rounds=rounds)
-    return problem.get_varvals()
+    relaxation = feature_context.get_context(graph, context).get_cutting_relaxation()
+    return relaxation["varvals"]
 
 
-def compute_fk_edges(graph):
+def compute_fk_edges(graph, context=None):
     """ Compute the cutting solution features for each edge """
 
     problem = mip_model.tspProblem(
@@ -374,24 +327,15 @@ def compute_fk_edges(graph):
     return costs / costs.max()
 
 
-def compute_fi_edges_scip(graph):
+def compute_fi_edges_scip(graph, context=None):
     """ Compute the cutting reduced cost features for each edge """
 
-    problem = mip_model.tspProblem(
-        solver="scip",
-        var_type="continuous",
-        graph=graph,
-        verbose=False,
-        get_quick=False,
-    )
-
-    rounds = int(np.ceil(np.log2(len(graph.edges))))
-    problem.optimise(max_rounds=rounds)
-    costs = np.array(problem.get_redcosts())
+    relaxation = feature_context.get_context(graph, context).get_cutting_relaxation()
+    costs = np.array(relaxation["redcosts"])
     return costs / costs.max()
 
 
-def compute_fi_edges_xpress(graph):
+def compute_fi_edges_xpress(graph, context=None):
     """ Compute the cutting reduced cost features for each edge """
 
     problem = mip_model.tspProblem(
@@ -402,57 +346,69 @@ def compute_fi_edges_xpress(graph):
         get_quick=False,
     )
     
-    rounds = int(np.ceil(np.log2(len(graph.edges))))
+    rounds = int(np.ceil(np.log2(graph_utils.get_size(graph))))
     
     problem.optimise(max_rounds=rounds)
     costs = np.array(problem.get_redcosts())
     return costs / costs.max()
 
 
-def compute_fi_edges(graph):
+def compute_fi_edges(graph, context=None):
 
-    return compute_fi_edges_scip(graph)
+    return compute_fi_edges_scip(graph, context)
 
 
-def compute_fj_edges(graph, rounds=None, perturb=True):
+def compute_fj_edges(graph, rounds=None, perturb=True, context=None, workers=None):
     """ Compute the bet-and-run relaxation reduced costs for each edge """
+    """ The normalised reduced costs of perturbed relaxations are averaged """
 
-    problem = mip_model.tspProblem(
-        solver="scip",
-        var_type="continuous",
-        graph=graph,
-        verbose=False,
-        shuffle_columns=False,
-        perturb=perturb,
-        get_quick=False,
-    )
-    
+    context = feature_context.get_context(graph, context)
     if rounds is None:
-        rounds = int(np.ceil(np.log2(len(graph.edges))))
-    costs = []
+        rounds = int(np.ceil(np.log2(graph_utils.get_size(graph))))
+    engine = bet_and_run.betAndRun(runs=rounds, workers=workers, rounds=1, perturb=perturb)
+    return engine.compute(graph, cut_pool=context.cut_pool)
 
-    for i in range(rounds):
-        problem.optimise(max_rounds=1)
-        costs.append(problem.get_redcosts())
-        problem.problem.freeTransform()
-        problem.set_objective(graph)
-        costs = [(np.array(item) / np.max(item)).tolist() for item in costs]
-        print(len(costs))
-        return np.mean(costs, axis=0)
 
+def compute_degree_centralities(graph):
+    """ Compute the degree centrality of each vertex """
 
-def compute_fp_edges(graph):
+    if graph_utils.is_dense(graph):
+        return graph.get_degrees() / (graph.order - 1)
+    centralities = nx.degree_centrality(graph)
+    return np.array(list(centralities.values()))
+
+
+def compute_eigenvector_centralities(graph, max_iter=1000, tol=1e-06):
+    """ Compute the eigenvector centrality of each vertex, by power iteration if dense """
+
+    if not graph_utils.is_dense(graph):
+        centralities = nx.eigenvector_centrality(graph, max_iter=max_iter, tol=tol)
+        return np.array(list(centralities.values()))
+
+    adjacency = np.isfinite(graph.matrix).astype(float)
+    order = graph.order
+    centralities = np.ones(order) / order
+    for iteration in range(max_iter):
+        previous = centralities
+        centralities = previous + adjacency.T @ previous
+        centralities = centralities / (np.linalg.norm(centralities) or 1)
+        if np.abs(centralities - previous).sum() < order * tol:
+            return centralities
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+
+def compute_fp_edges(graph, context=None):
     """ Compute the product of the degree centralities for each edge """
 
-    centralities = nx.degree_centrality(graph)
-    centralities = np.array(list(centralities.values()))
+    centralities = compute_degree_centralities(graph)
+    min_vertex = graph_utils.get_min_vertex(graph)
 
-    if np.min(graph.nodes) > 0:
-        offset = - int(np.min(graph.nodes))
+    if min_vertex > 0:
+        offset = - int(min_vertex)
     else:
         offset = int(0)
     
-    edges = np.array(list(graph.edges))
+    edges = graph_utils.get_edge_array(graph)
     left_item = centralities[edges[:, 0] + offset] 
     right_item = centralities[edges[:, 1] + offset]
     product = left_item * right_item 
@@ -460,13 +416,20 @@ def compute_fp_edges(graph):
     return product / product.max() 
 
 
-def compute_fm_edges(graph, max_iter=1000):
+def compute_fl_edges(graph, context=None):
+    """ Compute the alpha-nearness of each edge from the Held-Karp 1-tree """
+
+    context = feature_context.get_context(graph, context)
+    alphas = context.get_held_karp().get_edge_alphas(graph)
+    return alphas / max(alphas.max(), 1)
+
+
+def compute_fm_edges(graph, max_iter=1000, context=None):
     """ Compute the product of the eigen centralities for each edge """
 
-    centralities = nx.eigenvector_centrality(graph, max_iter=max_iter)
-    centralities = np.array(list(centralities.values()))
+    centralities = compute_eigenvector_centralities(graph, max_iter=max_iter)
     
-    edges = np.array(list(graph.edges))
+    edges = graph_utils.get_edge_array(graph)
     left_item = centralities[edges[:, 0]] 
     right_item = centralities[edges[:, 1]]
     product = left_item * right_item 
@@ -504,6 +467,7 @@ functions = {
     "compute_fi_edges": compute_fi_edges,
     "compute_fj_edges": compute_fj_edges,
     "compute_fk_edges": compute_fk_edges,
+    "compute_fl_edges": compute_fl_edges,
     "compute_fp_edges": compute_fp_edges,
     "compute_fm_edges": compute_fm_edges,    
     }
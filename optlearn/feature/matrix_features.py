@@ -0,0 +1,248 @@
+import numpy as np
+
+from optlearn import graph_utils
+
+
+_sun_edge_features = ["f1", "f2", "f3", "f4"]
+
+
+def get_presence_mask(matrix):
+    """ Get a mask of the entries of the weight matrix that are edges """
+
+    return np.isfinite(matrix)
+
+
+def compute_compact_row_statistics(rows):
+    """ Compute the row statistics when every row has the same number of edges """
+
+    partitioned = np.partition(rows, -2, axis=1)
+    return {
+        "count": np.full(len(rows), rows.shape[1]),
+        "min": rows.min(axis=1),
+        "max": partitioned[:, -1],
+        "second": partitioned[:, -2],
+        "mean": rows.mean(axis=1),
+        "mean_but_max": partitioned[:, :-1].mean(axis=1),
+    }
+
+
+def compute_masked_row_statistics(matrix, mask):
+    """ Compute the row statistics when rows have different numbers of edges """
+
+    counts = mask.sum(axis=1)
+    partitioned = np.partition(np.where(mask, matrix, -np.inf), -2, axis=1)
+    highs = partitioned[:, -1]
+    sums = np.where(mask, matrix, 0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "count": counts,
+            "min": np.where(mask, matrix, np.inf).min(axis=1),
+            "max": highs,
+            "second": partitioned[:, -2],
+            "mean": sums / counts,
+            "mean_but_max": (sums - highs) / (counts - 1),
+        }
+
+
+def compute_row_statistics(matrix, mask):
+    """ Compute the min, max, second largest and means of each row over the masked entries """
+
+    counts = mask.sum(axis=1)
+    if len(counts) > 0 and np.all(counts == counts[0]) and counts[0] > 1:
+        return compute_compact_row_statistics(matrix[mask].reshape(len(counts), -1))
+    return compute_masked_row_statistics(matrix, mask)
+
+
+def compute_spreads(statistics, self_max=False):
+    """ Compute the denominators of Sun et al., ignoring the largest weight if self_max """
+
+    if self_max:
+        return statistics["second"] - statistics["min"]
+    return statistics["max"] - statistics["min"]
+
+
+def compute_centres(statistics, self_max=False):
+    """ Compute the mean weights of Sun et al., ignoring the largest weight if self_max """
+
+    if self_max:
+        return statistics["mean_but_max"]
+    return statistics["mean"]
+
+
+def compute_out_in_statistics(graph, matrix, mask):
+    """ Compute the row statistics for outward and inward weights of each vertex """
+
+    out_statistics = compute_row_statistics(matrix, mask)
+    if graph_utils.check_graph(graph):
+        return out_statistics, out_statistics
+    return out_statistics, compute_row_statistics(matrix.T, mask)
+
+
+def get_matrix_statistics(graph, context=None):
+    """ Get the weight matrix and its outward and inward row statistics """
+
+    if context is not None:
+        return context.get_weight_matrix(), context.get_row_statistics()
+    matrix = graph_utils.get_weight_matrix(graph)
+    return matrix, compute_out_in_statistics(graph, matrix, get_presence_mask(matrix))
+
+
+def get_incidence_index(graph):
+    """ Get zero-based (vertex, neighbour) pairs, vertex by vertex in neighbour order """
+
+    if graph_utils.is_dense(graph):
+        return np.nonzero(get_presence_mask(graph.matrix))
+    min_vertex = graph_utils.get_min_vertex(graph)
+    pairs = [(vertex, neighbour) for vertex, neighbours in graph.adjacency()
+             for neighbour in neighbours]
+    pairs = np.array(pairs, dtype=int).reshape(-1, 2) - min_vertex
+    return pairs[:, 0], pairs[:, 1]
+
+
+def get_zero_based_edges(graph, context=None):
+    """ Get the zero-based (E, 2) array of edges, in the graph edge order """
+
+    if context is not None:
+        return context.get_edge_array()
+    return graph_utils.get_edge_array(graph) - graph_utils.get_min_vertex(graph)
+
+
+def compute_sun_edges(graph, self_max=False, names=None, context=None):
+    """ Compute features f1-f4 of Sun et al. for every edge as an (E, len(names)) array """
+    """ If the self-weight is the largest weight, set self_max true """
+
+    names = names or _sun_edge_features
+    matrix, (out_statistics, in_statistics) = get_matrix_statistics(graph, context)
+
+    edges = get_zero_based_edges(graph, context)
+    rows, cols = edges[:, 0], edges[:, 1]
+    weights = matrix[rows, cols]
+    out_spreads = compute_spreads(out_statistics, self_max)[rows]
+    in_spreads = compute_spreads(in_statistics, self_max)[cols]
+
+    columns = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if "f1" in names or "f2" in names:
+            offsets = weights - out_statistics["min"][rows]
+            columns["f1"] = offsets / out_spreads
+            columns["f2"] = offsets / in_spreads
+        if "f3" in names:
+            columns["f3"] = (weights - compute_centres(out_statistics, self_max)[rows]) / out_spreads
+        if "f4" in names:
+            columns["f4"] = (weights - compute_centres(in_statistics, self_max)[cols]) / in_spreads
+    return np.stack([columns[name] for name in names], axis=1)
+
+
+def compute_sun_edge_feature(graph, name, self_max=False, context=None):
+    """ Compute a single one of the features f1-f4 of Sun et al. for every edge """
+
+    if context is not None:
+        return context.get_sun_edges(self_max)[:, _sun_edge_features.index(name)]
+    return compute_sun_edges(graph, self_max=self_max, names=[name])[:, 0]
+
+
+def compute_sun_vertices(graph, name, self_max=False, context=None):
+    """ Compute one of the features f1-f4 of Sun et al. for the edges of every vertex """
+    """ Features f2 and f4 use inward weights and come out in the transposed order """
+
+    matrix, (out_statistics, in_statistics) = get_matrix_statistics(graph, context)
+    vertices, neighbours = get_incidence_index(graph)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if name == "f1":
+            values = matrix[vertices, neighbours] - out_statistics["min"][vertices]
+            return values / compute_spreads(out_statistics, self_max)[vertices]
+        if name == "f3":
+            values = matrix[vertices, neighbours] - compute_centres(out_statistics, self_max)[vertices]
+            return values / compute_spreads(out_statistics, self_max)[vertices]
+        if name == "f2":
+            values = matrix[neighbours, vertices] - in_statistics["min"][vertices]
+        elif name == "f4":
+            values = matrix[neighbours, vertices] - compute_centres(in_statistics, self_max)[vertices]
+        else:
+            raise ValueError("Unknown Sun et al. feature {}!".format(name))
+        values = values / compute_spreads(in_statistics, self_max)[vertices]
+    order = graph_utils.get_order(graph)
+    return values.reshape(order, -1).T.flatten()
+
+
+_ratio_edge_features = ["fa", "fb", "fc", "fd", "fe", "ff"]
+
+
+def compute_vertex_extremes(graph, edges, weights):
+    """ Compute the min and max outward and inward weight of every vertex """
+
+    if graph_utils.is_dense(graph):
+        mask = get_presence_mask(graph.matrix)
+        out_mins = graph.matrix.min(axis=1)
+        out_maxes = np.where(mask, graph.matrix, -np.inf).max(axis=1)
+        if graph.symmetric:
+            return out_mins, out_maxes, out_mins, out_maxes
+        in_maxes = np.where(mask, graph.matrix, -np.inf).max(axis=0)
+        return out_mins, out_maxes, graph.matrix.min(axis=0), in_maxes
+
+    order = graph_utils.get_order(graph)
+    out_mins, out_maxes = np.full(order, np.inf), np.full(order, -np.inf)
+    np.minimum.at(out_mins, edges[:, 0], weights)
+    np.maximum.at(out_maxes, edges[:, 0], weights)
+    if not graph_utils.check_graph(graph):
+        in_mins, in_maxes = np.full(order, np.inf), np.full(order, -np.inf)
+        np.minimum.at(in_mins, edges[:, 1], weights)
+        np.maximum.at(in_maxes, edges[:, 1], weights)
+        return out_mins, out_maxes, in_mins, in_maxes
+    np.minimum.at(out_mins, edges[:, 1], weights)
+    np.maximum.at(out_maxes, edges[:, 1], weights)
+    return out_mins, out_maxes, out_mins, out_maxes
+
+
+def get_vertex_extremes(graph, edges, weights, context=None):
+    """ Get the min and max outward and inward weight of every vertex """
+
+    if context is None:
+        return compute_vertex_extremes(graph, edges, weights)
+    out_statistics, in_statistics = context.get_row_statistics()
+    return (out_statistics["min"], out_statistics["max"],
+            in_statistics["min"], in_statistics["max"])
+
+
+def compute_ratio_columns(graph, context=None):
+    """ Compute the weight ratio features fa-ff of Fitzpatrick as a dictionary of columns """
+
+    if context is None:
+        weights = np.asarray(graph_utils.get_weights(graph), dtype=np.float64)
+    else:
+        weights = context.get_weights()
+    edges = get_zero_based_edges(graph, context)
+    rows, cols = edges[:, 0], edges[:, 1]
+    out_mins, out_maxes, in_mins, in_maxes = get_vertex_extremes(graph, edges, weights, context)
+
+    shifted = 1 + weights
+    return {
+        "fa": shifted / (1 + weights.max()),
+        "fb": shifted / (1 + out_maxes[rows]),
+        "fc": shifted / (1 + in_maxes[cols]),
+        "fd": (1 + weights.min()) / shifted,
+        "fe": (1 + out_mins[rows]) / shifted,
+        "ff": (1 + in_mins[cols]) / shifted,
+    }
+
+
+def get_ratio_columns(graph, context=None):
+    """ Get the features fa-ff as a dictionary of columns, from the context if given """
+
+    if context is not None:
+        return context.get_ratio_columns()
+    return compute_ratio_columns(graph)
+
+
+def compute_ratio_edges(graph, dtype=np.float32, context=None):
+    """ Compute the features fa-ff for every edge in one pass as an (E, 6) array """
+
+    columns = get_ratio_columns(graph, context)
+    return np.stack([columns[name] for name in _ratio_edge_features], axis=1).astype(dtype)
+
+
+def compute_ratio_edge_feature(graph, name, context=None):
+    """ Compute a single one of the features fa-ff for every edge """
+
+    return get_ratio_columns(graph, context)[name]
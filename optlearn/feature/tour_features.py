@@ -0,0 +1,134 @@
+import numpy as np
+
+from optlearn import graph_utils
+from optlearn import edge_index
+
+
+def get_chunk_size(order, chunk_size=None):
+    """ Choose how many tours to hold at once, about a million vertices by default """
+
+    if chunk_size is None:
+        return max(1, 2 ** 20 // max(order, 1))
+    return max(1, int(chunk_size))
+
+
+def get_chunk_seeds(tours, chunk_size, seed=None):
+    """ Spawn an independent seed for every chunk, so chunks can be regenerated """
+
+    chunks = -(-tours // chunk_size)
+    return np.random.SeedSequence(seed).spawn(chunks)
+
+
+def sample_tour_chunk(order, tours, seed):
+    """ Sample a (tours, order) array of zero-based random permutations """
+
+    generator = np.random.default_rng(seed)
+    return generator.permuted(np.tile(np.arange(order), (tours, 1)), axis=1)
+
+
+def generate_tour_chunks(order, tours, chunk_size, seeds):
+    """ Regenerate the random tours chunk by chunk from the chunk seeds """
+
+    for num, seed in enumerate(seeds):
+        count = min(chunk_size, tours - num * chunk_size)
+        yield sample_tour_chunk(order, count, seed)
+
+
+def get_tour_positions(tours, order, symmetric=True):
+    """ Get the canonical positions of the edges of each tour as a (tours, order) array """
+
+    return edge_index.compute_positions(tours, np.roll(tours, -1, axis=1), order, symmetric)
+
+
+def compute_chunk_lengths(matrix, tours):
+    """ Compute the length of every tour in a chunk from the weight matrix """
+
+    return matrix[tours, np.roll(tours, -1, axis=1)].sum(axis=1)
+
+
+class randomTourStatistics():
+    """ Streaming statistics of random tours, memory is O(E) whatever the tour count """
+
+    def __init__(self, graph, tours=10000, seed=None, chunk_size=None, matrix=None):
+        """ Setup the sampler, the tours themselves are never stored """
+
+        self.graph = graph
+        self.tours = int(tours)
+        self.order = graph_utils.get_order(graph)
+        self.symmetric = graph_utils.check_graph(graph)
+        self.matrix = graph_utils.get_weight_matrix(graph) if matrix is None else matrix
+        self.chunk_size = get_chunk_size(self.order, chunk_size)
+        self.seeds = get_chunk_seeds(self.tours, self.chunk_size, seed)
+        self.canonical_size = edge_index.get_canonical_size(self.order, self.symmetric)
+
+    def chunks(self):
+        """ Yield the (positions, lengths) of each chunk of tours """
+
+        for tours in generate_tour_chunks(self.order, self.tours, self.chunk_size, self.seeds):
+            positions = get_tour_positions(tours, self.order, self.symmetric)
+            yield positions, compute_chunk_lengths(self.matrix, tours)
+
+    def accumulate(self, positions, weights):
+        """ Sum the per-tour weights over the edges of each tour """
+
+        return np.bincount(positions.ravel(),
+                           weights=np.repeat(weights, positions.shape[1]),
+                           minlength=self.canonical_size
+        )
+
+    def to_graph_order(self, values):
+        """ Pick out the accumulated values of the graph edges """
+
+        return values[graph_utils.get_canonical_edge_positions(self.graph)]
+
+    def compute_lengths(self):
+        """ Compute the length of every sampled tour, in sample order """
+
+        return np.concatenate([lengths for (_, lengths) in self.chunks()])
+
+    def compute_rank_scores(self):
+        """ Sum the reciprocal length ranks of the tours that contain each edge """
+
+        ranks = np.empty(self.tours)
+        ranks[np.argsort(self.compute_lengths(), kind="stable")] = np.arange(self.tours) + 1
+        scores = np.zeros(self.canonical_size)
+        for num, (positions, _) in enumerate(self.chunks()):
+            start = num * self.chunk_size
+            scores += self.accumulate(positions, 1 / ranks[start:start + len(positions)])
+        return self.to_graph_order(scores)
+
+    def compute_length_correlations(self):
+        """ Compute the correlation between containing each edge and the tour length """
+
+        counts = np.zeros(self.canonical_size)
+        sums = np.zeros(self.canonical_size)
+        length_sum, square_sum, shift = 0, 0, None
+        for positions, lengths in self.chunks():
+            if shift is None:
+                shift = lengths.mean()
+            lengths = lengths - shift
+            counts += self.accumulate(positions, np.ones(len(lengths)))
+            sums += self.accumulate(positions, lengths)
+            length_sum += lengths.sum()
+            square_sum += np.dot(lengths, lengths)
+
+        counts, sums = self.to_graph_order(counts), self.to_graph_order(sums)
+        numerator = sums - counts * length_sum / self.tours
+        denominator_a = np.sqrt(counts - counts * counts / self.tours)
+        denominator_b = np.sqrt(square_sum - length_sum * length_sum / self.tours)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return numerator / (denominator_a * denominator_b)
+
+
+def compute_rank_scores(graph, tours=10000, seed=None, chunk_size=None, matrix=None):
+    """ Compute the rank weighted random tour scores of each edge """
+
+    statistics = randomTourStatistics(graph, tours, seed, chunk_size, matrix)
+    return statistics.compute_rank_scores()
+
+
+def compute_length_correlations(graph, tours=10000, seed=None, chunk_size=None, matrix=None):
+    """ Compute the random tour length correlation of each edge """
+
+    statistics = randomTourStatistics(graph, tours, seed, chunk_size, matrix)
+    return statistics.compute_length_correlations()
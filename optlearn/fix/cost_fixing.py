@@ -0,0 +1,131 @@
+import time
+
+import numpy as np
+
+from optlearn import graph_utils
+
+from optlearn.mip import pricing
+from optlearn.mip import warm_start
+from optlearn.mst import held_karp
+
+
+FIXING_TOLERANCE = 1e-6
+
+
+def get_tour_mask(graph, tour):
+    """ Get the mask of the weight matrix entries that are edges of the closed tour """
+
+    positions = warm_start.get_tour_positions(graph, tour)
+    order = graph_utils.get_order(graph)
+    mask = np.zeros((order, order), dtype=bool)
+    mask[positions, np.roll(positions, -1)] = True
+    if graph_utils.check_graph(graph):
+        mask = mask | mask.T
+    return mask
+
+
+def compute_fixed_mask(present, lp_bound, costs, upper_bound, tolerance=FIXING_TOLERANCE):
+    """ Get the mask of the edges whose LP bound plus reduced cost exceeds the upper bound """
+    """ Every tour through such an edge is longer than the heuristic tour, so none is optimal """
+
+    slack = tolerance * max(1, abs(upper_bound))
+    return present & (lp_bound + costs > upper_bound + slack)
+
+
+def get_candidate_vector(graph, fixed):
+    """ Get the indicator of the edges that are not fixed, in the graph edge order """
+
+    edges = graph_utils.get_edge_array(graph) - graph_utils.get_min_vertex(graph)
+    return ~fixed[edges[:, 0], edges[:, 1]]
+
+
+def get_candidate_indices(graph, candidate_graph):
+    """ Get the position of each candidate edge of the graph among the candidate graph edges """
+    """ Only valid for the graph edges with a True candidate vector entry """
+
+    positions = graph_utils.get_canonical_edge_positions(graph)
+    present = graph_utils.get_canonical_edge_positions(candidate_graph)
+    return np.searchsorted(present, positions)
+
+
+class reducedCostFixer():
+    """ Remove the edges that provably cannot be in an optimal tour, before any pruning """
+
+    def __init__(self, constructor="christofides", local_search=True,
+                 tolerance=FIXING_TOLERANCE, verbose=False, use_lp=True, use_held_karp=False):
+        """ Setup the fixer, the upper bound comes from the given tour constructor """
+        """ Edges are fixed by the LP reduced costs, the Held-Karp alpha-nearness, or both """
+
+        self.constructor = constructor
+        self.local_search = local_search
+        self.tolerance = tolerance
+        self.verbose = verbose
+        self.use_lp = use_lp
+        self.use_held_karp = use_held_karp
+
+    def compute_upper_bound(self, graph):
+        """ Build the heuristic tour giving the upper bound """
+
+        self.tour, self.upper_bound = warm_start.build_tour(graph, constructor=self.constructor,
+                                                            local_search=self.local_search)
+        return self.upper_bound
+
+    def compute_lp_costs(self, graph):
+        """ Solve the subtour LP over all edges, starting from the tour and nearest neighbours """
+
+        loop = pricing.pricingLoop(graph, tolerance=self.tolerance, verbose=self.verbose)
+        active = loop.repair(get_tour_mask(graph, self.tour) & loop.present)
+        _, self.lp_bound, costs = loop.solve_relaxation(active)
+        return loop.present, costs
+
+    def compute_held_karp_fixed_mask(self, graph, present):
+        """ Compute the mask of the edges that force every 1-tree above the upper bound """
+        """ Asymmetric graphs use the cheaper direction, so both directions share an alpha """
+
+        engine = held_karp.heldKarpBound(upper_bound=self.upper_bound)
+        self.held_karp_bound = engine.compute(graph)
+        return compute_fixed_mask(present, self.held_karp_bound, engine.alphas,
+                                  self.upper_bound, self.tolerance)
+
+    def compute_fixed_mask(self, graph):
+        """ Compute the mask of the weight matrix entries of the fixed edges """
+
+        self.compute_upper_bound(graph)
+        present = pricing.get_active_mask(graph)
+        fixed = np.zeros(present.shape, dtype=bool)
+        if not np.isfinite(self.upper_bound):
+            return fixed
+        if self.use_lp:
+            present, costs = self.compute_lp_costs(graph)
+            fixed = compute_fixed_mask(present, self.lp_bound, costs,
+                                       self.upper_bound, self.tolerance)
+        if self.use_held_karp:
+            fixed = fixed | self.compute_held_karp_fixed_mask(graph, present)
+        return fixed
+
+    def fix_graph(self, graph):
+        """ Get the dense graph of the candidate edges, those that are not fixed """
+        """ The candidate vector marks them in the edge order of the given graph """
+
+        start = time.time()
+        self.lp_bound, self.held_karp_bound = None, None
+        fixed = self.compute_fixed_mask(graph)
+        self.candidates = get_candidate_vector(graph, fixed)
+        self.fixed_edges = int(np.sum(~self.candidates))
+        self.timing = time.time() - start
+        matrix = np.asarray(graph_utils.get_weight_matrix(graph), dtype=np.float64)
+        present = np.isfinite(matrix) & ~fixed
+        return pricing.build_active_graph(matrix, present, graph_utils.get_min_vertex(graph),
+                                          graph_utils.check_graph(graph))
+
+    def get_info(self):
+        """ Get the summary of the last fixing """
+
+        return {
+            "fixed_edges": self.fixed_edges,
+            "candidate_edges": int(np.sum(self.candidates)),
+            "upper_bound": self.upper_bound,
+            "lp_bound": self.lp_bound,
+            "held_karp_bound": self.held_karp_bound,
+            "time": self.timing,
+        }
@@ -1,24 +1,81 @@
+import os
+import time
+import functools
+import multiprocessing
+
 import numpy as np
 
+from multiprocessing import shared_memory
+
 from optlearn import graph_utils
 
+from optlearn.feature import bet_and_run
 from optlearn.mst import mst_model
+from optlearn.mst import local_search
+from optlearn.mst import tour_construction
+
+
+_tour_builders = [
+    tour_construction.compute_christofides_tours,
+    tour_construction.compute_doubletree_tours,
+]
+
+
+def compute_diverse_tour(matrix, seed, perturbation=0.1, improve=True):
+    """ Compute the zero-based tour of the given seed, seed zero is left unperturbed """
+    """ Seeds choose the constructor, perturb the weights it sees, and pick the direction """
+    """ and the roll of the circuit, the local search always runs on the true weights """
+
+    rng = np.random.default_rng(seed)
+    weights = tour_construction.get_symmetric_matrix(matrix)
+    if seed > 0 and perturbation > 0:
+        noise = 1 + perturbation * rng.random(weights.shape)
+        weights = weights * np.minimum(noise, noise.T)
+    builder = _tour_builders[seed % len(_tour_builders)]
+    if builder is tour_construction.compute_christofides_tours:
+        tours = builder(weights, matching="greedy", roll=int(rng.integers(len(weights))))
+    else:
+        tours = builder(weights, roll=int(rng.integers(len(weights))))
+    tour = tours[int(rng.integers(2))]
+    if improve:
+        tour = local_search.localSearch().improve(matrix, tour)
+    return tour
+
+
+def run_shared_tour(spec, seed, perturbation=0.1, improve=True):
+    """ Worker entry point, a diverse tour of the weight matrix in shared memory """
+
+    block = shared_memory.SharedMemory(name=spec["name"])
+    try:
+        matrix = np.ndarray(spec["shape"], dtype=np.float64, buffer=block.buf)
+        tour = compute_diverse_tour(matrix, seed, perturbation, improve)
+        del matrix
+        return tour
+    finally:
+        block.close()
 
 
 class feasifierWrapper():
 
-    def feasify_prune_vector(self, graph, y):
+    def _improve_tour(self, graph, tour):
+        """ Improve the tour with local search, if the feasifier asks for it """
+
+        if not getattr(self, "local_search", False):
+            return tour
+        return local_search.localSearch().improve_tour(graph, tour)
+
+    def feasify_prune_vector(self, graph, y, context=None):
         """ Given the pruning vector, feasify it """
 
-        return (self.compute_feasifier_vector(graph) + y).astype(bool)
+        return (self.compute_feasifier_vector(graph, context=context) + y).astype(bool)
 
 
 class blankFeasifier(feasifierWrapper):
 
-    def compute_feasifier_vector(self, graph):
+    def compute_feasifier_vector(self, graph, context=None):
         """ Compute the feasifier vector """
 
-        return np.ones((len(graph.edges)))
+        return np.ones((graph_utils.get_size(graph)))
     
 
 class scratchFeasifier(feasifierWrapper):
@@ -30,7 +87,7 @@ class scratchFeasifier(feasifierWrapper):
     def _compute_nonzeros(self, graph):
         """ Compute the number of indices that should be nonzero """
         
-        return len(graph.nodes) /  len(graph.edges) 
+        return graph_utils.get_order(graph) / graph_utils.get_size(graph)
 
     def _fudge_feasifier_vector(self, graph):
         """ Compute a fudged feasifier vector """
@@ -38,7 +95,7 @@ class scratchFeasifier(feasifierWrapper):
         p = _compute_nonzeros(self, graph)
         return np.random.choice([0, 1], size=(m), p=[1-p, p])
 
-    def compute_feasifier_vector(self, graph):
+    def compute_feasifier_vector(self, graph, context=None):
         """ Compute the feasifier vector """
 
         return self._fudge_feasifier_vector(graph)
@@ -46,55 +103,148 @@ class scratchFeasifier(feasifierWrapper):
 
 class doubleTreeFeasifier(feasifierWrapper):
 
-    def _compute_doubletree_tour(self, graph):
-        """ Compute the doubletree tour """
+    def __init__(self, local_search=False):
+
+        self.local_search = local_search
+
+    def _compute_doubletree_tour(self, graph, context=None):
+        """ Compute the doubletree tour, using the context's tree if given """
 
         model = mst_model.doubleTreeConstructor()
-        return model.get_doubletour(graph)
+        if context is None:
+            return model.get_doubletour(graph)
+        return model.get_doubletour_from_tree(context.get_minimum_spanning_tree())
 
-    def _compute_doubletree_edges(self, graph):
+    def _compute_doubletree_edges(self, graph, context=None):
         """ Compute the doubletree edges """
 
-        tour = self._compute_doubletree_tour(graph)
+        tour = self._improve_tour(graph, self._compute_doubletree_tour(graph, context))
         is_symmetric = graph_utils.check_graph(graph) 
         return graph_utils.get_tour_edges(tour, is_symmetric)
 
-    def compute_feasifier_vector(self, graph):
+    def compute_feasifier_vector(self, graph, context=None):
         """ Compute the feasifier vector """
 
-        edges = self._compute_doubletree_edges(graph)
+        edges = self._compute_doubletree_edges(graph, context)
         return graph_utils.compute_indicator_vector(graph, edges)
 
 
 class christofidesFeasifier(feasifierWrapper):
 
-    def __init__(self, rounds=1):
+    def __init__(self, rounds=1, matching="exact", local_search=False):
 
         self.rounds = rounds
+        self.matching = matching
+        self.local_search = local_search
 
-    def _compute_christofides_tour(self, graph):
-        """ Compute the Christofides tour """
+    def _compute_christofides_tour(self, graph, context=None):
+        """ Compute the Christofides tour, using the context's tree if given """
 
-        model = mst_model.christofidesConstructor()
-        return model.get_christofides_tour(graph)
+        model = mst_model.christofidesConstructor(matching=self.matching)
+        if context is None or not graph_utils.check_graph(graph):
+            return model.get_christofides_tour(graph)
+        return model.get_christofides_tour(graph, tree=context.get_minimum_spanning_tree())
 
-    def _compute_christofides_edges(self, graph):
+    def _compute_christofides_edges(self, graph, context=None):
         """ Compute the Christofides edges """
 
-        tour = self._compute_christofides_tour(graph)
+        tour = self._improve_tour(graph, self._compute_christofides_tour(graph, context))
         is_symmetric = graph_utils.check_graph(graph) 
         return graph_utils.get_tour_edges(tour, is_symmetric)
 
-    def compute_feasifier_vector(self, graph):
+    def compute_feasifier_vector(self, graph, context=None):
         """ Compute the feasifier vector """
 
-        edges = self._compute_christofides_edges(graph)
+        edges = self._compute_christofides_edges(graph, context)
         return graph_utils.compute_indicator_vector(graph, edges)
 
 
+class multiTourFeasifier(feasifierWrapper):
+    """ Feasify with the union of several diverse tours, computed in a process pool """
+
+    def __init__(self, tours=8, workers=None, budget=None, perturbation=0.1,
+                 local_search=True, seed=0):
+        """ Setup the feasifier, tours still running when the budget in seconds is spent """
+        """ are dropped, but the first tour is always waited for """
+
+        self.tours = tours
+        self.workers = workers or min(tours, os.cpu_count())
+        self.budget = budget
+        self.perturbation = perturbation
+        self.local_search = local_search
+        self.seed = seed
+
+    def get_seeds(self):
+        return [self.seed + tour for tour in range(self.tours)]
+
+    def get_remaining(self, start):
+        """ Get the seconds left of the budget, None if there is no budget """
+
+        if self.budget is None:
+            return None
+        return max(self.budget - (time.time() - start), 0)
+
+    def compute_tours_serial(self, graph, start):
+        """ Compute the tours one after the other in this process """
+
+        matrix = np.asarray(graph_utils.get_weight_matrix(graph), dtype=np.float64)
+        tours = []
+        for seed in self.get_seeds():
+            if len(tours) > 0 and self.get_remaining(start) == 0:
+                break
+            tours.append(compute_diverse_tour(matrix, seed, self.perturbation, self.local_search))
+        return tours
+
+    def compute_tours_parallel(self, graph, start):
+        """ Compute the tours in a process pool, the weight matrix is shared, not pickled """
+        """ The pool is terminated once the budget is spent, so no worker outlives it """
+
+        block, spec = bet_and_run.share_graph(graph)
+        pool = multiprocessing.Pool(processes=self.workers)
+        tours = []
+        try:
+            results = pool.imap_unordered(functools.partial(run_shared_tour, spec,
+                                                            perturbation=self.perturbation,
+                                                            improve=self.local_search),
+                                          self.get_seeds())
+            while len(tours) < self.tours:
+                timeout = None if len(tours) == 0 else self.get_remaining(start)
+                tours.append(results.next(timeout))
+        except multiprocessing.TimeoutError:
+            pass
+        finally:
+            pool.terminate()
+            pool.join()
+            block.close()
+            block.unlink()
+        return tours
+
+    def compute_tours(self, graph):
+        """ Compute the tours within the budget, as arrays of graph vertices """
+
+        start = time.time()
+        if self.workers > 1 and self.tours > 1:
+            tours = self.compute_tours_parallel(graph, start)
+        else:
+            tours = self.compute_tours_serial(graph, start)
+        self.timing = time.time() - start
+        vertices = np.sort(np.asarray(graph_utils.get_vertices(graph)))
+        return [vertices[tour] for tour in tours]
+
+    def compute_feasifier_vector(self, graph, context=None):
+        """ Compute the feasifier vector """
+
+        is_symmetric = graph_utils.check_graph(graph)
+        tours = self.compute_tours(graph)
+        self.computed_tours = len(tours)
+        edges = np.concatenate([graph_utils.get_tour_edges(tour, is_symmetric) for tour in tours])
+        return graph_utils.compute_indicator_vector(graph, np.unique(edges, axis=0))
+
+
 _feasifiers = [
     None,
     scratchFeasifier,
     doubleTreeFeasifier,
     christofidesFeasifier,
+    multiTourFeasifier,
 ]
@@ -3,6 +3,8 @@ import numpy as np
 from optlearn import graph_utils
 
 from optlearn.fix import fix_utils
+from optlearn.fix import feasifiers
+from optlearn.fix import repair
 from optlearn.mst import mst_model
 
 
@@ -10,15 +12,7 @@ def ensure_minimum_degree(original_graph, pruned_graph, threshold=None):
     """ Make sure that each vertex has minium degree of threshold in the pruned graph """
 
     threshold = threshold or graph_utils.logceil(pruned_graph)
-
-    if fix_utils.is_weakly_connected(pruned_graph):
-        new_edges = fix_utils.get_all_k_min_strenghtheners(original_graph,
-                                                           pruned_graph,
-                                                           threshold
-        )
-    else:
-        return pruned_graph
-    
+    new_edges = repair.get_repair_edges(original_graph, pruned_graph, threshold=threshold)
     return fix_utils.migrate_edges(original_graph, pruned_graph, new_edges)
 
 
@@ -26,15 +20,16 @@ def ensure_connected(original_graph, pruned_graph, threshold=None):
     """ Make sure that the graph is connected with threshold edges between components """
 
     threshold = threshold or graph_utils.logceil(pruned_graph)
+    new_edges = repair.get_repair_edges(original_graph, pruned_graph, k=threshold)
+    return fix_utils.migrate_edges(original_graph, pruned_graph, new_edges)
 
-    if not fix_utils.is_connected(pruned_graph):
-        new_edges = fix_utils.get_all_k_min_connectors(original_graph,
-                                                       pruned_graph,
-                                                       threshold,
-        )
-    else:
-        return pruned_graph
-        
+
+def ensure_repaired(original_graph, pruned_graph, degree=None, connectors=None):
+    """ Make sure of the minimum degree and then of connectivity, in one pass over the mask """
+
+    degree = degree or graph_utils.logceil(pruned_graph)
+    connectors = connectors or graph_utils.logceil(pruned_graph)
+    new_edges = repair.get_repair_edges(original_graph, pruned_graph, degree, connectors)
     return fix_utils.migrate_edges(original_graph, pruned_graph, new_edges)
 
 
@@ -60,3 +55,14 @@ def ensure_doubletree(original_graph, pruned_graph, iterations=None):
 
         
     return pruned_graph 
+
+
+def ensure_multitour(original_graph, pruned_graph, tours=8, budget=None):
+    """ Make sure that the graph has the edges of several diverse tours, found in parallel """
+
+    model = feasifiers.multiTourFeasifier(tours=tours, budget=budget)
+    is_symmetric = graph_utils.check_graph(original_graph)
+    for tour in model.compute_tours(original_graph):
+        edges = graph_utils.get_tour_edges(tour, is_symmetric).tolist()
+        pruned_graph = fix_utils.migrate_edges(original_graph, pruned_graph, edges)
+    return pruned_graph
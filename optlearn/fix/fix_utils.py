@@ -31,7 +31,7 @@ def get_weak_nodes(graph, threshold=None):
 def get_ghost_edges(original_graph, pruned_graph, node, threshold=None):
     """ Find the neighbours of the original graph not in the pruned_graph """
 
-    original_neighbours = list(original_graph[node])
+    original_neighbours = graph_utils.get_neighbours(original_graph, node)
     pruned_neighbours = list(pruned_graph[node])
     return [(node, other) for other in original_neighbours if other not in pruned_neighbours]
 
@@ -50,7 +50,7 @@ def migrate_edges(original_graph, pruned_graph, edges):
     """ Copy the given edges to the pruned graph, retaining their attributes """
 
     for edge in edges:
-        pruned_graph.add_edge(*edge, **original_graph[edge[0]][edge[1]])
+        pruned_graph.add_edge(*edge, **graph_utils.get_edge_data(original_graph, *edge))
     return pruned_graph
 
 
@@ -95,7 +95,7 @@ def get_components(pruned_graph):
 def get_ghost_connectors(original_graph, component_a, component_b):
     """ Get the edges that connect from the original graph that connect two components """
 
-    return [edge for edge in original_graph.edges if
+    return [edge for edge in graph_utils.get_edges(original_graph) if
             (edge[0] in component_a and edge[1] in component_b) or
             (edge[0] in component_b and edge[1] in component_a)
             ]
@@ -0,0 +1,116 @@
+import numpy as np
+
+from optlearn import graph_utils
+
+
+def get_sorted_vertices(graph):
+    """ Get the vertices in the order of the weight matrix rows """
+
+    return np.sort(np.asarray(graph_utils.get_vertices(graph)))
+
+
+def get_pruned_mask(original_graph, pruned_graph):
+    """ Get the symmetric mask of the pruned graph edges over the original weight matrix """
+
+    vertices = get_sorted_vertices(original_graph)
+    edges = np.searchsorted(vertices, graph_utils.get_edge_array(pruned_graph))
+    mask = np.zeros((len(vertices), len(vertices)), dtype=bool)
+    mask[edges[:, 0], edges[:, 1]] = True
+    return mask | mask.T
+
+
+def compute_degree_edges(matrix, mask, threshold):
+    """ Get the cheapest missing edges that lift every vertex to the threshold degree """
+    """ Only the rows of the weak vertices are partitioned, wide enough to skip the """
+    """ edges they already have, so the mask is only read at the partitioned columns """
+
+    degrees = mask.sum(axis=1)
+    weak = np.flatnonzero(degrees < threshold)
+    if len(weak) == 0:
+        return np.zeros((0, 2), dtype=int)
+    needed = threshold - degrees[weak]
+    width = min(threshold + 1, len(matrix))
+    rows = matrix[weak] if len(weak) < len(matrix) else matrix
+    nearest = np.argpartition(rows, width - 1, axis=1)[:, :width]
+    weights = matrix[weak[:, None], nearest]
+    weights[mask[weak[:, None], nearest] | (nearest == weak[:, None])] = np.inf
+    order = np.argsort(weights, axis=1)
+    nearest = np.take_along_axis(nearest, order, axis=1)
+    weights = np.take_along_axis(weights, order, axis=1)
+    keep = (np.arange(width)[None, :] < needed[:, None]) & np.isfinite(weights)
+    return np.stack([np.repeat(weak, keep.sum(axis=1)), nearest[keep]], axis=1)
+
+
+def select_group_minima(weights, groups, k):
+    """ Get the indices of the k smallest weights of every group """
+
+    order = np.argsort(weights, kind="stable")
+    order = order[np.argsort(groups[order], kind="stable")]
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[ranks < k]
+
+
+def compute_connector_edges(matrix, mask, k):
+    """ Get the k cheapest edges between every pair of components of the mask """
+    """ Each component is compared with all later ones at once, the k nearest members """
+    """ of each outside vertex are kept by argpartition and then the k cheapest per component """
+
+    rows, cols = np.nonzero(mask)
+    labels = graph_utils.compute_component_labels(len(matrix), rows, cols)
+    members = graph_utils.get_component_members(labels)
+    if len(members) == 1:
+        return np.zeros((0, 2), dtype=int)
+    groups = np.zeros(len(matrix), dtype=int)
+    for index, component in enumerate(members):
+        groups[component] = index
+    connectors = []
+    for index, component in enumerate(members[:-1]):
+        others = np.concatenate(members[index + 1:])
+        block = np.ascontiguousarray(matrix[np.ix_(component, others)].T)
+        if len(component) > k:
+            nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        else:
+            nearest = np.broadcast_to(np.arange(len(component)), block.shape)
+        weights = np.take_along_axis(block, nearest, axis=1).ravel()
+        columns = np.repeat(np.arange(len(others)), nearest.shape[1])
+        nearest = nearest.ravel()
+        best = select_group_minima(weights, groups[others[columns]], k)
+        best = best[np.isfinite(weights[best])]
+        connectors.append(np.stack([component[nearest[best]], others[columns[best]]], axis=1))
+    return np.concatenate(connectors)
+
+
+def add_mask_edges(mask, edges):
+    """ Mark the zero-based edges in the mask, both ways around """
+
+    mask = mask.copy()
+    mask[edges[:, 0], edges[:, 1]] = True
+    mask[edges[:, 1], edges[:, 0]] = True
+    return mask
+
+
+def repair_mask(matrix, mask, threshold=None, k=None):
+    """ Repair the mask, first to the minimum degree and then to a connected graph """
+    """ Returns the repaired mask and the zero-based edges that were added """
+
+    added = []
+    if threshold is not None:
+        added.append(compute_degree_edges(matrix, mask, threshold))
+        mask = add_mask_edges(mask, added[-1])
+    if k is not None:
+        added.append(compute_connector_edges(matrix, mask, k))
+        mask = add_mask_edges(mask, added[-1])
+    if len(added) == 0:
+        return mask, np.zeros((0, 2), dtype=int)
+    return mask, np.concatenate(added)
+
+
+def get_repair_edges(original_graph, pruned_graph, threshold=None, k=None):
+    """ Get the original graph edges that repair the pruned graph, as vertex pairs """
+
+    matrix = np.asarray(graph_utils.get_weight_matrix(original_graph), dtype=np.float64)
+    mask = get_pruned_mask(original_graph, pruned_graph)
+    _, edges = repair_mask(matrix, mask, threshold, k)
+    return get_sorted_vertices(original_graph)[edges].tolist()
@@ -5,28 +5,45 @@ import random
 import numpy as np
 import networkx as nx
 
+from optlearn import dense_graph
+from optlearn import edge_index
+
+
+def is_dense(graph):
+    """ Check if the graph is stored as a dense distance matrix """
+
+    return isinstance(graph, dense_graph.DenseTSPGraph)
+
 
 def get_order(graph):
     """ Get the order of a graph """
 
+    if is_dense(graph):
+        return graph.order
     return len(graph.nodes)
 
 
 def get_size(graph):
     """ Get the size of the graph """
 
+    if is_dense(graph):
+        return graph.size
     return len(graph.edges)
 
 
 def get_min_vertex(graph):
     """ Get the value of the minimum vertex """
 
+    if is_dense(graph):
+        return graph.min_vertex
     return np.min(graph.nodes)
 
 
 def get_edge_weight(graph, vertex_a, vertex_b):
     """ Get edge weight between two vertices, if there is no edge return np.inf """
 
+    if is_dense(graph):
+        return graph.get_edge_weight(vertex_a, vertex_b)
     vertex = graph[vertex_a]
     try:
         weight = vertex[vertex_b]["weight"]
@@ -38,18 +55,32 @@ def get_edge_weight(graph, vertex_a, vertex_b):
 def get_edges_weights(graph, edges):
     """ Get the weights between the given edges """
 
+    if is_dense(graph):
+        return graph.get_edges_weights(edges).tolist()
     return [get_edge_weight(graph, *edge) for edge in edges]
 
     
 def get_neighbours(graph, vertex):
     """ Get neighbours of vertex (including self) """
 
+    if is_dense(graph):
+        return graph.get_neighbours(vertex).tolist()
     return list(graph[vertex].keys())
 
 
+def get_edge_data(graph, vertex_a, vertex_b):
+    """ Get the attribute dictionary of the edge between two vertices """
+
+    if is_dense(graph):
+        return {"weight": graph.get_edge_weight(vertex_a, vertex_b)}
+    return graph[vertex_a][vertex_b]
+
+
 def get_edge_weights(graph, vertex, out=True):
     """ Get edge weights for edges for a given vertex """
 
+    if is_dense(graph):
+        return graph.get_incident_weights(vertex, out=out)
     if out: 
         return [get_edge_weight(graph, vertex, item)
                 for item in get_neighbours(graph, vertex)]
@@ -79,18 +110,52 @@ def mean_weight(graph, vertex, out=True):
 def get_vertices(graph):
     """ Get all of the graph vertices in a sorted array """
     
+    if is_dense(graph):
+        return graph.nodes
     return np.array(list(graph.nodes))
 
 
 def get_edges(graph):
     """ Get all of the graph edges in a sorted array """
 
+    if is_dense(graph):
+        return [tuple(edge) for edge in graph.edges.tolist()]
     return list(graph.edges)
 
 
+def get_edge_array(graph):
+    """ Get all of the graph edges as an (E, 2) integer array """
+
+    if is_dense(graph):
+        return graph.edges
+    return np.array(list(graph.edges), dtype=int).reshape(-1, 2)
+
+
+def get_canonical_edge_positions(graph):
+    """ Get the canonical positions of the graph edges, in the graph edge order """
+
+    edges = get_edge_array(graph) - get_min_vertex(graph)
+    return edge_index.compute_positions(edges[:, 0],
+                                        edges[:, 1],
+                                        get_order(graph),
+                                        check_graph(graph)
+    )
+
+
+def get_weight_matrix(graph, weight="weight"):
+    """ Get the (order x order) weight matrix, with np.inf where there is no edge """
+
+    if is_dense(graph):
+        return graph.matrix
+    nodes = sorted(graph.nodes)
+    return nx.to_numpy_array(graph, nodelist=nodes, weight=weight, nonedge=np.inf)
+
+
 def get_weights(graph, weight="weight"):
     """ Get all of the graph edges in the same order as the edges """
 
+    if is_dense(graph):
+        return graph.weights
     edges = get_edges(graph)
     return [graph[edge[0]][edge[1]][weight] for edge in edges]
 
@@ -142,6 +207,8 @@ def get_tour_lengths(graph, tour):
     """ Get an array of edge lengths for a tour """
 
     edges = get_tour_edges(tour)
+    if is_dense(graph):
+        return graph.get_edges_weights(edges)
     return np.array([get_edge_weight(graph, *edge) for edge in edges])
 
     
@@ -256,6 +323,32 @@ def check_cycle(graph):
         return []
 
 
+def compute_component_labels(order, rows, cols):
+    """ Label the connected components of the zero-based edges with array union-find """
+    """ Every vertex is labelled with the smallest vertex of its component """
+
+    labels = np.arange(order)
+    rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+    while True:
+        roots_a, roots_b = labels[rows], labels[cols]
+        if np.array_equal(roots_a, roots_b):
+            return labels
+        lows = np.minimum(roots_a, roots_b)
+        np.minimum.at(labels, roots_a, lows)
+        np.minimum.at(labels, roots_b, lows)
+        jumped = labels[labels]
+        while not np.array_equal(jumped, labels):
+            labels, jumped = jumped, jumped[jumped]
+
+
+def get_component_members(labels):
+    """ Get the zero-based members of each component, ordered by their smallest member """
+
+    order = np.argsort(labels, kind="stable")
+    splits = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, splits)
+
+
 def compute_mincut(graph, vertex_a, vertex_b, capacity="weight"):
     """ Compute the mincut for the given graph """
 
@@ -281,6 +374,8 @@ def compute_unique_mincut_values(graph, capacity="weight"):
 def check_graph(graph):
     """ Check if the given graph is undirected """
 
+    if is_dense(graph):
+        return graph.symmetric
     return type(graph) == nx.Graph
 
 
@@ -293,7 +388,7 @@ def check_digraph(graph):
 def logceil(graph, clip=True):
     """ Get the ceiling of log_{2}(n) """
 
-    value = int(np.ceil(np.log2(len(graph.nodes))))
+    value = int(np.ceil(np.log2(get_order(graph))))
 
     if clip:
         return max(5, value)
@@ -323,10 +418,7 @@ def compute_vector_index_symmetric(edge, order, min_vertex):
     if i >= j:
         raise ValueError("Indices not symmetric: {}, {}".format(i, j))
     
-    vertical_offset = np.sum([order - k + (min_vertex - 1)
-                              for k in range(1 - (1 - min_vertex), i)])
-    horizontal_offset = j - i - 1 
-    return int(vertical_offset + horizontal_offset)
+    return edge_index.compute_edge_index(edge, order, min_vertex, symmetric=True)
 
 
 def compute_vector_index(edge, order, min_vertex, symmetric=True):
@@ -335,16 +427,18 @@ def compute_vector_index(edge, order, min_vertex, symmetric=True):
     if symmetric:
         return compute_vector_index_symmetric(edge, order, min_vertex)
     else:
-        raise Exception("Assymetric edge index computer not implemented!")
+        return edge_index.compute_edge_index(edge, order, min_vertex, symmetric=False)
         
 
 def compute_indicator_vector(graph, edges):
     """ Build an indicator vector of length size(graph) for the given edges """
 
+    if is_dense(graph):
+        return build_indicator_vector(graph.size, graph.edge_positions(edges))
     symmetric = check_graph(graph)
     size, order = get_size(graph), get_order(graph)
     min_vertex = get_min_vertex(graph)
-    indices = [compute_vector_index(edge, order, min_vertex, symmetric) for edge in edges]
+    indices = edge_index.compute_edge_indices(edges, order, min_vertex, symmetric)
     return build_indicator_vector(size, indices)
 
 
@@ -3,6 +3,7 @@ import tsplib95
 import numpy as np
 
 from optlearn import graph_utils
+from optlearn import dense_graph
 
 
 _write_fields = [
@@ -103,6 +104,23 @@ class optObject():
             self._set_graph()
         return self._graph
 
+    def _check_dense_graph(self):
+        """ Check if the dense graph is already set """
+
+        return hasattr(self, "_dense_graph")
+
+    def _set_dense_graph(self, dtype=np.float64):
+        """ Set the dense graph, straight from the problem """
+
+        self._dense_graph = dense_graph.from_tsplib_problem(self._problem, dtype=dtype)
+
+    def get_dense_graph(self, dtype=np.float64):
+        """ Get the graph as a distance matrix, without building it in networkx """
+
+        if not self._check_dense_graph() or self._dense_graph.matrix.dtype != dtype:
+            self._set_dense_graph(dtype=dtype)
+        return self._dense_graph
+
     def get_solution(self):
         return self._solution
 
@@ -1,24 +1,22 @@
 import numpy as np
 
 from optlearn import graph_utils
+from optlearn import edge_index
 
 
 def build_indicator_vector(length, indices):
     """ Build a binary vector with nonzeros only at the given indices """
 
     vector = np.zeros((length))
-    for index in indices:
-        vector[index] = 1
+    vector[np.asarray(indices, dtype=int)] = 1
     return vector
 
 
 def compute_labels_from_edges(edges, order, min_vertex, symmetric=True):
     """ Build the binary label vector, given the edges """
 
-    length = int((order * (order - 1)) / (int(symmetric) + 1))
-    print(length)
-    indices = [graph_utils.compute_vector_index(edge, order, min_vertex, symmetric)
-               for edge in edges]
+    length = edge_index.get_canonical_size(order, symmetric)
+    indices = edge_index.compute_edge_indices(edges, order, min_vertex, symmetric)
     return build_indicator_vector(length, indices)
     
 
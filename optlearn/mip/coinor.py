@@ -61,6 +61,13 @@ def set_edge_objective(problem, variable_dict, graph):
     problem.objective = objective
 
 
+def set_indexed_objective(problem, variables, weights):
+    """ Set the edge objective, given the variables and their weights """
+
+    objective = coinor_sum(mip_utils.define_indexed_objective(variables, weights))
+    problem.objective = objective
+
+
 def set_constraint(problem, lhs, rhs, operator):
     """ Set a constraint for the given problem """
 
@@ -98,6 +105,7 @@ _funcs = {
     "perform_relaxation": perform_relaxation,
     "add_variables": add_variables,
     "edge_objective": set_edge_objective,
+    "indexed_objective": set_indexed_objective,
     "set_constraint": set_constraint,
     "solve_problem": solve_problem,
     "get_varnames": get_varnames,
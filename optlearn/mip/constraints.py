@@ -1,18 +1,29 @@
+import time
+
 import numpy as np
 # import xpress as xp
 import networkx as nx
 import binpacking as bp
 
+from scipy import sparse
+from scipy.sparse import csgraph
+
 from pyscipopt import Conshdlr, Eventhdlr, SCIP_RESULT, quicksum, SCIP_EVENTTYPE
 
 from optlearn import io_utils
 from optlearn import plotting
+from optlearn import graph_utils
 
 from optlearn.mip import mip_utils
 # from optlearn.mip import xpress
 from optlearn.mip import scip
 
 
+# Support values are scaled to integer capacities for the max-flow computations
+CAPACITY_SCALE = 10 ** 6
+SUPPORT_THRESHOLD = 1e-6
+
+
 def initialise_connection_graph(is_symmetric=True):
     """ Set the mincut graph """
         
@@ -43,7 +54,7 @@ class subtourStrategy():
 
         if self.cut_strategy is None:
             self.cut_strategy = "small_if_possible"
-        if self.cut_strategy not in ["small_if_possible", "all"]:
+        if self.cut_strategy not in ["small_if_possible", "all", "mincut"]:
             self.cut_strategy = "small_if_possible"
 
     def get_subtour_lens(self, subtours):
@@ -88,6 +99,208 @@ class subtourStrategy():
             return self.get_all_subtours(subtours)
 
 
+class subtourSeparator():
+    """ Find the subtours of solutions to the problem of the given solver """
+    """ The vertex positions and the (i, j) -> variable lookup are built once """
+
+    def __init__(self, solver, threshold=SUPPORT_THRESHOLD, tolerance=1e-4):
+        self.solver = solver
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.vertices = np.sort(np.asarray(solver.vertices))
+        self.rows = np.searchsorted(self.vertices, solver.edge_array[:, 0])
+        self.cols = np.searchsorted(self.vertices, solver.edge_array[:, 1])
+        self.lookup = self.build_variable_lookup()
+
+    def build_variable_lookup(self):
+        """ Build the matrix of variable positions, -1 where there is no variable """
+        """ Symmetric variables are only stored in the upper triangle """
+
+        order = len(self.vertices)
+        lookup = np.full((order, order), -1, dtype=np.int64)
+        rows, cols = self.rows, self.cols
+        if self.solver._is_symmetric:
+            rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+        lookup[rows, cols] = np.arange(len(rows))
+        return lookup
+
+    def get_solution_values(self, model, solution=None):
+        """ Read the values of all variables in a single pass """
+
+        get_value = model.getSolVal
+        variables = self.solver.variables
+        return np.fromiter((get_value(solution, variable) for variable in variables),
+                           dtype=float, count=len(variables))
+
+    def get_support(self, values):
+        """ Get the vertex positions of the edges with values above the threshold """
+
+        nonzeros = values > self.threshold
+        return self.rows[nonzeros], self.cols[nonzeros]
+
+    def get_support_edges(self, values):
+        """ Get the edge tuples with values above the threshold """
+
+        rows, cols = self.get_support(values)
+        return list(zip(self.vertices[rows].tolist(), self.vertices[cols].tolist()))
+
+    def find_components(self, values):
+        """ Find the vertex sets of the connected components of the solution support """
+
+        rows, cols = self.get_support(values)
+        touched = np.zeros(len(self.vertices), dtype=bool)
+        touched[rows], touched[cols] = True, True
+        labels = graph_utils.compute_component_labels(len(self.vertices), rows, cols)
+        return [set(self.vertices[members].tolist()) for members
+                in graph_utils.get_component_members(labels) if touched[members[0]]]
+
+    def get_edge_positions(self, edges):
+        """ Get the variable positions of the given edges, -1 where there is no variable """
+
+        edges = np.asarray(edges)
+        rows = np.searchsorted(self.vertices, edges[:, 0])
+        cols = np.searchsorted(self.vertices, edges[:, 1])
+        if self.solver._is_symmetric:
+            rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+        return self.lookup[rows, cols]
+
+    def get_cut_variables(self, subtour):
+        """ Get the variables with both ends in the subtour """
+
+        positions = np.searchsorted(self.vertices, sorted(subtour))
+        block = self.lookup[np.ix_(positions, positions)]
+        return [self.solver.variables[position] for position in block[block >= 0].tolist()]
+
+    def shrink_support(self, values):
+        """ Contract the paths of unit edges, giving the super-vertex of every vertex """
+        """ and the symmetric integer capacity matrix of the shrunk support """
+
+        rows, cols = self.get_support(values)
+        weights = values[values > self.threshold]
+        units = weights >= 1 - self.tolerance
+        labels = graph_utils.compute_component_labels(len(self.vertices), rows[units], cols[units])
+        _, supers = np.unique(labels, return_inverse=True)
+        order = supers.max() + 1
+        rows, cols = supers[rows], supers[cols]
+        capacities = np.rint(weights * CAPACITY_SCALE).astype(np.int64)
+        capacities = sparse.coo_matrix((np.concatenate([capacities, capacities]),
+                                        (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                                       shape=(order, order)).tocsr()
+        capacities.setdiag(0)
+        capacities.eliminate_zeros()
+        return supers, capacities
+
+    def compute_cut_side(self, capacities, source, sink):
+        """ Compute a minimum source-sink cut, giving its value and the source side """
+
+        result = csgraph.maximum_flow(capacities, source, sink)
+        residual = (capacities - result.flow).tocsr()
+        residual.data[residual.data < 0] = 0
+        residual.eliminate_zeros()
+        reachable = csgraph.breadth_first_order(residual, source, return_predecessors=False)
+        side = np.zeros(capacities.shape[0], dtype=bool)
+        side[reachable] = True
+        return result.flow_value, side
+
+    def find_mincut_subtours(self, values):
+        """ Find the vertex sets of the cuts below 2 in the shrunk support """
+        """ Gusfield's algorithm gives a minimum cut between every pair of super-vertices,
+            the smaller side of each violated cut is given. Only for symmetric problems """
+
+        supers, capacities = self.shrink_support(values)
+        order = capacities.shape[0]
+        limit = (2 - self.tolerance) * CAPACITY_SCALE
+        parents = np.zeros(order, dtype=int)
+        subtours, seen = [], set()
+        for source in range(1, order):
+            sink = parents[source]
+            value, side = self.compute_cut_side(capacities, source, sink)
+            later = np.arange(source + 1, order)
+            parents[later[side[later] & (parents[later] == sink)]] = source
+            if value >= limit:
+                continue
+            if 2 * side.sum() > order:
+                side = ~side
+            subtour = frozenset(self.vertices[side[supers]].tolist())
+            if subtour not in seen:
+                seen.add(subtour)
+                subtours.append(set(subtour))
+        return subtours
+
+
+def get_separator(handler):
+    """ Get the separator of a constraint handler, building it on first use """
+
+    if handler.separator is None:
+        handler.separator = subtourSeparator(handler.solver)
+    return handler.separator
+
+
+def record_timing(handler, start):
+    """ Record the time taken by one call of a constraint handler """
+
+    handler.timings.append(time.time() - start)
+
+
+class lp_cutting_loop():
+    """ Subtour cutting for pure LP solvers, which have no constraint handlers """
+    """ The LP is solved again after each round of cuts, until none are found """
+
+    def __init__(self, solver, max_rounds=1e10):
+        self.solver = solver
+        self.max_rounds = max_rounds
+        self.round_counter = 0
+        self.separator = None
+        self.timings = []
+        self.subtours = []
+
+    def find_subtours(self, values):
+        """ find and cut the subtours in the current solution """
+
+        start = time.time()
+        try:
+            return self.separate_subtours(values)
+        finally:
+            record_timing(self, start)
+
+    def separate_subtours(self, values):
+        """ find and cut the subtours in the current solution """
+
+        separator = get_separator(self)
+        components = separator.find_components(values)
+
+        if len(components) == 1 and self.check_mincut():
+            subtours = separator.find_mincut_subtours(values)
+        elif len(components) > 1:
+            subtour_selector = subtourStrategy(cut_strategy=self.solver.cut_strategy)
+            subtours = subtour_selector.get_subtours(components)
+        else:
+            subtours = []
+
+        for S in subtours:
+            lhs = self.solver._funcs["sum"](separator.get_cut_variables(S))
+            self.solver.set_constraint(lhs, len(S) - 1, "<=")
+            self.subtours.append(S)
+        return len(subtours) > 0
+
+    def check_mincut(self):
+        """ Check if connected fractional supports should be separated with minimum cuts """
+
+        return self.solver.cut_strategy == "mincut" and self.solver._is_symmetric
+
+    def optimise(self):
+        """ Solve and cut until there are no subtours or the rounds run out """
+
+        while True:
+            self.solver._funcs["solve_problem"](self.solver.problem)
+            values = np.asarray(self.solver.get_varvals())
+            self.solver.solutions.append(values)
+            if self.round_counter >= self.max_rounds or not self.find_subtours(values):
+                return None
+            self.round_counter += 1
+            self.solver.counter += 1
+
+
 class xpress_tsp_constraint_callback():
 
     def __init__(self, solver, max_rounds=1e10):
@@ -355,41 +568,53 @@ class tsp_constraint_handler(Conshdlr):
         self.solver = solver
         self.max_rounds = max_rounds
         self.round_counter = 0
+        self.separator = None
+        self.timings = []
+        self.subtours = []
     
     def find_subtours(self, checkonly, solution, variable_dict):
         """ find subtours in the current solution """
 
-        graph = nx.Graph()
-        
-        variables = list(self.solver.variable_dict.values())
-        keys = list(self.solver.variable_dict.keys())
-        solution = [self.model.getSolVal(solution, variable) for variable in variables]
-        self.solver.solutions.append(solution)
-        indices = [num for num, item in enumerate(solution) if item > 0]
-        nonzero_edges = [mip_utils.get_variable_tuple(variables[index].name) for index in indices]
-        graph.add_edges_from(nonzero_edges)
-        components = list(nx.connected_components(graph))
+        start = time.time()
+        try:
+            return self.separate_subtours(checkonly, solution)
+        finally:
+            record_timing(self, start)
+
+    def separate_subtours(self, checkonly, solution):
+        """ find and cut the subtours in the current solution """
+
+        separator = get_separator(self)
+        values = separator.get_solution_values(self.model, solution)
+        self.solver.solutions.append(values)
+        components = separator.find_components(values)
+
+        if len(components) == 1 and self.check_mincut():
+            subtours = separator.find_mincut_subtours(values)
+        else:
+            subtours = components if len(components) > 1 else []
         
-        if len(components) == 1 or self.round_counter >= self.max_rounds:
+        if len(subtours) == 0 or self.round_counter >= self.max_rounds:
             return False
         elif checkonly:
             return True
 
-        subtour_selector = subtourStrategy(cut_strategy=self.solver.cut_strategy)
+        if len(components) > 1:
+            subtour_selector = subtourStrategy(cut_strategy=self.solver.cut_strategy)
+            subtours = subtour_selector.get_subtours(components)
         
-        for S in subtour_selector.get_subtours(components):
-            if self.solver._is_symmetric:
-                varnames = ["x_{},{}".format(i, j) for i in S
-                            for j in S if j > i and "x_{},{}".format(i, j) in keys]
-            if self.solver._is_asymmetric:
-                varnames = ["x_{},{}".format(i, j) for i in S
-                            for j in S if "x_{},{}".format(i, j) in keys]                
-            self.model.addCons(quicksum(self.solver.variable_dict[name] for
-                                        name in varnames) <= len(S) - 1)
+        for S in subtours:
+            self.model.addCons(quicksum(separator.get_cut_variables(S)) <= len(S) - 1)
+            self.subtours.append(S)
         self.round_counter += 1
         self.solver.counter += 1
         return True
 
+    def check_mincut(self):
+        """ Check if connected fractional supports should be separated with minimum cuts """
+
+        return self.solver.cut_strategy == "mincut" and self.solver._is_symmetric
+
     def conscheck(self,
                   constraints,
                   solution,
@@ -422,21 +647,28 @@ class vrp_constraint_handler(Conshdlr):
         self.solver = solver
         self.max_rounds = max_rounds
         self.round_counter = 0
+        self.separator = None
+        self.timings = []
     
     def find_subtours(self, checkonly, solution, variable_dict):
         """ find subtours in the current solution """
 
-        graph = nx.Graph()
-        
-        variables = list(self.solver.variable_dict.values())
-        keys = list(self.solver.variable_dict.keys())
-        solution = [self.model.getSolVal(solution, variable) for variable in variables]
-        self.solver.solutions.append(solution)
-        indices = [num for num, item in enumerate(solution) if item > 0]
-        nonzero_edges = [mip_utils.get_variable_tuple(variables[index].name) for index in indices]
-        graph.add_edges_from(nonzero_edges)
-
-        if np.sum(solution) > 0 and np.sum(solution) < self.solver.vehicle_num + len(self.solver.vertices):
+        start = time.time()
+        try:
+            return self.separate_subtours(checkonly, solution)
+        finally:
+            record_timing(self, start)
+
+    def separate_subtours(self, checkonly, solution):
+        """ find and cut the subtours in the current solution """
+
+        separator = get_separator(self)
+        values = separator.get_solution_values(self.model, solution)
+        self.solver.solutions.append(values)
+
+        if np.sum(values) > 0 and np.sum(values) < self.solver.vehicle_num + len(self.solver.vertices):
+            graph = nx.Graph()
+            graph.add_edges_from(separator.get_support_edges(values))
             cycles = []
             while(len(graph.edges)) > 0:
                 edges = nx.find_cycle(graph)
@@ -445,7 +677,7 @@ class vrp_constraint_handler(Conshdlr):
 
                 components = [set(np.unique(item)) for item in cycles]
         else:
-            components = nx.connected_components(graph)
+            components = separator.find_components(values)
         
         components = [item for item in components
                       if len(item.intersection(set(self.solver.depots))) == 0 or
@@ -461,14 +693,7 @@ class vrp_constraint_handler(Conshdlr):
         for S in subtour_selector.get_subtours(components):
             min_vehicles = len(bp.to_constant_volume({item: self.solver.demands[item]
                                                   for item in S}, self.solver.get_capacity()))
-            if self.solver._is_symmetric:
-                varnames = ["x_{},{}".format(i, j) for i in S
-                            for j in S if j > i and "x_{},{}".format(i, j) in keys]
-            if self.solver._is_asymmetric:
-                varnames = ["x_{},{}".format(i, j) for i in S
-                            for j in S if "x_{},{}".format(i, j) in keys]                
-            self.model.addCons(quicksum(self.solver.variable_dict[name] for
-                                        name in varnames) <= len(S) - min_vehicles)
+            self.model.addCons(quicksum(separator.get_cut_variables(S)) <= len(S) - min_vehicles)
         self.round_counter += 1
         self.solver.counter += 1
         return True
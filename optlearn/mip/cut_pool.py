@@ -0,0 +1,113 @@
+import os
+import fcntl
+import hashlib
+import contextlib
+
+import numpy as np
+
+from optlearn import graph_utils
+
+
+def compute_instance_hash(graph):
+    """ Hash the vertices, edges and weights of the graph, identifying the instance """
+
+    digest = hashlib.sha1()
+    digest.update(np.array([graph_utils.check_graph(graph)], dtype=np.int8).tobytes())
+    digest.update(np.ascontiguousarray(graph_utils.get_vertices(graph), dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(graph_utils.get_edge_array(graph), dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(graph_utils.get_weights(graph), dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def pack_subtours(subtours):
+    """ Pack the subtour vertex sets into one array of members and one of offsets """
+
+    subtours = [sorted(subtour) for subtour in subtours]
+    lengths = np.array([len(subtour) for subtour in subtours], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    members = np.array([vertex for subtour in subtours for vertex in subtour], dtype=np.int32)
+    return members, offsets
+
+
+def unpack_subtours(members, offsets):
+    """ Unpack the subtour vertex sets from the members and offsets """
+
+    return [frozenset(members[start:stop].tolist())
+            for (start, stop) in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+class cutPool():
+    """ Subtour sets separated for each instance, kept in memory and optionally on disk """
+
+    def __init__(self, path=None):
+        """ Setup the pool, with one file per instance in the path if given """
+
+        self.path = path
+        self.subtours = {}
+        if path is not None and not os.path.exists(path):
+            os.makedirs(path)
+
+    def get_instance_hash(self, graph):
+        return compute_instance_hash(graph)
+
+    def get_file_path(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def get_lock_path(self, key):
+        return os.path.join(self.path, key + ".lock")
+
+    @contextlib.contextmanager
+    def lock_instance(self, key):
+        """ Hold an exclusive lock on the file of an instance, nothing to lock in memory """
+
+        if self.path is None:
+            yield
+            return
+        with open(self.get_lock_path(key), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_subtours(self, key):
+        """ Read the stored subtours of an instance, if there are any """
+
+        if self.path is None or not os.path.exists(self.get_file_path(key)):
+            return []
+        with np.load(self.get_file_path(key)) as data:
+            return unpack_subtours(data["members"], data["offsets"])
+
+    def write_subtours(self, key, subtours):
+        """ Write the subtours of an instance, replacing the file in one step """
+
+        members, offsets = pack_subtours(subtours)
+        part_path = self.get_file_path(key) + ".part"
+        with open(part_path, "wb") as file:
+            np.savez_compressed(file, members=members, offsets=offsets)
+        os.replace(part_path, self.get_file_path(key))
+
+    def get_subtours(self, key):
+        """ Get the subtours known for the instance with the given hash """
+
+        if key not in self.subtours:
+            self.subtours[key] = self.read_subtours(key)
+        return self.subtours[key]
+
+    def add_subtours(self, key, subtours):
+        """ Add newly separated subtours for the instance with the given hash """
+        """ The file is read again under the instance lock, so the cuts another process """
+        """ stored in the meantime are merged rather than overwritten """
+
+        with self.lock_instance(key):
+            known = self.get_subtours(key)
+            if self.path is not None:
+                known = known + self.read_subtours(key)
+            known = list(dict.fromkeys(known))
+            seen = set(known)
+            new = [subtour for subtour in dict.fromkeys(frozenset(item) for item in subtours)
+                   if subtour not in seen]
+            self.subtours[key] = known + new
+            if len(new) > 0 and self.path is not None:
+                self.write_subtours(key, self.subtours[key])
+        return len(new)
@@ -0,0 +1,244 @@
+import numpy as np
+
+from scipy import sparse
+from scipy import optimize
+
+from optlearn.mip import mip_utils
+
+
+_var_types = {
+    "binary": {
+        "lb": 0,
+        "ub": 1,
+        },
+    "continuous": {
+        "lb": 0,
+        "ub": 1,
+        },
+}
+
+
+class linearExpression():
+    """ A linear expression, kept as the variable positions and their coefficients """
+
+    def __init__(self, positions, coefficients):
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+
+    def __mul__(self, scalar):
+        return linearExpression(self.positions, self.coefficients * scalar)
+
+    __rmul__ = __mul__
+
+
+class linearVariable(linearExpression):
+    """ A single variable of a linear problem """
+
+    def __init__(self, position, name):
+        super().__init__([position], [1.0])
+        self.position = position
+        self.name = name
+
+
+class linearProblem():
+    """ A linear problem built row by row, solved from sparse matrices with HiGHS """
+    """ Binary variables are relaxed, there is no branching and no constraint handler """
+
+    def __init__(self):
+        self.names = []
+        self.lower = []
+        self.upper = []
+        self.costs = np.zeros(0)
+        self.rows = {"<=": [], ">=": [], "==": []}
+        self.result = None
+
+    def add_variable(self, name, lb=0, ub=1):
+        """ Add a variable and return it """
+
+        variable = linearVariable(len(self.names), name)
+        self.names.append(name)
+        self.lower.append(lb)
+        self.upper.append(ub)
+        return variable
+
+    def set_objective(self, expression):
+        """ Set the minimisation objective """
+
+        self.costs = np.zeros(len(self.names))
+        np.add.at(self.costs, expression.positions, expression.coefficients)
+
+    def add_row(self, expression, rhs, operator):
+        """ Add the constraint expression (operator) rhs """
+
+        self.rows[operator].append((expression.positions, expression.coefficients, rhs))
+
+    def build_matrix(self, rows, sign=1):
+        """ Build the sparse matrix and right hand side of the given rows """
+
+        if len(rows) == 0:
+            return None, None
+        lengths = [len(positions) for (positions, _, _) in rows]
+        matrix = sparse.csr_matrix((sign * np.concatenate([item[1] for item in rows]),
+                                    np.concatenate([item[0] for item in rows]),
+                                    np.concatenate([[0], np.cumsum(lengths)])),
+                                   shape=(len(rows), len(self.names)))
+        return matrix, sign * np.array([item[2] for item in rows], dtype=np.float64)
+
+    def build_inequalities(self):
+        """ Build the matrix and right hand side of all inequalities, as upper bounds """
+
+        upper, upper_rhs = self.build_matrix(self.rows["<="])
+        lower, lower_rhs = self.build_matrix(self.rows[">="], sign=-1)
+        if lower is None:
+            return upper, upper_rhs
+        if upper is None:
+            return lower, lower_rhs
+        return sparse.vstack([upper, lower]).tocsr(), np.concatenate([upper_rhs, lower_rhs])
+
+    def optimize(self):
+        """ Solve the linear problem """
+
+        a_ub, b_ub = self.build_inequalities()
+        a_eq, b_eq = self.build_matrix(self.rows["=="])
+        self.result = optimize.linprog(self.costs, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq,
+                                       bounds=np.column_stack([self.lower, self.upper]),
+                                       method="highs")
+        if self.result.status != 0:
+            raise ValueError("The linear problem was not solved: {}".format(self.result.message))
+        return self.result
+
+    def get_values(self):
+        """ Get the primal values of the last solve """
+
+        return self.result.x
+
+    def get_redcosts(self):
+        """ Get the reduced costs of the last solve """
+        """ At most one of the bound marginals of a variable is nonzero """
+
+        return self.result.lower.marginals + self.result.upper.marginals
+
+
+def build_problem():
+    """ Build an empty linear problem """
+
+    return linearProblem()
+
+
+def create_variable(problem, edge, prefix="x", var_args=None):
+    """ Create a single variable and return it """
+
+    var_args = var_args or {}
+    name = mip_utils.name_variable(edge, prefix=prefix)
+    return problem.add_variable(name, **var_args)
+
+
+def perform_relaxation(problem):
+    """ Solve the linear problem, it is already a relaxation """
+
+    return problem.optimize()
+
+
+def add_variables(problem, variables):
+    """ Blank function to maintain consistent API """
+
+    return None
+
+
+def highs_sum(terms):
+    """ Sum the given terms """
+
+    terms = list(terms)
+    if len(terms) == 0:
+        return linearExpression([], [])
+    return linearExpression(np.concatenate([term.positions for term in terms]),
+                            np.concatenate([term.coefficients for term in terms]))
+
+
+def set_indexed_objective(problem, variables, weights):
+    """ Set the edge objective, given the variables and their weights """
+
+    problem.set_objective(highs_sum(mip_utils.define_indexed_objective(variables, weights)))
+
+
+def set_constraint(problem, lhs, rhs, operator):
+    """ Set a constraint for the given problem """
+
+    problem.add_row(lhs, rhs, operator)
+
+
+def solve_problem(problem, kwargs=None):
+    """ Solve the problem using the default solver """
+
+    return problem.optimize()
+
+
+def get_varnames(problem, variable_dict):
+    """ Get the variable names for a given problem """
+
+    return list(problem.names)
+
+
+def get_varval(problem, variable, variable_dict):
+    """ Get a specific variable value """
+
+    return problem.get_values()[variable.position]
+
+
+def get_redcost(problem, variable, variable_dict):
+    """ Get a specific reduced cost """
+
+    return problem.get_redcosts()[variable.position]
+
+
+def get_varvals(problem, variable_dict):
+    """ Get all variable values, as an array in the variable order """
+
+    return problem.get_values()
+
+
+def get_redcosts(problem, variable_dict):
+    """ Get all reduced costs, as an array in the variable order """
+
+    return problem.get_redcosts()
+
+
+def get_varvals_by_name(problem, variable_dict, variable_keys):
+    """ Get all variable values in a specific order """
+
+    positions = [variable_dict[key].position for key in variable_keys]
+    return problem.get_values()[positions]
+
+
+def get_redcosts_by_name(problem, variable_dict, variable_keys):
+    """ Get all reduced costs in a specific order """
+
+    positions = [variable_dict[key].position for key in variable_keys]
+    return problem.get_redcosts()[positions]
+
+
+def get_objective_value(problem):
+    """ Get the current objective value of the problem """
+
+    return problem.result.fun
+
+
+_funcs = {
+    "create_variable": create_variable,
+    "build_problem": build_problem,
+    "perform_relaxation": perform_relaxation,
+    "add_variables": add_variables,
+    "indexed_objective": set_indexed_objective,
+    "set_constraint": set_constraint,
+    "solve_problem": solve_problem,
+    "get_varnames": get_varnames,
+    "get_varvals": get_varvals,
+    "get_solution": get_varvals,
+    "get_varvals_by_name": get_varvals_by_name,
+    "get_varval": get_varval,
+    "get_redcosts": get_redcosts,
+    "get_redcosts_by_name": get_redcosts_by_name,
+    "get_redcost": get_redcost,
+    "get_objective_value": get_objective_value,
+    "sum": highs_sum,
+    }
@@ -14,15 +14,18 @@ from optlearn import io_utils
 from optlearn import graph_utils
 from optlearn.mip import mip_utils
 from optlearn.mip import constraints
+from optlearn.mip import warm_start as warm_starts
 # from optlearn.mip import xpress
 from optlearn.mip import coinor
 from optlearn.mip import scip
+from optlearn.mip import highs
 
 
 _solver_modules = {
     # "xpress": xpress,
     "coinor": coinor,
     "scip": scip,
+    "highs": highs,
     }
 
 
@@ -30,6 +33,7 @@ _solver_funcs = {
     # "xpress": xpress._funcs,
     "coinor": coinor._funcs,
     "scip": scip._funcs,
+    "highs": highs._funcs,
 }
 
 _formulations = [
@@ -60,9 +64,13 @@ class tspProblem():
                  shuffle_columns=False,
                  perturb=False,
                  get_quick=False,
-                 cut_strategy="small_if_possible"
+                 cut_strategy="small_if_possible",
+                 cut_pool=None,
+                 warm_start=None,
     ):
         """ Setup problem """
+        """ Subtours separated for the same instance before are taken from the cut pool """
+        """ A warm start names the tour constructor giving the first incumbent and cutoff """
 
         self.verbose = verbose
         self.perturb = perturb
@@ -70,6 +78,11 @@ class tspProblem():
         self.shuffle_columns = shuffle_columns
         self.times_optimised = 0
         self.cut_strategy = cut_strategy
+        self.cut_pool = cut_pool
+        self.warm_start = warm_start
+        self.warm_start_info = None
+        self.constraint_handler = None
+        self.restored_cuts = 0
         self.initialise_variable_dict()
         self.initialise_vertices(graph)
         self.initialise_min_vertex(graph)
@@ -80,13 +93,17 @@ class tspProblem():
         self.initialise_problem()
         self.set_variables(graph)
         self.add_variables()
+        self.initialise_edge_index(graph)
         self.set_objective(graph)
         self.set_constraints()
+        self.preload_cuts(graph)
+        self.apply_warm_start(graph)
 
     def initialise_variable_dict(self):
         """ Setup a dictionary to put the variables in """
 
         self.variable_dict = OrderedDict()
+        self.variable_edges = []
 
     def initialise_vertices(self, graph):
         """ Grab a list of the vertices from the graph """
@@ -145,17 +162,19 @@ class tspProblem():
         var_args = var_args or self.var_args
         variable = self.create_variable(edge, prefix, var_args)
         self.variable_dict[variable.name] = variable
+        self.variable_edges.append(tuple(edge))
 
     def set_edge_variables(self, graph):
         """ Create and set all TSP edge variables """
 
         print("Setting variables!")
+        edges = graph_utils.get_edges(graph)
         if self.shuffle_columns:
-            for edge in random.sample(graph.edges, len(graph.edges)):
-                self.set_variable(edge, prefix="x", var_args=self._var_args)
+            self.edge_order = random.sample(range(len(edges)), len(edges))
         else:
-            for edge in graph.edges:
-                self.set_variable(edge, prefix="x", var_args=self._var_args)
+            self.edge_order = list(range(len(edges)))
+        for position in self.edge_order:
+            self.set_variable(edges[position], prefix="x", var_args=self._var_args)
 
     def set_variables(self, graph):
         """ Create and set all variables for the formulation """
@@ -169,14 +188,35 @@ class tspProblem():
 
         self._funcs["add_variables"](self.problem, self.variable_dict.values())
 
+    def initialise_edge_index(self, graph):
+        """ Keep the variable edges as an array and index the variables of each vertex """
+        """ Constraints are then built from positions, without parsing variable names """
+
+        self.variables = list(self.variable_dict.values())
+        self.edge_array = np.array(self.variable_edges, dtype=int).reshape(-1, 2)
+        if self._is_symmetric:
+            self.incident_index = mip_utils.build_incidence_index(self.edge_array, self.vertices)
+        if self._is_asymmetric:
+            self.outward_index = mip_utils.build_incidence_index(self.edge_array, self.vertices, 0)
+            self.inward_index = mip_utils.build_incidence_index(self.edge_array, self.vertices, 1)
+
+    def get_variable_weights(self, graph):
+        """ Get the edge weights in the variable order, perturbed if asked for """
+
+        weights = np.array(graph_utils.get_weights(graph), dtype=float)
+        if self.perturb:
+            weights = mip_utils.perturb_weights(weights)
+        return weights[self.edge_order]
+
     def set_objective(self, graph):
         """ Set the objective function """
 
         print("Setting objective!")
         if self.formulation == "dantzig":
-            self._funcs["edge_objective"](self.problem,
-                                          self.variable_dict,
-                                          graph, self.perturb)
+            self.variable_weights = self.get_variable_weights(graph)
+            self._funcs["indexed_objective"](self.problem,
+                                             self.variables,
+                                             self.variable_weights)
             return None
         print("No objective function defined!")
 
@@ -193,22 +233,19 @@ class tspProblem():
     def get_outward_variables_sum(self, vertex, prefix="x"):
         """ Get the outward variables for a vertex and sum them """
 
-        vars = mip_utils.get_outward_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.outward_index, vertex)
         return self._funcs["sum"](vars)
 
     def get_variables_sum(self, vertex, prefix="x"):
         """ Get all variables that have a given vertex and sum them """
 
-        if self.get_quick:
-            vars = mip_utils.get_variables_quick(self.variable_dict, self.vertices, vertex, prefix)
-        else:
-            vars = mip_utils.get_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.incident_index, vertex)
         return self._funcs["sum"](vars)
         
     def get_inward_variables_sum(self, vertex, prefix="x"):
         """ Get the inward variables for a vertex and sum them """
 
-        vars = mip_utils.get_inward_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.inward_index, vertex)
         return self._funcs["sum"](vars)
 
     def set_constraint(self, lhs, rhs, operator):
@@ -259,6 +296,75 @@ class tspProblem():
             return None
         print("No constraints set!")
         
+    def preload_cuts(self, graph):
+        """ Add the subtour cuts known for this instance as initial constraints """
+
+        if self.cut_pool is None:
+            return None
+        self.instance_key = self.cut_pool.get_instance_hash(graph)
+        separator = constraints.subtourSeparator(self)
+        for subtour in self.cut_pool.get_subtours(self.instance_key):
+            lhs = self._funcs["sum"](separator.get_cut_variables(subtour))
+            self.set_constraint(lhs, len(subtour) - 1, "<=")
+
+    def store_cuts(self):
+        """ Add the subtour cuts separated while solving to the cut pool """
+
+        if self.cut_pool is None or self.constraint_handler is None:
+            return None
+        self.cut_pool.add_subtours(self.instance_key, self.constraint_handler.subtours)
+
+    def apply_warm_start(self, graph):
+        """ Start from a heuristic tour, if a warm start is set """
+
+        if self.warm_start is None:
+            return None
+        self.warm_start_info = warm_starts.warm_start_problem(self, graph,
+                                                             constructor=self.warm_start)
+
+    def add_tour_solution(self, tour):
+        """ Add the given tour as a solution, if all of its edges are variables """
+
+        edges = np.stack([tour, np.roll(tour, -1)], axis=1)
+        positions = constraints.subtourSeparator(self).get_edge_positions(edges)
+        if (positions < 0).any() or "add_solution" not in self._funcs:
+            return False
+        solution = np.zeros(len(self.variables))
+        solution[positions] = 1
+        return bool(self._funcs["add_solution"](self.problem, solution.tolist()))
+
+    def set_cutoff(self, value):
+        """ Only accept solutions with an objective no worse than the given value """
+        """ The solver may then only look for solutions strictly better than the cutoff """
+
+        if "set_cutoff" in self._funcs:
+            self._funcs["set_cutoff"](self.problem, value)
+
+    def set_objective_bound(self, value):
+        """ Constrain the objective to at most the given value """
+
+        lhs = self._funcs["sum"](mip_utils.define_indexed_objective(self.variables,
+                                                                    self.variable_weights))
+        self.set_constraint(lhs, value, "<=")
+
+    def get_solution_pool(self):
+        """ Get the values and objectives of the solutions stored by the solver """
+
+        return self._funcs["get_solution_pool"](self.problem)
+
+    def free_transform(self):
+        """ Discard the solving data, so constraints may be added before solving again """
+        """ Subtour cuts separated so far are added back as problem constraints """
+
+        self._funcs["free_transform"](self.problem)
+        if self.constraint_handler is None:
+            return None
+        separator = constraints.subtourSeparator(self)
+        for subtour in self.constraint_handler.subtours[self.restored_cuts:]:
+            lhs = self._funcs["sum"](separator.get_cut_variables(subtour))
+            self.set_constraint(lhs, len(subtour) - 1, "<=")
+        self.restored_cuts = len(self.constraint_handler.subtours)
+
     def perform_relaxation(self):
         """ Perform a linear relaxation on the current problem """
 
@@ -382,6 +488,7 @@ class tspProblem():
         if self.times_optimised < 1:
             contraint_handler = constraints.tsp_constraint_handler(self,
                                                                     max_rounds=max_rounds)
+            self.constraint_handler = contraint_handler
             self.problem.includeConshdlr(contraint_handler,
                                          "TSP", "Subtour Elimination",
                                          sepapriority = -1, enfopriority = -1,
@@ -408,6 +515,13 @@ class tspProblem():
 
         self.problem.solve()
 
+    def optimise_highs(self, max_rounds=1e10):
+        """ Solve the LP relaxation using HiGHS, cutting subtours between solves """
+
+        if self.times_optimised < 1:
+            self.constraint_handler = constraints.lp_cutting_loop(self, max_rounds=max_rounds)
+        self.constraint_handler.optimise()
+
     def optimise(self, max_nodes=1e10, max_rounds=1e10):
         """ Solve the problem """
 
@@ -420,9 +534,12 @@ class tspProblem():
             self.optimise_xpress(max_nodes=max_nodes, max_rounds=max_rounds)
         if self._solver == "scip":
             self.optimise_scip(max_nodes=max_nodes, max_rounds=max_rounds)
+        if self._solver == "highs":
+            self.optimise_highs(max_rounds=max_rounds)
         if self._solver == "coin":
             raise NotImplementedError("Not implemented for COIN yet!")
 
+        self.store_cuts()
         self.times_optimised += 1
 
 
@@ -464,6 +581,7 @@ class vrpProblem():
         self.initialise_problem()
         self.set_variables(graph)
         self.add_variables()
+        self.initialise_edge_index(graph)
         self.set_objective(graph)
         self.set_constraints()
 
@@ -471,6 +589,7 @@ class vrpProblem():
         """ Setup a dictionary to put the variables in """
 
         self.variable_dict = OrderedDict()
+        self.variable_edges = []
 
     def initialise_vertices(self, graph):
         """ Grab a list of the vertices from the graph """
@@ -561,17 +680,19 @@ class vrpProblem():
         var_args = var_args or self.var_args
         variable = self.create_variable(edge, prefix, var_args)
         self.variable_dict[variable.name] = variable
+        self.variable_edges.append(tuple(edge))
 
     def set_edge_variables(self, graph):
         """ Create and set all VRP edge variables """
 
         print("Setting variables!")
+        edges = graph_utils.get_edges(graph)
         if self.shuffle_columns:
-            for edge in random.sample(graph.edges, len(graph.edges)):
-                self.set_variable(edge, prefix="x", var_args=self._var_args)
+            self.edge_order = random.sample(range(len(edges)), len(edges))
         else:
-            for edge in graph.edges:
-                self.set_variable(edge, prefix="x", var_args=self._var_args)
+            self.edge_order = list(range(len(edges)))
+        for position in self.edge_order:
+            self.set_variable(edges[position], prefix="x", var_args=self._var_args)
 
     def set_variables(self, graph):
         """ Create and set all variables for the formulation """
@@ -585,14 +706,34 @@ class vrpProblem():
 
         self._funcs["add_variables"](self.problem, self.variable_dict.values())
 
+    def initialise_edge_index(self, graph):
+        """ Keep the variable edges as an array and index the variables of each vertex """
+        """ Constraints are then built from positions, without parsing variable names """
+
+        self.variables = list(self.variable_dict.values())
+        self.edge_array = np.array(self.variable_edges, dtype=int).reshape(-1, 2)
+        if self._is_symmetric:
+            self.incident_index = mip_utils.build_incidence_index(self.edge_array, self.vertices)
+        if self._is_asymmetric:
+            self.outward_index = mip_utils.build_incidence_index(self.edge_array, self.vertices, 0)
+            self.inward_index = mip_utils.build_incidence_index(self.edge_array, self.vertices, 1)
+
+    def get_variable_weights(self, graph):
+        """ Get the edge weights in the variable order, perturbed if asked for """
+
+        weights = np.array(graph_utils.get_weights(graph), dtype=float)
+        if self.perturb:
+            weights = mip_utils.perturb_weights(weights)
+        return weights[self.edge_order]
+
     def set_objective(self, graph):
         """ Set the objective function """
 
         print("Setting objective!")
         if self.formulation == "dantzig":
-            self._funcs["edge_objective"](self.problem,
-                                          self.variable_dict,
-                                          graph, self.perturb)
+            self._funcs["indexed_objective"](self.problem,
+                                             self.variables,
+                                             self.get_variable_weights(graph))
             return None
         print("No objective function defined!")
 
@@ -609,22 +750,19 @@ class vrpProblem():
     def get_outward_variables_sum(self, vertex, prefix="x"):
         """ Get the outward variables for a vertex and sum them """
 
-        vars = mip_utils.get_outward_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.outward_index, vertex)
         return self._funcs["sum"](vars)
 
     def get_variables_sum(self, vertex, prefix="x"):
         """ Get all variables that have a given vertex and sum them """
 
-        if self.get_quick:
-            vars = mip_utils.get_variables_quick(self.variable_dict, self.vertices, vertex, prefix)
-        else:
-            vars = mip_utils.get_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.incident_index, vertex)
         return self._funcs["sum"](vars)
         
     def get_inward_variables_sum(self, vertex, prefix="x"):
         """ Get the inward variables for a vertex and sum them """
 
-        vars = mip_utils.get_inward_variables(self.variable_dict, vertex, prefix)
+        vars = mip_utils.get_indexed_variables(self.variables, self.inward_index, vertex)
         return self._funcs["sum"](vars)
 
     def set_constraint(self, lhs, rhs, operator):
@@ -33,20 +33,56 @@ def define_edge_term(variable_dict, graph, edge, prefix="x",
     return compute_edge_term(weight, variable_dict[name])
 
 
+def perturb_weights(weights):
+    """ Randomly perturb the given edge weights """
+
+    perturbs = ((weights - weights.mean())/weights.mean()) ** 2
+    perturbs  = np.clip(perturbs * 2 -1, -1, 1)
+    randoms = np.random.uniform(low=0, high=0.3, size=len(weights))
+    perturbs = np.ones_like(randoms)
+    return weights + weights * perturbs * randoms
+
+
 def define_edge_objective(variable_dict, graph, perturb=False):
     """ Define all terms for the edge objective """
 
     weights = np.array(graph_utils.get_weights(graph))
     if perturb:
-        perturbs = ((weights - weights.mean())/weights.mean()) ** 2
-        perturbs  = np.clip(perturbs * 2 -1, -1, 1)
-        randoms = np.random.uniform(low=0, high=0.3, size=len(weights))
-        perturbs = np.ones_like(randoms)
-        weights = weights + weights * perturbs * randoms
-    variables = [variable_dict["x_{},{}".format(*edge)] for edge in graph.edges]
+        weights = perturb_weights(weights)
+    variables = [variable_dict["x_{},{}".format(*edge)] for edge in graph_utils.get_edges(graph)]
     return [var * weight for (var, weight) in zip(variables, weights)]
 
 
+def define_indexed_objective(variables, weights):
+    """ Define all terms for the edge objective, given the variables and their weights """
+
+    return [var * weight for (var, weight) in zip(variables, weights.tolist())]
+
+
+def build_incidence_index(edges, vertices, column=None):
+    """ Map each vertex to the positions of the edges it is in, in edge order """
+    """ If a column is given only that end counts, 0 for outward and 1 for inward edges """
+
+    edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+    if column is None:
+        ends, positions = edges.ravel(), np.repeat(np.arange(len(edges)), 2)
+    else:
+        ends, positions = edges[:, column], np.arange(len(edges))
+    order = np.argsort(ends, kind="stable")
+    ends, positions = ends[order], positions[order]
+    vertices = np.asarray(vertices, dtype=int)
+    starts = np.searchsorted(ends, vertices, side="left")
+    stops = np.searchsorted(ends, vertices, side="right")
+    return {vertex: positions[start:stop] for (vertex, start, stop)
+            in zip(vertices.tolist(), starts.tolist(), stops.tolist())}
+
+
+def get_indexed_variables(variables, index, vertex):
+    """ Get the variables the index lists for the given vertex """
+
+    return [variables[position] for position in index[int(vertex)].tolist()]
+
+
 def get_variable_tuple(string):
     """ Get the (vertex_a, vertex_b) integer tuple from a variable name """
 
@@ -97,7 +133,10 @@ def get_inward_variables(variable_dict, vertex, prefix="x"):
 def is_graph(graph, verbose=False):
     """ Check if the graph is a symmetric graph """
 
-    value =  type(graph) == type(nx.Graph())
+    if graph_utils.is_dense(graph):
+        value = graph.symmetric
+    else:
+        value =  type(graph) == type(nx.Graph())
 
     if verbose and value:
         print("Graph is symmetric\n")
@@ -108,7 +147,10 @@ def is_graph(graph, verbose=False):
 def is_digraph(graph, verbose=False):
     """ Check if the graph is an asymmetric graph """
 
-    value = type(graph) == type(nx.DiGraph())
+    if graph_utils.is_dense(graph):
+        value = not graph.symmetric
+    else:
+        value = type(graph) == type(nx.DiGraph())
 
     if verbose and value:
         print("Graph is asymmetric\n")
@@ -0,0 +1,164 @@
+import numpy as np
+
+from scipy import sparse
+
+from optlearn import graph_utils
+from optlearn import dense_graph
+
+from optlearn.mip import mip_model
+
+
+PRICING_TOLERANCE = 1e-6
+REPAIR_NEIGHBOURS = 5
+
+
+def get_active_mask(graph):
+    """ Get the mask of the weight matrix entries that are edges of the graph """
+
+    active = np.isfinite(graph_utils.get_weight_matrix(graph))
+    np.fill_diagonal(active, False)
+    return active
+
+
+def build_active_graph(matrix, active, min_vertex, symmetric):
+    """ Build the dense graph with only the active edges of the weight matrix """
+
+    return dense_graph.DenseTSPGraph(np.where(active, matrix, np.inf),
+                                     min_vertex=min_vertex, symmetric=symmetric)
+
+
+def get_degree_duals(problem):
+    """ Get the duals of the degree constraints as outward and inward vertex arrays """
+    """ Symmetric problems have one constraint per vertex, asymmetric ones inward then outward """
+
+    duals = problem.problem.result.eqlin.marginals
+    if problem._is_symmetric:
+        return duals, duals
+    duals = duals.reshape(-1, 2)
+    return duals[:, 1], duals[:, 0]
+
+
+def compute_cut_duals(subtours, duals, order, min_vertex):
+    """ Sum the duals of the subtour cuts containing each pair of vertices """
+
+    lengths = [len(subtour) for subtour in subtours]
+    rows = np.repeat(np.arange(len(subtours)), lengths)
+    cols = np.array([vertex for subtour in subtours for vertex in subtour]) - min_vertex
+    members = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(subtours), order))
+    return (members.T @ sparse.diags(duals) @ members).toarray()
+
+
+def compute_reduced_costs(problem, matrix):
+    """ Compute the reduced costs of every vertex pair from the duals of an LP solved by HiGHS """
+    """ The cuts must be the only inequalities, in the order they were separated """
+
+    outward, inward = get_degree_duals(problem)
+    costs = matrix - outward[:, None] - inward[None, :]
+    subtours = problem.constraint_handler.subtours
+    if len(subtours) > 0:
+        duals = problem.problem.result.ineqlin.marginals[:len(subtours)]
+        costs = costs - compute_cut_duals(subtours, duals, len(matrix), problem.min_vertex)
+    return costs
+
+
+class pricingLoop():
+    """ Solve a TSP on a pruned edge set, adding pruned edges back until optimal """
+
+    def __init__(self, graph, solver="scip", warm_start=None,
+                 tolerance=PRICING_TOLERANCE, verbose=False):
+        """ Setup the loop for the full graph, pruned edge sets are given to solve """
+
+        self.matrix = np.array(graph_utils.get_weight_matrix(graph), dtype=np.float64)
+        self.present = np.isfinite(self.matrix)
+        np.fill_diagonal(self.present, False)
+        self.min_vertex = graph_utils.get_min_vertex(graph)
+        self.symmetric = graph_utils.check_graph(graph)
+        self.solver = solver
+        self.warm_start = warm_start
+        self.tolerance = tolerance
+        self.verbose = verbose
+        self.added_edges = 0
+
+    def build_graph(self, active):
+        return build_active_graph(self.matrix, active, self.min_vertex, self.symmetric)
+
+    def add_edges(self, active, added):
+        """ Activate the added edges, both ways around for symmetric graphs """
+
+        if self.symmetric:
+            added = added | added.T
+        self.added_edges += int(np.sum(added & ~active))
+        return active | added
+
+    def repair(self, active):
+        """ Activate the edges to the nearest neighbours of every vertex """
+
+        nearest = np.argsort(np.where(self.present, self.matrix, np.inf), axis=1)
+        nearest = nearest[:, :REPAIR_NEIGHBOURS]
+        added = np.zeros_like(active)
+        added[np.arange(len(active))[:, None], nearest] = True
+        return self.add_edges(active, added & self.present)
+
+    def solve_lp(self, active):
+        """ Solve the subtour LP on the active edges with HiGHS """
+
+        problem = mip_model.tspProblem(self.build_graph(active), solver="highs",
+                                       var_type="continuous", cut_strategy="mincut",
+                                       verbose=self.verbose)
+        problem.optimise()
+        return problem
+
+    def price_lp(self, active):
+        """ Add the edges with negative reduced costs until the LP is optimal on all edges """
+
+        while True:
+            try:
+                problem = self.solve_lp(active)
+            except ValueError:
+                repaired = self.repair(active)
+                if (repaired == active).all():
+                    raise
+                active = repaired
+                continue
+            costs = compute_reduced_costs(problem, self.matrix)
+            added = self.present & ~active & (costs < - self.tolerance)
+            if not added.any():
+                return active, problem, costs
+            active = self.add_edges(active, added)
+
+    def solve_relaxation(self, active):
+        """ Solve the subtour LP over all edges, pricing them in from the active ones """
+        """ Returns the final active edges, the LP bound and the reduced costs of every pair """
+
+        self.added_edges = 0
+        active, relaxation, costs = self.price_lp(active)
+        self.lp_bound = relaxation.get_objective_value()
+        return active, self.lp_bound, costs
+
+    def solve_ip(self, active):
+        """ Solve the TSP on the active edges """
+
+        problem = mip_model.tspProblem(self.build_graph(active), solver=self.solver,
+                                       var_type="binary", verbose=self.verbose,
+                                       warm_start=self.warm_start)
+        problem.optimise()
+        return problem
+
+    def solve(self, pruned_graph):
+        """ Solve the TSP starting from the edges of the pruned graph """
+        """ Every tour using an inactive edge costs at least the LP bound plus the reduced """
+        """ cost of that edge, so after the edges with a bound below the pruned tour length """
+        """ are added, the tour found is optimal for the full graph """
+
+        self.iterations = 1
+        active, bound, costs = self.solve_relaxation(get_active_mask(pruned_graph) & self.present)
+        problem = self.solve_ip(active)
+        value = problem.get_objective_value() if problem.check_solution() else np.inf
+        slack = self.tolerance * max(1, abs(bound))
+        added = self.present & ~active & (bound + costs < value - slack)
+        if added.any():
+            active = self.add_edges(active, added)
+            problem = self.solve_ip(active)
+            self.iterations += 1
+        self.active = active
+        return problem
@@ -62,6 +62,13 @@ def set_edge_objective(problem, variable_dict, graph, perturb=False):
     problem.setObjective(objective, "minimize")
 
 
+def set_indexed_objective(problem, variables, weights):
+    """ Set the edge objective, given the variables and their weights """
+
+    objective = scip_sum(mip_utils.define_indexed_objective(variables, weights))
+    problem.setObjective(objective, "minimize")
+
+
 def set_constraint(problem, lhs, rhs, operator):
     """ Set a constraint for the given problem """
 
@@ -134,9 +141,37 @@ def get_objective_value(problem):
 
 def add_solution(problem, solution):
     """ Add the given solution to the problem """
+    """ The values are given in the order of the problem variables """
+
+    scip_solution = problem.createSol()
+    for (variable, value) in zip(problem.getVars(), solution):
+        problem.setSolVal(scip_solution, variable, value)
+    return problem.addSol(scip_solution)
+
+
+def get_solution_pool(problem):
+    """ Get the values and objectives of the stored solutions """
+    """ The values are given in the order of the problem variables """
+
+    variables = problem.getVars()
+    solutions = problem.getSols()
+    values = [[problem.getSolVal(solution, variable) for variable in variables]
+              for solution in solutions]
+    return values, [problem.getSolObjVal(solution) for solution in solutions]
+
+
+def free_transform(problem):
+    """ Return the problem to the problem stage, so that it may be modified again """
+
+    problem.freeTransform()
+
+
+def set_cutoff(problem, value):
+    """ Only accept solutions with an objective no worse than the given value """
+    """ An infinite value removes the cutoff """
+
+    problem.setObjlimit(min(value, problem.infinity()))
 
-    raise NotImplementedError
-    
 
 _funcs = {
     "create_variable": create_variable,
@@ -144,6 +179,7 @@ _funcs = {
     "perform_relaxation": perform_relaxation,
     "add_variables": add_variables,
     "edge_objective": set_edge_objective,
+    "indexed_objective": set_indexed_objective,
     "set_constraint": set_constraint,
     "solve_problem": solve_problem,
     "get_varnames": get_varnames,
@@ -158,4 +194,7 @@ _funcs = {
     "get_objective_value": get_objective_value,
     "sum": scip_sum,
     "add_solution": add_solution,
+    "set_cutoff": set_cutoff,
+    "get_solution_pool": get_solution_pool,
+    "free_transform": free_transform,
     }
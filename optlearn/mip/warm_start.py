@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+
+from optlearn import graph_utils
+
+from optlearn.mst import mst_model
+from optlearn.mst import local_search as tour_search
+
+
+CUTOFF_TOLERANCE = 1e-6
+
+_constructors = {
+    "doubletree": lambda graph: mst_model.doubleTreeConstructor().get_doubletour(graph),
+    "christofides": lambda graph: mst_model.christofidesConstructor().get_christofides_tour(graph),
+}
+
+
+def get_tour_positions(graph, tour):
+    """ Get the positions of the tour vertices in the sorted vertex order """
+
+    return np.searchsorted(np.sort(graph_utils.get_vertices(graph)), np.asarray(tour))
+
+
+def compute_tour_length(matrix, positions):
+    """ Compute the length of the closed tour through the given positions """
+
+    return matrix[positions, np.roll(positions, -1)].sum()
+
+
+def improve_tour(matrix, positions, tolerance=1e-9):
+    """ Improve the tour with 2-opt and Or-opt moves until no move improves it """
+    """ Asymmetric weights only get the Or-opt moves that keep the tour direction """
+
+    return tour_search.localSearch(tolerance=tolerance).improve(matrix, positions)
+
+
+def build_tour(graph, constructor="doubletree", local_search=True):
+    """ Build a heuristic tour, improved with local search """
+    """ Returns the tour vertices and the tour length, np.inf if it uses a missing edge """
+
+    vertices = np.sort(graph_utils.get_vertices(graph))
+    matrix = graph_utils.get_weight_matrix(graph)
+    positions = get_tour_positions(graph, _constructors[constructor](graph))
+    if local_search:
+        positions = improve_tour(matrix, positions)
+    return vertices[positions], compute_tour_length(matrix, positions)
+
+
+def get_cutoff(length):
+    """ Get a cutoff just above the tour length, so tours of equal length are kept """
+
+    return length + CUTOFF_TOLERANCE * max(1, abs(length))
+
+
+def warm_start_problem(problem, graph, constructor="doubletree", local_search=True):
+    """ Give the problem a heuristic tour as its incumbent and its length as the cutoff """
+    """ Returns a summary, the tour is only used when all of its edges are variables """
+
+    start = time.time()
+    tour, length = build_tour(graph, constructor=constructor, local_search=local_search)
+    accepted = bool(np.isfinite(length)) and problem.add_tour_solution(tour)
+    if accepted:
+        problem.set_cutoff(get_cutoff(length))
+    return {
+        "length": length,
+        "accepted": accepted,
+        "time": time.time() - start,
+    }
@@ -1,6 +1,9 @@
 import numpy as np
 import networkx as nx
 
+from scipy import sparse
+from scipy.sparse import csgraph
+
 from optlearn import graph_utils
 from optlearn.fix import fix_utils
 from optlearn.mst import mst_model
@@ -88,3 +91,285 @@ class oneTreeConstructor():
         graph = fix_utils.migrate_edges(storage_graph, graph, storage_graph.edges)
         return tree
         
+
+
+HELD_KARP_TOLERANCE = 1e-9
+
+
+def get_onetree_matrix(graph):
+    """ Get the symmetric weight matrix the 1-trees are built on """
+    """ Asymmetric weights take the cheaper direction, which still bounds every tour """
+    """ Missing edges get a weight longer than any tour, so no tree has to use them """
+
+    matrix = np.array(graph_utils.get_weight_matrix(graph), dtype=np.float64)
+    if not graph_utils.check_graph(graph):
+        matrix = np.minimum(matrix, matrix.T)
+    present = np.isfinite(matrix)
+    np.fill_diagonal(present, False)
+    if not present.all():
+        finite = np.abs(matrix[present]) if present.any() else np.zeros(1)
+        matrix[~present] = 2 * len(matrix) * (finite.max() + 1)
+    np.fill_diagonal(matrix, np.inf)
+    return matrix
+
+
+def compute_nearest_neighbour_length(matrix, start=0):
+    """ Compute the length of the nearest neighbour tour, an O(n^2) upper bound """
+
+    visited = np.zeros(len(matrix), dtype=bool)
+    vertex, length = start, 0
+    for step in range(len(matrix) - 1):
+        visited[vertex] = True
+        row = np.where(visited, np.inf, matrix[vertex])
+        following = int(np.argmin(row))
+        length += row[following]
+        vertex = following
+    return length + matrix[vertex, start]
+
+
+def compute_penalised_tree(matrix, penalties, special=0):
+    """ Compute the minimum spanning tree of all vertices but the special one with Prim """
+    """ The weights are penalised on the fly, d(i, j) = c(i, j) + pi(i) + pi(j) """
+    """ Returns the vertices in the order they were added and the parent of each vertex """
+
+    order = len(matrix)
+    in_tree = np.zeros(order, dtype=bool)
+    in_tree[special] = True
+    best_weights = np.full(order, np.inf)
+    parents = np.full(order, -1)
+    sequence = np.zeros(order - 1, dtype=int)
+    vertex = 1 if special == 0 else 0
+    for step in range(order - 1):
+        in_tree[vertex] = True
+        sequence[step] = vertex
+        row = matrix[vertex] + penalties + penalties[vertex]
+        improved = (~in_tree) & (row < best_weights)
+        best_weights[improved] = row[improved]
+        parents[improved] = vertex
+        best_weights[vertex] = np.inf
+        vertex = int(np.argmin(np.where(in_tree, np.inf, best_weights)))
+    return sequence, parents
+
+
+def get_special_edges(matrix, penalties, special=0):
+    """ Get the two vertices joined to the special vertex in the 1-tree """
+
+    row = matrix[special] + penalties + penalties[special]
+    return np.argpartition(row, 1)[:2]
+
+
+def get_tree_edges(sequence, parents):
+    """ Get the tree edges of the Prim sequence as a zero-based (n - 2, 2) array """
+
+    return np.stack([parents[sequence[1:]], sequence[1:]], axis=1)
+
+
+def build_onetree_edges(tree_edges, special_vertices, special=0):
+    """ Join the two special edges to the tree edges """
+
+    special_edges = np.stack([np.full(2, special), special_vertices], axis=1)
+    return np.concatenate([tree_edges, special_edges])
+
+
+def compute_onetree_value(matrix, penalties, edges):
+    """ Compute the Held-Karp bound of the 1-tree, its penalised length less twice the penalties """
+
+    penalised = matrix[edges[:, 0], edges[:, 1]] + penalties[edges[:, 0]] + penalties[edges[:, 1]]
+    return penalised.sum() - 2 * penalties.sum()
+
+
+def compute_dense_onetree(matrix, penalties, special=0):
+    """ Compute the minimum 1-tree on the full matrix """
+
+    sequence, parents = compute_penalised_tree(matrix, penalties, special)
+    special_vertices = get_special_edges(matrix, penalties, special)
+    return build_onetree_edges(get_tree_edges(sequence, parents), special_vertices, special)
+
+
+def get_candidate_edges(matrix, neighbours, special=0):
+    """ Get the edges to the nearest neighbours of every vertex, with the minimum spanning """
+    """ tree so that they stay connected, as zero-based rows and columns without the special """
+
+    order = len(matrix)
+    nearest = np.argpartition(matrix, neighbours, axis=1)[:, :neighbours]
+    rows = np.repeat(np.arange(order), neighbours)
+    cols = nearest.flatten()
+    sequence, parents = compute_penalised_tree(matrix, np.zeros(order), special)
+    tree_edges = get_tree_edges(sequence, parents)
+    rows = np.concatenate([rows, tree_edges[:, 0]])
+    cols = np.concatenate([cols, tree_edges[:, 1]])
+    rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+    keep = (rows != cols) & (rows != special) & (cols != special)
+    pairs = np.unique(np.stack([rows[keep], cols[keep]], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def compute_sparse_onetree(matrix, penalties, rows, cols, special=0):
+    """ Compute the minimum 1-tree using only the candidate edges for the tree """
+    """ Returns None if the candidate edges do not span the vertices """
+
+    order = len(matrix)
+    weights = matrix[rows, cols] + penalties[rows] + penalties[cols]
+    weights = weights - weights.min() + 1
+    tree = csgraph.minimum_spanning_tree(sparse.csr_matrix((weights, (rows, cols)),
+                                                           shape=(order, order))).tocoo()
+    if tree.nnz < order - 2:
+        return None
+    tree_edges = np.stack([tree.row, tree.col], axis=1)
+    special_vertices = get_special_edges(matrix, penalties, special)
+    return build_onetree_edges(tree_edges, special_vertices, special)
+
+
+def compute_tree_betas(matrix, penalties, sequence, parents):
+    """ Compute the largest penalised edge on the tree path between every pair of vertices """
+    """ Vertices are visited in the Prim order, so the parent row is always complete """
+    """ Returns the betas in the Prim order, the special vertex is not included """
+
+    ranks = np.zeros(len(matrix), dtype=int)
+    ranks[sequence] = np.arange(len(sequence))
+    betas = np.full((len(sequence), len(sequence)), - np.inf)
+    for rank in range(1, len(sequence)):
+        vertex = sequence[rank]
+        parent = parents[vertex]
+        weight = matrix[vertex, parent] + penalties[vertex] + penalties[parent]
+        row = np.maximum(betas[ranks[parent], :rank], weight)
+        betas[rank, :rank] = row
+        betas[:rank, rank] = row
+    return betas
+
+
+def compute_alpha_nearness(matrix, penalties, special=0):
+    """ Compute the alpha-nearness of every pair, the increase in the minimum 1-tree length """
+    """ when the 1-tree is forced to contain the edge, zero for the edges of the 1-tree """
+
+    sequence, parents = compute_penalised_tree(matrix, penalties, special)
+    ordered = matrix[np.ix_(sequence, sequence)]
+    ordered += penalties[sequence][:, None] + penalties[sequence][None, :]
+    ordered -= compute_tree_betas(matrix, penalties, sequence, parents)
+    alphas = np.empty_like(matrix)
+    alphas[np.ix_(sequence, sequence)] = ordered
+    del ordered
+    special_row = matrix[special] + penalties + penalties[special]
+    special_vertices = get_special_edges(matrix, penalties, special)
+    special_row = special_row - special_row[special_vertices].max()
+    special_row[special_vertices] = 0
+    alphas[special] = special_row
+    alphas[:, special] = special_row
+    np.fill_diagonal(alphas, np.inf)
+    return np.maximum(alphas, 0)
+
+
+class heldKarpBound():
+    """ Held-Karp lower bound, with subgradient optimisation of the vertex penalties """
+
+    def __init__(self, iterations=None, step=2.0, min_step=1e-3, patience=None,
+                 neighbours=10, upper_bound=None, special=0):
+        """ Setup the engine, the Polyak step is halved after patience iterations without """
+        """ improvement. Graphs larger than twice the neighbours run the ascent on the """
+        """ candidate edges, the final bound and 1-tree always use the full matrix """
+
+        self.iterations = iterations
+        self.step = step
+        self.min_step = min_step
+        self.patience = patience
+        self.neighbours = neighbours
+        self.upper_bound = upper_bound
+        self.special = special
+
+    def _compute_onetree(self, matrix, penalties):
+        """ Compute the 1-tree of the ascent, on the candidate edges when there are any """
+
+        if self._candidates is not None:
+            edges = compute_sparse_onetree(matrix, penalties, *self._candidates, self.special)
+            if edges is not None:
+                return edges
+        return compute_dense_onetree(matrix, penalties, self.special)
+
+    def _set_candidates(self, matrix):
+        """ Use candidate edges for the ascent on large enough graphs """
+
+        self._candidates = None
+        if self.neighbours is not None and len(matrix) > 2 * self.neighbours:
+            self._candidates = get_candidate_edges(matrix, self.neighbours, self.special)
+
+    def ascend(self, matrix, upper_bound):
+        """ Run the subgradient ascent, returning the best penalties found """
+
+        order = len(matrix)
+        iterations = self.iterations or max(100, order)
+        patience = self.patience or max(10, int(np.ceil(np.sqrt(order))))
+        penalties, best_penalties = np.zeros(order), np.zeros(order)
+        best_value, step, calm = - np.inf, self.step, 0
+        for iteration in range(iterations):
+            edges = self._compute_onetree(matrix, penalties)
+            value = compute_onetree_value(matrix, penalties, edges)
+            if value > best_value + HELD_KARP_TOLERANCE:
+                best_value, best_penalties, calm = value, penalties.copy(), 0
+            else:
+                calm += 1
+                if calm >= patience:
+                    step, calm = step / 2, 0
+            gradient = np.bincount(edges.flatten(), minlength=order) - 2
+            norm = gradient @ gradient
+            gap = upper_bound - value
+            if norm == 0 or gap <= HELD_KARP_TOLERANCE or step < self.min_step:
+                break
+            penalties = penalties + step * gap / norm * gradient
+        self.ascent_iterations = iteration + 1
+        return best_penalties
+
+    def compute(self, graph):
+        """ Compute the bound, the final 1-tree and the alpha-nearness of the graph """
+
+        matrix = get_onetree_matrix(graph)
+        upper_bound = self.upper_bound
+        if upper_bound is None:
+            upper_bound = compute_nearest_neighbour_length(matrix)
+        self._set_candidates(matrix)
+        self.penalties = self.ascend(matrix, upper_bound)
+        edges = compute_dense_onetree(matrix, self.penalties, self.special)
+        self.lower_bound = compute_onetree_value(matrix, self.penalties, edges)
+        self.tree = edges + graph_utils.get_min_vertex(graph)
+        self.alphas = compute_alpha_nearness(matrix, self.penalties, self.special)
+        return self.lower_bound
+
+    def get_edge_alphas(self, graph):
+        """ Get the alpha-nearness of the graph edges, in the graph edge order """
+
+        edges = graph_utils.get_edge_array(graph) - graph_utils.get_min_vertex(graph)
+        return self.alphas[edges[:, 0], edges[:, 1]]
+
+
+def compute_alpha_candidates(alphas, neighbours=5):
+    """ Get the mask of the alpha-nearest neighbours of every vertex, both ways around """
+
+    order = len(alphas)
+    neighbours = min(neighbours, order - 1)
+    nearest = np.argpartition(alphas, neighbours - 1, axis=1)[:, :neighbours]
+    mask = np.zeros(alphas.shape, dtype=bool)
+    mask[np.arange(order)[:, None], nearest] = True
+    np.fill_diagonal(mask, False)
+    return mask | mask.T
+
+
+class alphaSparsifier():
+    """ Keep only the alpha-nearest neighbours of every vertex as candidate edges """
+
+    def __init__(self, neighbours=5, engine=None):
+
+        self.neighbours = neighbours
+        self.engine = engine or heldKarpBound()
+
+    def compute_candidate_vector(self, graph):
+        """ Compute the indicator of the candidate edges, in the graph edge order """
+
+        self.engine.compute(graph)
+        mask = compute_alpha_candidates(self.engine.alphas, self.neighbours)
+        edges = graph_utils.get_edge_array(graph) - graph_utils.get_min_vertex(graph)
+        return mask[edges[:, 0], edges[:, 1]]
+
+    def run_sparsify(self, graph):
+        """ Get the candidate edges """
+
+        edges = graph_utils.get_edge_array(graph)
+        return [tuple(edge) for edge in edges[self.compute_candidate_vector(graph)].tolist()]
@@ -0,0 +1,170 @@
+import collections
+
+import numpy as np
+
+from optlearn import graph_utils
+
+
+LOCAL_SEARCH_TOLERANCE = 1e-9
+
+
+def compute_neighbour_lists(matrix, neighbours=8):
+    """ Get the nearest neighbours of every vertex, nearest first, as lists """
+
+    order = len(matrix)
+    neighbours = min(neighbours, order - 1)
+    if neighbours < 1:
+        return [[] for vertex in range(order)]
+    matrix = np.array(matrix, dtype=np.float64)
+    np.fill_diagonal(matrix, np.inf)
+    nearest = np.argpartition(matrix, neighbours - 1, axis=1)[:, :neighbours]
+    distances = np.take_along_axis(matrix, nearest, axis=1)
+    nearest = np.take_along_axis(nearest, np.argsort(distances, axis=1), axis=1)
+    return nearest.tolist()
+
+
+class localSearch():
+    """ 2-opt and Or-opt local search over neighbour lists, with don't-look bits """
+    """ The tour is an array with a position index, so moves are checked in O(1) """
+
+    def __init__(self, neighbours=8, segment_length=3, max_moves=None,
+                 tolerance=LOCAL_SEARCH_TOLERANCE):
+        """ Setup the search, segments of up to segment_length vertices are moved by Or-opt """
+        """ Asymmetric weights only use Or-opt moves that keep the segment direction """
+
+        self.neighbours = neighbours
+        self.segment_length = segment_length
+        self.max_moves = max_moves
+        self.tolerance = tolerance
+
+    def _set_tour(self, tour):
+        self.tour = np.array(tour, dtype=int)
+        self.positions = np.empty(len(self.tour), dtype=int)
+        self.positions[self.tour] = np.arange(len(self.tour))
+
+    def _succ(self, vertex):
+        return self.tour.item((self.positions.item(vertex) + 1) % len(self.tour))
+
+    def _pred(self, vertex):
+        return self.tour.item(self.positions.item(vertex) - 1)
+
+    def _weight(self, vertex_a, vertex_b):
+        return self.matrix.item(vertex_a, vertex_b)
+
+    def _wake(self, vertices):
+        """ Clear the don't-look bits of the given vertices """
+
+        for vertex in vertices:
+            if not self.active[vertex]:
+                self.active[vertex] = True
+                self.queue.append(vertex)
+
+    def _apply_two_opt(self, vertex_a, vertex_c):
+        """ Replace the edges leaving a and c by (a, c) and (succ a, succ c) """
+
+        first, second = sorted([self.positions.item(vertex_a), self.positions.item(vertex_c)])
+        segment = self.tour[first + 1:second + 1][::-1].copy()
+        self.tour[first + 1:second + 1] = segment
+        self.positions[segment] = np.arange(first + 1, second + 1)
+
+    def _try_two_opt(self, vertex):
+        """ Try the improving 2-opt moves from the vertex, in both tour directions """
+
+        for succ in [True, False]:
+            vertex_b = self._succ(vertex) if succ else self._pred(vertex)
+            gain = self._weight(vertex, vertex_b)
+            for vertex_c in self.neighbour_lists[vertex]:
+                weight = self._weight(vertex, vertex_c)
+                if weight >= gain - self.tolerance:
+                    break
+                vertex_d = self._succ(vertex_c) if succ else self._pred(vertex_c)
+                if vertex_c == vertex_b or vertex_d == vertex:
+                    continue
+                delta = weight + self._weight(vertex_b, vertex_d) - gain - self._weight(vertex_c, vertex_d)
+                if delta < - self.tolerance:
+                    if succ:
+                        self._apply_two_opt(vertex, vertex_c)
+                    else:
+                        self._apply_two_opt(vertex_b, vertex_d)
+                    self._wake([vertex, vertex_b, vertex_c, vertex_d])
+                    return True
+        return False
+
+    def _apply_or_opt(self, start, length, vertex_c, reverse):
+        """ Move the segment of the given length from start to just after c """
+
+        order = len(self.tour)
+        rolled = np.roll(self.tour, - self.positions.item(start))
+        segment, rest = rolled[:length], rolled[length:]
+        index = (self.positions.item(vertex_c) - self.positions.item(start)) % order - length
+        if reverse:
+            segment = segment[::-1]
+        self.tour = np.concatenate([rest[:index + 1], segment, rest[index + 1:]])
+        self.positions[self.tour] = np.arange(order)
+
+    def _try_or_opt(self, vertex):
+        """ Try moving the segments starting at the vertex between neighbouring vertices """
+
+        order = len(self.tour)
+        segment = [vertex]
+        for length in range(1, min(self.segment_length, order - 3) + 1):
+            if length > 1:
+                segment.append(self._succ(segment[-1]))
+            first, last = segment[0], segment[-1]
+            before, after = self._pred(first), self._succ(last)
+            gain = (self._weight(before, first) + self._weight(last, after)
+                    - self._weight(before, after))
+            if gain <= self.tolerance:
+                continue
+            for end in set([first, last]):
+                for vertex_c in self.neighbour_lists[end]:
+                    if vertex_c in segment:
+                        continue
+                    for vertex_x, vertex_y in [(vertex_c, self._succ(vertex_c)),
+                                               (self._pred(vertex_c), vertex_c)]:
+                        if vertex_y in segment or vertex_x in segment:
+                            continue
+                        base = self._weight(vertex_x, vertex_y)
+                        delta = (self._weight(vertex_x, first) + self._weight(last, vertex_y)
+                                 - base - gain)
+                        reverse = False
+                        if self.symmetric:
+                            reversed_delta = (self._weight(vertex_x, last)
+                                              + self._weight(first, vertex_y) - base - gain)
+                            if reversed_delta < delta:
+                                delta, reverse = reversed_delta, True
+                        if delta < - self.tolerance:
+                            self._apply_or_opt(first, length, vertex_x, reverse)
+                            self._wake([before, after, vertex_x, vertex_y] + segment)
+                            return True
+        return False
+
+    def improve(self, matrix, tour):
+        """ Improve the zero-based tour on the weight matrix until no move improves it """
+
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.symmetric = bool(np.array_equal(self.matrix, self.matrix.T))
+        self.neighbour_lists = compute_neighbour_lists(self.matrix, self.neighbours)
+        self._set_tour(tour)
+        order = len(self.tour)
+        self.moves = 0
+        if order < 5:
+            return self.tour
+        self.active = np.ones(order, dtype=bool)
+        self.queue = collections.deque(self.tour.tolist())
+        while self.queue and (self.max_moves is None or self.moves < self.max_moves):
+            vertex = self.queue.popleft()
+            self.active[vertex] = False
+            improved = self.symmetric and self._try_two_opt(vertex)
+            improved = improved or self._try_or_opt(vertex)
+            if improved:
+                self.moves += 1
+                self._wake([vertex])
+        return self.tour
+
+    def improve_tour(self, graph, tour):
+        """ Improve a tour of graph vertices, such as one from the mst_model constructors """
+
+        vertices = np.sort(np.asarray(graph_utils.get_vertices(graph)))
+        positions = np.searchsorted(vertices, np.asarray(tour))
+        return vertices[self.improve(graph_utils.get_weight_matrix(graph), positions)]
@@ -1,6 +1,7 @@
 import numpy as np
 
 from optlearn import graph_utils
+from optlearn import edge_index
 
 from optlearn.mst import mst_model
 
@@ -18,21 +19,26 @@ def extract_edges(model, graph, iterations="auto"):
     return [edge for edge_list in pruned_edges for edge in edge_list]
 
 
-def build_prune_indicators(model, graph, iterations="auto"):
+def build_prune_indicators(model, graph, iterations="auto", rounds=None):
     """ Build indicator features for each edge in the graph """
+    """ Precomputed rounds from run_sparsify_indices may be given """
 
     if iterations == "auto":
-        iterations = int(np.ceil(np.log2(len(graph.nodes))))
+        iterations = int(np.ceil(np.log2(graph_utils.get_order(graph))))
     
-    pruned_edges = extract_edges(model, graph, iterations)
-    return graph_utils.compute_indicator_vector(graph, pruned_edges)
+    if rounds is None:
+        rounds = model.run_sparsify_indices(graph, iterations=iterations)
+    indicators = np.zeros(edge_index.get_canonical_size(graph_utils.get_order(graph)))
+    for indices in rounds:
+        indicators[indices] = 1
+    return indicators[graph_utils.get_canonical_edge_positions(graph)]
 
 
-def build_prune_features(model, graph, iterations="auto"):
+def build_prune_features(model, graph, iterations="auto", rounds=None):
     """ Build continuous features for each edge in the graph """
 
     if iterations == "auto":
-        iterations = int(np.ceil(np.log2(len(graph.nodes))))
+        iterations = int(np.ceil(np.log2(graph_utils.get_order(graph))))
     
-    return model.fit_sparsify(graph, iterations)
+    return model.fit_sparsify(graph, iterations, rounds=rounds)
     
@@ -1,16 +1,48 @@
 import copy
+import itertools
 
 import networkx as nx
 import pandas as pd
 import numpy as np
 
 from optlearn import graph_utils
+from optlearn import dense_graph
+from optlearn import edge_index
 
 from optlearn.fix import fix_utils
 from optlearn.mst import mst_utils
+from optlearn.mst import tour_construction
 
 use_paper_fg = False
 
+
+def get_sorted_vertices(graph):
+    """ Get the vertices in the order of the weight matrix rows """
+
+    return np.sort(np.asarray(graph_utils.get_vertices(graph)))
+
+
+def get_tour_matrix(graph):
+    """ Get the symmetric weight matrix the tours are built on """
+
+    return tour_construction.get_symmetric_matrix(graph_utils.get_weight_matrix(graph))
+
+
+def get_tree_array(tree):
+    """ Get the sorted vertices of a networkx tree and its zero-based edge array """
+
+    vertices = np.sort(np.array(list(tree.nodes)))
+    edges = np.array(list(tree.edges), dtype=vertices.dtype).reshape(-1, 2)
+    return vertices, np.searchsorted(vertices, edges)
+
+
+def get_tours_edges(vertices, tours):
+    """ Get the edges of the zero-based tours as a list of vertex pairs """
+
+    return [edge for tour in tours
+            for edge in graph_utils.get_tour_edges(vertices[tour]).tolist()]
+
+
 class edgeSparsifier():
 
     def copy_graph(self, graph):
@@ -38,11 +70,15 @@ class edgeSparsifier():
         sparsified_edges = []
 
         self.check_weight_key(graph, weight=weight)
-        graph = self.copy_graph(graph)
         
         for iteration in range(iterations):
             print("Iteration {} of {}".format(iteration + 1, iterations))
-            edges = self.sparsify_once(graph, edge_extracter, weight=weight)
+            if iteration + 1 < iterations:
+                if iteration == 0:
+                    graph = self.copy_graph(graph)
+                edges = self.sparsify_once(graph, edge_extracter, weight=weight)
+            else:
+                edges = edge_extracter(graph, weight=weight)
             sparsified_edges.append(edges)
 
         return sparsified_edges
@@ -53,16 +89,29 @@ class mstConstructor():
     def minimum_spanning_tree(self, graph, weight="weight", algorithm="prim"):
         """ Compute the minimum spanning tree graph """
 
+        if graph_utils.is_dense(graph):
+            edges = graph.minimum_spanning_tree_edges()
+            tree = nx.Graph()
+            tree.add_nodes_from(graph.nodes.tolist())
+            tree.add_weighted_edges_from(
+                [(a, b, w) for ((a, b), w) in
+                 zip(edges.tolist(), graph.get_edges_weights(edges).tolist())],
+                weight=weight)
+            return tree
         return nx.minimum_spanning_tree(graph, weight=weight)
 
     def minimum_spanning_tree_edges(self, graph, weight="weight"):
         """ Compute the minimum spanning tree graph """
 
+        if graph_utils.is_dense(graph):
+            return [tuple(edge) for edge in graph.minimum_spanning_tree_edges().tolist()]
         return self.minimum_spanning_tree(graph, weight=weight).edges
     
     def check_weight_key(self, graph, weight="weight"):
         """ Checks for the weight key in any edge's dictionary """
 
+        if graph_utils.is_dense(graph):
+            return None
         a, b = list(graph.edges)[0]
         if weight not in graph[a][b].keys():
             raise ValueError("The key specifying the weights must match the one provided!")
@@ -112,42 +161,34 @@ class doubleTreeConstructor(mstConstructor):
     def get_doubletour(self, graph, reverse=False, roll=0):
         """ Get a doubletour for the given graph """
 
-        tree = self.minimum_spanning_tree(graph)
-        multigraph = self.construct_multigraph(tree)
-        eulerian_edges = self.get_eulerian_circuit(multigraph)
-        if reverse:
-            eulerian_edges = eulerian_edges[::-1]
-        eulerian_edges = np.roll(eulerian_edges, roll)
-        return self.get_eulerian_shortcuts(eulerian_edges)
+        return self.get_doubletours(graph, roll=roll)[int(reverse)]
 
     def get_doubletour_from_tree(self, tree, reverse=False, roll=0):
         """ Get a doubletour for the given graph """
 
-        multigraph = self.construct_multigraph(tree)
-        eulerian_edges = self.get_eulerian_circuit(multigraph)
-        if reverse:
-            eulerian_edges = eulerian_edges[::-1]
-        eulerian_edges = np.roll(eulerian_edges, roll)
-        return self.get_eulerian_shortcuts(eulerian_edges)
+        return self.get_doubletours_from_tree(tree, roll=roll)[int(reverse)]
 
-    def get_doubletours(self, graph):
-        """ Get forward and backward doubletours """
+    def get_doubletours(self, graph, roll=0):
+        """ Get forward and backward doubletours, both from the same circuit """
 
-        doubletour_a = self.get_doubletour(graph, reverse=False)
-        doubletour_b = self.get_doubletour(graph, reverse=True)
+        vertices = get_sorted_vertices(graph)
+        tours = tour_construction.compute_doubletree_tours(get_tour_matrix(graph), roll=roll)
+        return [vertices[tour] for tour in tours]
 
-        return [doubletour_a, doubletour_b]
+    def get_doubletours_from_tree(self, tree, roll=0):
+        """ Get forward and backward doubletours, both from the same circuit """
 
-    def get_doubletours_from_tree(self, tree):
-        """ Get forward and backward doubletours """
+        vertices, edges = get_tree_array(tree)
+        circuit = tour_construction.build_doubletree_circuit(edges, len(vertices))
+        return [vertices[tour] for tour in tour_construction.get_circuit_tours(circuit, roll)]
 
-        doubletour_a = self.get_doubletour_from_tree(tree, reverse=False)
-        doubletour_b = self.get_doubletour_from_tree(tree, reverse=True)
 
-        return [doubletour_a, doubletour_b]
+class christofidesConstructor(mstConstructor):
 
+    def __init__(self, matching="exact"):
+        """ Setup the constructor, the odd vertices get an "exact" or "greedy" matching """
 
-class christofidesConstructor(mstConstructor):
+        self.matching = matching
 
     def construct_multigraph(self, tree_edges, matching_edges):
         """ Construct a multigraph from the tree and matchinf edges """
@@ -215,6 +256,10 @@ class christofidesConstructor(mstConstructor):
         """ Get a minimal matching for the odd degree vertices """
         
         odd_degree_nodes = self.get_odd_degree_nodes(tree)
+        if graph_utils.is_dense(graph):
+            edges = list(itertools.combinations(sorted(odd_degree_nodes), 2))
+            match_graph = nx.Graph()
+            return fix_utils.migrate_edges(graph, match_graph, edges)
         edges = [edge for edge in graph.edges
                  if (edge[0] in odd_degree_nodes and edge[1] in odd_degree_nodes)]
         match_graph = type(graph)()
@@ -234,49 +279,62 @@ class christofidesConstructor(mstConstructor):
         match_graph = self.negate_edges(match_graph)
         return nx.matching.max_weight_matching(match_graph, maxcardinality=True)
     
-    def get_christofides_tour(self, graph, reverse=False, roll=0):
-        """ Get a christofides tour for the given graph """
-
-        if type(graph) == type(nx.DiGraph()):
-            new_graph = mst_utils.symmetrise_digraph(graph)
-            tree = self.minimum_spanning_tree(new_graph)
-            tree = mst_utils.fix_degrees(graph, tree)
-            matching_edges = self.get_minimal_matching(new_graph, tree)
-            multigraph = self.construct_multigraph(tree.edges, matching_edges)
-            eulerian_edges = self.get_eulerian_circuit_asymmetric(multigraph)
-        else:
-            tree = self.minimum_spanning_tree(graph)
-            matching_edges = self.get_minimal_matching(graph, tree)
-            multigraph = self.construct_multigraph(tree.edges, matching_edges)
-            eulerian_edges = self.get_eulerian_circuit(multigraph)
+    def get_christofides_tour_digraph(self, graph, reverse=False, roll=0):
+        """ Get a christofides tour for the given digraph, through its symmetrised graph """
+
+        new_graph = mst_utils.symmetrise_digraph(graph)
+        tree = self.minimum_spanning_tree(new_graph)
+        tree = mst_utils.fix_degrees(graph, tree)
+        matching_edges = self.get_minimal_matching(new_graph, tree)
+        multigraph = self.construct_multigraph(tree.edges, matching_edges)
+        eulerian_edges = self.get_eulerian_circuit_asymmetric(multigraph)
         if reverse:
             eulerian_edges = eulerian_edges[::-1]
             eulerian_edges = np.roll(eulerian_edges, roll)
-        if type(graph) == type(nx.DiGraph()):
-            return self.get_eulerian_shortcuts_asymmetric(eulerian_edges)
-        else:
-            return self.get_eulerian_shortcuts(eulerian_edges)
+        return self.get_eulerian_shortcuts_asymmetric(eulerian_edges)
 
-    def get_christofides_tours(self, graph):
-        """ Get forward and backward doubletours """
+    def get_christofides_tour(self, graph, reverse=False, roll=0, tree=None):
+        """ Get a christofides tour for the given graph """
+        """ A precomputed minimum spanning tree may be given for symmetric graphs """
 
-        christofides_tour_a = self.get_christofides_tour(graph, reverse=False)
-        christofides_tour_b = self.get_christofides_tour(graph, reverse=True)
+        if type(graph) == type(nx.DiGraph()):
+            return self.get_christofides_tour_digraph(graph, reverse=reverse, roll=roll)
+        return self.get_christofides_tours(graph, roll=roll, tree=tree)[int(reverse)]
 
-        return [christofides_tour_a, christofides_tour_b]
+    def get_christofides_tours(self, graph, roll=0, tree=None):
+        """ Get forward and backward christofides tours, both from the same circuit """
+        """ Dense asymmetric graphs are built on the cheaper direction of each pair """
+
+        if type(graph) == type(nx.DiGraph()):
+            return [self.get_christofides_tour_digraph(graph, reverse=False, roll=roll),
+                    self.get_christofides_tour_digraph(graph, reverse=True, roll=roll)]
+        vertices, tree_edges = get_sorted_vertices(graph), None
+        if tree is not None:
+            tree_vertices, tree_edges = get_tree_array(tree)
+            tree_edges = np.searchsorted(vertices, tree_vertices[tree_edges])
+        tours = tour_construction.compute_christofides_tours(get_tour_matrix(graph), tree_edges,
+                                                             matching=self.matching, roll=roll)
+        return [vertices[tour] for tour in tours]
 
 
 class mstSparsifier(edgeSparsifier, mstConstructor):
 
+    def run_sparsify_indices(self, graph, iterations=0, weight="weight"):
+        """ Sparsify several times using the MST edges, returning edge vector indices """
+        """ Runs Prim on the weight matrix, masking out the trees of earlier rounds """
+
+        self.check_weight_key(graph, weight=weight)
+        matrix = graph_utils.get_weight_matrix(graph, weight=weight)
+        return mst_utils.compute_tree_round_indices(matrix, iterations)
+
     def run_sparsify(self, graph, iterations=0, weight="weight"):
         """ Sparsify several times using the MST edges, returning all edges """
 
-        return self.sparsify(
-            graph=graph,
-            edge_extracter=self.minimum_spanning_tree_edges,
-            iterations=iterations,
-            weight=weight
-        )
+        order, min_vertex = graph_utils.get_order(graph), graph_utils.get_min_vertex(graph)
+        rounds = self.run_sparsify_indices(graph, iterations=iterations, weight=weight)
+        return [[tuple(edge) for edge in
+                 edge_index.compute_index_edges(indices, order, min_vertex).tolist()]
+                for indices in rounds]
     
     def tuple_to_string(self, item):
         """ Convert a tuple to a string """
@@ -296,16 +354,22 @@ class mstSparsifier(edgeSparsifier, mstConstructor):
         nx.set_edge_attributes(copy_graph, 0, "weight")
         return copy_graph
     
-    def fit_sparsify(self, graph, iterations, weight="weight"):
+    def feature_weight(self, num, iterations):
+        """ Compute the feature value for edges removed at the given round """
+
+        return 1 / (num + 1) if use_paper_fg else (num + 1) / iterations
+
+    def fit_sparsify(self, graph, iterations, weight="weight", rounds=None):
         """ Compute the sparsification features for the graph """
+        """ Precomputed rounds from run_sparsify_indices may be given """
         
-        sparse_graph = self.copy_graph_blank(graph)
-        edges = self.run_sparsify(graph, iterations=iterations, weight=weight)
-        for num, edge_set in enumerate(edges):
-            feature_weight = 1 / (num + 1) if use_paper_fg else (num + 1) / iterations
-            weighted_edges = [edge + (feature_weight, ) for edge in edge_set]
-            sparse_graph.add_weighted_edges_from(weighted_edges)
-        return graph_utils.get_weights(sparse_graph)
+        order = graph_utils.get_order(graph)
+        features = np.zeros(edge_index.get_canonical_size(order))
+        if rounds is None:
+            rounds = self.run_sparsify_indices(graph, iterations=iterations, weight=weight)
+        for num, indices in enumerate(rounds):
+            features[indices] = self.feature_weight(num, iterations)
+        return features[graph_utils.get_canonical_edge_positions(graph)]
 
 
 class msaSparsifier(edgeSparsifier, msaConstructor):
@@ -397,14 +461,30 @@ class doubleTreeSparsifier(edgeSparsifier, doubleTreeConstructor):
         return doubletours_edges
         
     def run_sparsify(self, graph, iterations=0, weight="weight"):
-        """ Sparsify several times using the MST edges, returning all edges """
-
-        return self.sparsify(
-            graph=graph,
-            edge_extracter=self.get_doubletours_edges,
-            iterations=iterations,
-            weight=weight
-        )
+        """ Sparsify several times using the doubletour edges, returning all edges """
+        """ Each round's tree is found by Prim on the weight matrix with the
+            edges of earlier rounds masked out, so the graph is never copied """
+
+        if not graph_utils.check_graph(graph):
+            return self.sparsify(
+                graph=graph,
+                edge_extracter=self.get_doubletours_edges,
+                iterations=iterations,
+                weight=weight
+            )
+        
+        self.check_weight_key(graph, weight=weight)
+        matrix = graph_utils.get_weight_matrix(graph, weight=weight)
+        removed = np.zeros(matrix.shape, dtype=bool)
+        vertices = get_sorted_vertices(graph)
+        sparsified_edges = []
+        for iteration in range(iterations):
+            tree_edges = dense_graph.minimum_spanning_tree_edges(matrix, removed)
+            tours = tour_construction.compute_doubletree_tours(matrix, tree_edges)
+            edges = get_tours_edges(vertices, tours)
+            mst_utils.remove_mask_edges(removed, np.searchsorted(vertices, np.array(edges)))
+            sparsified_edges.append(edges)
+        return sparsified_edges
 
 
 class christofidesSparsifier(edgeSparsifier, christofidesConstructor):
@@ -412,7 +492,7 @@ class christofidesSparsifier(edgeSparsifier, christofidesConstructor):
     def get_christofides_tour_edges(self, graph, weight="weight"):
         """ Extract the doubletour edges from the graph """
 
-        tour = self.get_get_christofides_tour(graph)
+        tour = self.get_christofides_tour(graph)
         return graph_utils.get_tour_edges(tour).tolist()
 
     def get_christofides_tours_edges(self, graph, weight="weight"):
@@ -424,11 +504,26 @@ class christofidesSparsifier(edgeSparsifier, christofidesConstructor):
         return edges_a + edges_b
         
     def run_sparsify(self, graph, iterations=0, weight="weight"):
-        """ Sparsify several times using the MST edges, returning all edges """
+        """ Sparsify several times using the christofides tour edges, returning all edges """
+        """ Each round masks out the edges of earlier rounds, so the graph is never copied """
 
-        return self.sparsify(
-            graph=graph,
-            edge_extracter=self.get_christofides_tours_edges,
-            iterations=iterations,
-            weight=weight
-        )
+        if type(graph) == type(nx.DiGraph()):
+            return self.sparsify(
+                graph=graph,
+                edge_extracter=self.get_christofides_tours_edges,
+                iterations=iterations,
+                weight=weight
+            )
+
+        self.check_weight_key(graph, weight=weight)
+        matrix = get_tour_matrix(graph)
+        removed = np.zeros(matrix.shape, dtype=bool)
+        vertices = get_sorted_vertices(graph)
+        sparsified_edges = []
+        for iteration in range(iterations):
+            masked = np.where(removed, np.inf, matrix)
+            tours = tour_construction.compute_christofides_tours(masked, matching=self.matching)
+            edges = get_tours_edges(vertices, tours)
+            mst_utils.remove_mask_edges(removed, np.searchsorted(vertices, np.array(edges)))
+            sparsified_edges.append(edges)
+        return sparsified_edges
@@ -3,6 +3,9 @@ import itertools
 import networkx as nx
 import numpy as np
 
+from optlearn import dense_graph
+from optlearn import edge_index
+
 
 def symmetrise_weights(digraph, min_weight, max_weight):
     """ Given a digraph, compute the updated weight matrix needed to symmetrise the graph """
@@ -67,3 +70,33 @@ def fix_degrees(graph, tree):
             tree.add_weighted_edges_from([(node, str(node), 0) for node in addables[:adds]])
             tree.remove_edges_from([(node, str(node)) for node in removables[:removes]])
     return tree
+
+
+def remove_mask_edges(removed, edges):
+    """ Mark the given zero-based edges as removed in both directions """
+
+    removed[edges[:, 0], edges[:, 1]] = True
+    removed[edges[:, 1], edges[:, 0]] = True
+    return removed
+
+
+def compute_tree_rounds(matrix, iterations, removed=None):
+    """ Compute the zero-based MST edges of each round, each round without the earlier trees """
+    """ The removed edges are marked in a boolean mask, the matrix is never copied """
+
+    if removed is None:
+        removed = np.zeros(matrix.shape, dtype=bool)
+    rounds = []
+    for iteration in range(iterations):
+        edges = dense_graph.minimum_spanning_tree_edges(matrix, removed)
+        remove_mask_edges(removed, edges)
+        rounds.append(edges)
+    return rounds
+
+
+def compute_tree_round_indices(matrix, iterations):
+    """ Compute the edge vector indices of the MST edges removed in each round """
+
+    order = len(matrix)
+    return [edge_index.compute_positions(edges[:, 0], edges[:, 1], order)
+            for edges in compute_tree_rounds(matrix, iterations)]
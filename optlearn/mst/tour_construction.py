@@ -0,0 +1,141 @@
+import numpy as np
+import networkx as nx
+
+from optlearn import dense_graph
+
+
+def get_symmetric_matrix(matrix):
+    """ Get the symmetric matrix of the cheaper direction of each pair """
+
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return np.minimum(matrix, matrix.T)
+
+
+def compute_tree_edges(matrix, removed=None):
+    """ Compute the zero-based minimum spanning tree edges of the matrix """
+
+    return dense_graph.minimum_spanning_tree_edges(matrix, removed)
+
+
+def get_odd_vertices(edges, order):
+    """ Get the vertices of odd degree in the given edges """
+
+    return np.flatnonzero(np.bincount(edges.flatten(), minlength=order) % 2 == 1)
+
+
+def compute_greedy_matching(matrix, vertices):
+    """ Match the vertices greedily, pairing the mutual nearest neighbours in rounds """
+    """ Each round matches the cheapest remaining pair at least, as the greedy matching does """
+
+    weights = matrix[np.ix_(vertices, vertices)]
+    np.fill_diagonal(weights, np.inf)
+    remaining = np.arange(len(vertices))
+    pairs = []
+    while len(remaining) > 1:
+        nearest = np.argmin(weights[np.ix_(remaining, remaining)], axis=1)
+        indices = np.arange(len(remaining))
+        firsts = np.flatnonzero((nearest[nearest] == indices) & (indices < nearest))
+        if len(firsts) == 0:
+            firsts, nearest[0] = np.array([0]), 1
+        pairs.append(np.stack([remaining[firsts], remaining[nearest[firsts]]], axis=1))
+        matched = np.zeros(len(remaining), dtype=bool)
+        matched[firsts] = True
+        matched[nearest[firsts]] = True
+        remaining = remaining[~matched]
+    return vertices[np.concatenate(pairs).reshape(-1, 2)]
+
+
+def compute_exact_matching(matrix, vertices):
+    """ Compute the minimum weight perfect matching of the vertices with blossom """
+    """ Only the vertices are put in the networkx graph, not the whole problem """
+
+    rows, cols = np.triu_indices(len(vertices), 1)
+    firsts, seconds = vertices[rows], vertices[cols]
+    weights = matrix[firsts, seconds]
+    finite = np.isfinite(weights)
+    graph = nx.Graph()
+    graph.add_nodes_from(vertices.tolist())
+    graph.add_weighted_edges_from(zip(firsts[finite].tolist(), seconds[finite].tolist(),
+                                      (- weights[finite]).tolist()))
+    pairs = np.array(list(nx.max_weight_matching(graph, maxcardinality=True)), dtype=int)
+    pairs = pairs.reshape(-1, 2)
+    unmatched = np.setdiff1d(vertices, pairs.flatten())
+    if len(unmatched) > 0:
+        pairs = np.concatenate([pairs, compute_greedy_matching(matrix, unmatched)])
+    return pairs
+
+
+_matchings = {
+    "exact": compute_exact_matching,
+    "greedy": compute_greedy_matching,
+}
+
+
+def compute_eulerian_circuit(edges, order, start=0):
+    """ Compute an Eulerian circuit of the edge multiset with Hierholzer """
+    """ Returns the vertex sequence, without repeating the start at the end """
+
+    starts = np.concatenate([edges[:, 0], edges[:, 1]])
+    ends = np.concatenate([edges[:, 1], edges[:, 0]])
+    indices = np.argsort(starts, kind="stable")
+    neighbours = ends[indices].tolist()
+    edge_ids = np.tile(np.arange(len(edges)), 2)[indices].tolist()
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(starts, minlength=order))]).tolist()
+    pointers = offsets[:-1]
+    used = [False] * len(edges)
+    stack, circuit = [start], []
+    while stack:
+        vertex = stack[-1]
+        while pointers[vertex] < offsets[vertex + 1] and used[edge_ids[pointers[vertex]]]:
+            pointers[vertex] += 1
+        if pointers[vertex] == offsets[vertex + 1]:
+            circuit.append(stack.pop())
+        else:
+            used[edge_ids[pointers[vertex]]] = True
+            stack.append(neighbours[pointers[vertex]])
+    return np.array(circuit[:0:-1], dtype=int)
+
+
+def shortcut_circuit(circuit, reverse=False, roll=0):
+    """ Get the tour visiting the vertices in the order they first appear in the circuit """
+
+    if reverse:
+        circuit = circuit[::-1]
+    circuit = np.roll(circuit, roll)
+    return circuit[np.sort(np.unique(circuit, return_index=True)[1])]
+
+
+def get_circuit_tours(circuit, roll=0):
+    """ Get the forward and reversed tours of a single circuit """
+
+    return [shortcut_circuit(circuit, roll=roll), shortcut_circuit(circuit, True, roll)]
+
+
+def build_doubletree_circuit(tree_edges, order):
+    """ Get the Eulerian circuit of the doubled tree """
+
+    return compute_eulerian_circuit(np.concatenate([tree_edges, tree_edges]), order)
+
+
+def build_christofides_circuit(matrix, tree_edges, matching="exact"):
+    """ Get the Eulerian circuit of the tree joined with a matching of its odd vertices """
+
+    odd_vertices = get_odd_vertices(tree_edges, len(matrix))
+    matching_edges = _matchings[matching](matrix, odd_vertices)
+    return compute_eulerian_circuit(np.concatenate([tree_edges, matching_edges]), len(matrix))
+
+
+def compute_doubletree_tours(matrix, tree_edges=None, roll=0):
+    """ Compute the forward and reversed zero-based doubletree tours """
+
+    if tree_edges is None:
+        tree_edges = compute_tree_edges(matrix)
+    return get_circuit_tours(build_doubletree_circuit(tree_edges, len(matrix)), roll)
+
+
+def compute_christofides_tours(matrix, tree_edges=None, matching="exact", roll=0):
+    """ Compute the forward and reversed zero-based Christofides tours """
+
+    if tree_edges is None:
+        tree_edges = compute_tree_edges(matrix)
+    return get_circuit_tours(build_christofides_circuit(matrix, tree_edges, matching), roll)
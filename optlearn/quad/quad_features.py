@@ -1,6 +1,7 @@
 import numpy as np
 
 from optlearn import graph_utils
+from optlearn import edge_index
 
 from optlearn.quad import quad_utils
 
@@ -38,32 +39,78 @@ def fast_quadrilateral_frequency(graph, edges):
 def update_frequencies(edges, freqs, all_freqs, all_counts, order, min_vertex):
     """ Update the current estimate of the frequencies for each given edge """
 
-    for (edge, freq) in zip(edges, freqs):
-        index = graph_utils.compute_vector_index(edge, order, min_vertex)
-        current_count, current_freq = all_counts[index], all_freqs[index]
-        update_value = (current_count * current_freq + freq) / (current_count + 1)
-        all_freqs[index] = update_value
-        all_counts[index] += 1
+    indices = edge_index.compute_edge_indices(edges, order, min_vertex)
+    indices, inverse = np.unique(indices, return_inverse=True)
+    freq_sums = np.bincount(inverse, weights=freqs, minlength=len(indices))
+    counts = np.bincount(inverse, minlength=len(indices))
+    current_counts, current_freqs = all_counts[indices], all_freqs[indices]
+    all_freqs[indices] = (current_counts * current_freqs + freq_sums) / (current_counts + counts)
+    all_counts[indices] += counts
     return all_freqs, all_counts
 
 
-def fast_quadrilateral_frequencies(graph, edges, rounds=100):
+def sample_excluding(generator, high, excluded):
+    """ Sample one value per row from range(high), skipping the sorted excluded values """
+
+    values = generator.integers(0, high - excluded.shape[1], size=len(excluded))
+    for column in excluded.T:
+        values = values + (values >= column)
+    return values
+
+
+def sample_quadrilaterals(generator, edges, rounds, order):
+    """ Sample rounds of random quadrilaterals for every zero-based edge as an (R, 4) array """
+
+    edges = np.repeat(edges, rounds, axis=0)
+    thirds = sample_excluding(generator, order, np.sort(edges, axis=1))
+    excluded = np.sort(np.column_stack([edges, thirds]), axis=1)
+    fourths = sample_excluding(generator, order, excluded)
+    return np.column_stack([edges, thirds, fourths])
+
+
+_opposite_pairs = np.array([[[0, 1], [2, 3]],
+                            [[0, 2], [1, 3]],
+                            [[0, 3], [1, 2]],
+])
+
+
+def compute_quadrilateral_frequencies(matrix, quads):
+    """ Compute the normalised frequencies of the three opposite edge pairs of each quad """
+
+    firsts, seconds = quads[:, _opposite_pairs[:, 0]], quads[:, _opposite_pairs[:, 1]]
+    pair_sums = matrix[firsts[..., 0], firsts[..., 1]] + matrix[seconds[..., 0], seconds[..., 1]]
+    before = np.tri(3, k=-1, dtype=bool).T
+    smaller = pair_sums[:, :, None] < pair_sums[:, None, :]
+    ties = (pair_sums[:, :, None] == pair_sums[:, None, :]) & before
+    return (smaller | ties).sum(axis=1) / 2
+
+
+def get_quadrilateral_positions(quads, order):
+    """ Get the canonical positions of the six quad edges, as (R, 3, 2) opposite pairs """
+
+    pairs = quads[:, _opposite_pairs]
+    return edge_index.compute_positions(pairs[..., 0], pairs[..., 1], order)
+
+
+def fast_quadrilateral_frequencies(graph, edges, rounds=100, seed=None, chunk_size=None,
+                                   matrix=None):
     """ Estimate the quadrilateral frequencies using opposing edges, given the edges to use """
+    """ All rounds for a chunk of edges are sampled and scattered into the edge vector at once """
 
-    size = graph_utils.get_size(graph)
-    all_freqs, all_counts = np.ones((size)) * 0.5, np.ones((size))
     order, min_vertex = graph_utils.get_order(graph), graph_utils.get_min_vertex(graph)
-    for edge in edges:
-        for round in range(rounds):
-            quad_vertices = quad_utils.generate_quadrilateral(graph, edge)
-            quad_edges = quad_utils.get_symmetric_endpoints(quad_vertices)
-            quad_freqs = fast_quadrilateral_frequency(graph, quad_edges)
-            all_freqs, all_counts = update_frequencies(quad_edges,
-                                                       quad_freqs,
-                                                       all_freqs,
-                                                       all_counts,
-                                                       order,
-                                                       min_vertex
-            )
-    return all_freqs
-
+    size = edge_index.get_canonical_size(order)
+    if matrix is None:
+        matrix = graph_utils.get_weight_matrix(graph)
+    edges = edge_index.as_edge_array(edges) - min_vertex
+    generator = np.random.default_rng(seed)
+    chunk_size = chunk_size or max(1, 2 ** 20 // max(rounds, 1))
+
+    all_sums, all_counts = np.zeros((size)), np.zeros((size))
+    for start in range(0, len(edges), chunk_size):
+        quads = sample_quadrilaterals(generator, edges[start:start + chunk_size], rounds, order)
+        freqs = compute_quadrilateral_frequencies(matrix, quads)
+        positions = get_quadrilateral_positions(quads, order).ravel()
+        all_sums += np.bincount(positions, weights=np.repeat(freqs.ravel(), 2), minlength=size)
+        all_counts += np.bincount(positions, minlength=size)
+    positions = graph_utils.get_canonical_edge_positions(graph)
+    return (0.5 + all_sums[positions]) / (1 + all_counts[positions])
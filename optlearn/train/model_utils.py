@@ -4,8 +4,12 @@ import joblib
 import numpy as np
 import networkx as nx
 
+from optlearn import graph_utils
+
 from optlearn.feature import feature_utils
+from optlearn.feature import feature_context
 from optlearn.fix import feasifiers
+from optlearn.fix import cost_fixing
 from optlearn.fix import fix_model
 
 
@@ -112,12 +116,15 @@ class ModelPersister():
         
 class ModelWrapper(feature_utils.buildFeatures, ModelPersister):
 
-    def __init__(self, model=None, function_names=None, threshold=None, feasifier=None):
+    def __init__(self, model=None, function_names=None, threshold=None, feasifier=None,
+                 fixer=None):
 
         self.model = model
         self.function_names = function_names
         self.threshold = threshold
         self.feasifier = feasifier
+        self.fixer = fixer
+        self.fixing_info = None
         
         if self.function_names is not None:
             self.get_funcs()
@@ -136,11 +143,15 @@ class ModelWrapper(feature_utils.buildFeatures, ModelPersister):
         if threshold is None:
             threshold = 0.5
         
-        new_graph = type(graph)()
+        if graph_utils.is_dense(graph):
+            new_graph = nx.Graph() if graph.symmetric else nx.DiGraph()
+        else:
+            new_graph = type(graph)()
         new_graph.graph = graph.graph
-        new_graph.add_nodes_from(graph.nodes)
-        edges = [edge for (edge, item) in zip(graph.edges, y) if item > threshold]
-        _ = [new_graph.add_edge(*edge, **graph[edge[0]][edge[1]]) for edge in edges]
+        new_graph.add_nodes_from(graph_utils.get_vertices(graph).tolist())
+        edges = [edge for (edge, item) in zip(graph_utils.get_edges(graph), y) if item > threshold]
+        _ = [new_graph.add_edge(*edge, **graph_utils.get_edge_data(graph, *edge))
+             for edge in edges]
         return new_graph
 
     def _set_funcs(self):
@@ -242,18 +253,52 @@ class ModelWrapper(feature_utils.buildFeatures, ModelPersister):
         X = self.compute_features(graph)
         return self.predict_vector(X, threshold=threshold)
 
+    def _predict_candidates(self, graph, threshold=None):
+        """ Predict on the edges left by the fixer, the fixed edges are predicted zero """
+
+        candidate_graph = self.fixer.fix_graph(graph)
+        self.fixing_info = self.fixer.get_info()
+        print("Fixed {} edges!".format(self.fixing_info["fixed_edges"]))
+        y = np.zeros(graph_utils.get_size(graph))
+        if graph_utils.get_size(candidate_graph) == 0:
+            return y
+        context = feature_context.FeatureContext(candidate_graph)
+        X = self.compute_features(candidate_graph, context)
+        if threshold is None:
+            predictions = self.predict_vector(X)
+        else:
+            predictions = (self.predict_vector(X, threshold)).astype(int)
+        indices = cost_fixing.get_candidate_indices(graph, candidate_graph)
+        candidates = self.fixer.candidates
+        y[candidates] = np.ravel(predictions)[indices[candidates]]
+        return y
+
+    def _refeasify_candidates(self, graph, y):
+        """ Drop the fixed edges the feasifier added, adding the fixer's tour instead """
+
+        edges = graph_utils.get_tour_edges(self.fixer.tour, graph_utils.check_graph(graph))
+        y = np.where(self.fixer.candidates, y, 0)
+        return np.clip(0, 1, graph_utils.compute_indicator_vector(graph, edges) + y)
+
     def prune_graph(self, graph, threshold=None, feasifier=None):
         """ Prune the given graph, returning a graph """
+        """ With a fixer, only the edges it does not fix are predicted on """
 
         threshold = threshold or self.threshold
         
-        X = self.compute_features(graph)
-        if threshold is None:
+        context = feature_context.FeatureContext(graph)
+        if self.fixer is not None:
+            y = self._predict_candidates(graph, threshold)
+        elif threshold is None:
+            X = self.compute_features(graph, context)
             y = self.predict_vector(X)
         else:
+            X = self.compute_features(graph, context)
             y = (self.predict_vector(X, threshold)).astype(int)
         if feasifier is not None:
-            y = np.clip(0, 1, feasifier.compute_feasifier_vector(graph) + y)
+            y = np.clip(0, 1, feasifier.compute_feasifier_vector(graph, context=context) + y)
+            if self.fixer is not None:
+                y = self._refeasify_candidates(graph, y)
         return self._build_prediction_graph(graph, y)
 
     def prune_graph_with_logic(self, graph, threshold=None):
@@ -271,7 +316,7 @@ class ModelWrapper(feature_utils.buildFeatures, ModelPersister):
         is_graph = isinstance(object, nx.Graph)
         is_digraph = isinstance(object, nx.DiGraph)
 
-        return bool(is_graph + is_digraph)
+        return bool(is_graph + is_digraph) or graph_utils.is_dense(object)
 
     def _detect_vector(self, object):
         """ Check if the given object is a vector of some kind """